@@ -75,6 +75,7 @@ hiddenimports = [
     'llm_control.voice.commands',
     'llm_control.voice.utils',
     'llm_control.voice.audio',
+    'llm_control.voice.inference_worker',
     'llm_control.voice.screenshots',
     'llm_control.llm',
     'llm_control.llm.intent_detection',
@@ -100,6 +101,11 @@ hiddenimports = [
     'flask',
     'flask_cors',
     'flask_socketio',
+    'orjson',
+    'ujson',
+    'flask_compress',
+    'xxhash',
+    'mss',
     'werkzeug',
     'werkzeug.serving',
     'werkzeug.middleware',
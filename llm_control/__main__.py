@@ -50,8 +50,15 @@ if __name__ == "__main__":
                 parser.add_argument('--ssl-key', type=str,
                                     help='Path to SSL private key file')
                 parser.add_argument('--whisper-model', type=str, default='medium',
-                                    choices=['tiny', 'base', 'small', 'medium', 'large'],
+                                    choices=['tiny', 'base', 'small', 'medium', 'large', 'turbo', 'distil-large-v2', 'distil-large-v3'],
                                     help='Whisper model size (default: medium)')
+                parser.add_argument('--whisper-backend', type=str, default=os.environ.get("WHISPER_BACKEND", "openai"),
+                                    choices=['openai', 'transformers'],
+                                    help='Whisper implementation: openai-whisper or Hugging Face transformers (default: openai)')
+                parser.add_argument('--whisper-device', type=str, default=os.environ.get("WHISPER_DEVICE"),
+                                    help='Torch device for Whisper, e.g. cuda:1 or cpu (default: first GPU if available)')
+                parser.add_argument('--llm-device', type=str, default=os.environ.get("LLM_DEVICE"),
+                                    help='GPU index Ollama should place the LLM on (Ollama main_gpu option)')
                 parser.add_argument('--ollama-model', type=str, default='qwen3.5:4b',
                                     help='Ollama model to use (default: qwen3.5:4b)')
                 parser.add_argument('--ollama-host', type=str, default='http://localhost:11434',
@@ -86,6 +93,11 @@ if __name__ == "__main__":
                 os.environ["WHISPER_MODEL_SIZE"] = args.whisper_model
                 os.environ["OLLAMA_MODEL"] = args.ollama_model
                 os.environ["OLLAMA_HOST"] = args.ollama_host
+                os.environ["WHISPER_BACKEND"] = args.whisper_backend
+                if args.whisper_device:
+                    os.environ["WHISPER_DEVICE"] = args.whisper_device
+                if args.llm_device:
+                    os.environ["LLM_DEVICE"] = args.llm_device
                 os.environ["TRANSLATION_ENABLED"] = "false" if args.disable_translation else "true"
                 os.environ["DEFAULT_LANGUAGE"] = args.language
                 os.environ["CAPTURE_SCREENSHOTS"] = "false" if args.disable_screenshots else "true"
@@ -515,13 +515,13 @@ def find_ui_element(query, ui_description):
                         for match in matches[:5]  # Top 5 matches
                     ]
                 }))
-            for i, match in enumerate(matches[:3]):  # Log top 3 matches
-                elem = match['element']
-                logger.debug(f"Match #{i+1}: Score {match['score']:.1f} - " + 
-                           f"Type: {elem.get('type', 'unknown')}, " +
-                           f"Text: '{elem.get('text', '')}', " + 
-                           f"Text normalized: '{normalize_text_for_matching(elem.get('text', ''))}', " +
-                           f"Reasons: {', '.join(match['reasons'])}")
+            # Normalizing the element texts is only worth it if the lines are emitted
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, match in enumerate(matches[:3]):  # Log top 3 matches
+                    elem = match['element']
+                    logger.debug("Match #%d: Score %.1f - Type: %s, Text: '%s', Text normalized: '%s', Reasons: %s",
+                                 i + 1, match['score'], elem.get('type', 'unknown'), elem.get('text', ''),
+                                 normalize_text_for_matching(elem.get('text', '')), ', '.join(match['reasons']))
         else:
             logger.warning(f"No matches found for query: '{query_original}' (normalized: '{query_normalized}')")
             if STRUCTURED_USAGE_LOGS_ENABLED:
@@ -541,12 +541,12 @@ def find_ui_element(query, ui_description):
                     ]
                 }))
             # Log some examples of what was available
-            sample_elements = elements[:5] if len(elements) > 5 else elements
-            logger.debug("Sample of available elements:")
-            for i, elem in enumerate(sample_elements):
-                logger.debug(f"Element #{i+1}: Type: {elem.get('type', 'unknown')}, " +
-                           f"Text: '{elem.get('text', '')}', " +
-                           f"Text normalized: '{normalize_text_for_matching(elem.get('text', ''))}'")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sample of available elements:")
+                for i, elem in enumerate(elements[:5]):
+                    logger.debug("Element #%d: Type: %s, Text: '%s', Text normalized: '%s'",
+                                 i + 1, elem.get('type', 'unknown'), elem.get('text', ''),
+                                 normalize_text_for_matching(elem.get('text', '')))
         
         # Return the best match if score exceeds threshold or is in borderline range with high-quality match
         MIN_THRESHOLD = 22  # Accept unconditionally when score >= 22 (slightly lower to reduce false negatives)
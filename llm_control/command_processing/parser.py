@@ -5,6 +5,31 @@ from llm_control import STEP_SEPARATORS, ACTION_VERBS, structured_usage_log
 # Get the package logger
 logger = logging.getLogger("llm-pc-control")
 
+# Action verbs as a tuple so a step can be checked with a single str.startswith call
+_ACTION_VERB_PREFIXES = tuple(ACTION_VERBS)
+# Typing verbs that may be followed by the text to type in the next step
+_TYPING_VERB_PREFIXES = ('type', 'write', 'escribe', 'teclea', 'enter')
+
+# Single operations that should not be split (matched against the lowercased input):
+# click on X, move to X, type "quoted text", press keys
+_SINGLE_OPERATION_RE = re.compile(
+    r'^(?:click\s+(on\s+)?[a-zA-Z0-9\s]+'
+    r'|move\s+to\s+[a-zA-Z0-9\s]+'
+    r'|type\s+["\'][^"\']+["\']'
+    r'|press\s+[a-zA-Z0-9\s]+)$'
+)
+# "Escribe, [texto]": a typing verb followed by a comma (matched against the lowercased input)
+_TYPING_VERB_COMMA_RE = re.compile(r'^(?:escribe|type|write|teclea|enter)\s*,\s+')
+# Keyboard actions that should be split out of a step, with their action type
+_KEYBOARD_PATTERNS = [
+    # Modified pattern to handle Spanish "escribe a" and similar constructs
+    (r'(\btype\s+[^\s]+.*|\bteclea\s+[^\s]+.*|\bescribe\s+[^\s]+.*|\bwrite\s+[^\s]+.*|\benter\s+[^\s]+.*)', 'type'),
+    (r'(\bpress\s+\w+|\bpulsa\s+\w+|\bpresiona\s+\w+|\bhit\s+\w+|\boprime\s+\w+)', 'press')
+]
+_KEYBOARD_ACTION_RES = [(re.compile(pattern, re.IGNORECASE), action_type) for pattern, action_type in _KEYBOARD_PATTERNS]
+# A step that is exactly one keyboard action (matched against the lowercased step)
+_KEYBOARD_STEP_RE = re.compile('^(?:' + '|'.join(pattern for pattern, _ in _KEYBOARD_PATTERNS) + ')$')
+
 def normalize_step(step_input):
     """Normalize the step input by removing prefixes like 'then'"""
     normalized_step = step_input
@@ -28,37 +53,20 @@ def split_user_input_into_steps(user_input):
     steps = []
     
     # First, check if the input is a single operation (no need to split)
-    # Common patterns for single operations that should not be split
-    single_operation_patterns = [
-        r'^click\s+(on\s+)?[a-zA-Z0-9\s]+$',  # Simple click commands (click on X)
-        r'^move\s+to\s+[a-zA-Z0-9\s]+$',      # Simple move commands (move to X)
-        r'^type\s+["\'][^"\']+["\']$',        # Type with quoted text
-        r'^press\s+[a-zA-Z0-9\s]+$',          # Press key commands
-    ]
-    
-    # Check if the input matches any single operation pattern
-    if any(re.match(pattern, user_input.lower()) for pattern in single_operation_patterns):
+    user_input_lower = user_input.lower()
+    if _SINGLE_OPERATION_RE.match(user_input_lower):
         return [user_input]
     
     # Special handling for "Escribe, [texto]" pattern - should be treated as single typing step
-    # Check if command starts with typing verb followed by comma and text (not another action)
-    typing_verbs = ['escribe', 'type', 'write', 'teclea', 'enter']
-    user_input_lower = user_input.lower()
-    
     # Detect "Escribe, [texto]" pattern - don't split if comma is after typing verb and followed by text
     should_preserve_typing = False
-    for verb in typing_verbs:
-        # Pattern: "Escribe, [texto sin verbo de acción]"
-        pattern = rf'^{verb}\s*,\s+'
-        if re.match(pattern, user_input_lower):
-            # Check if what comes after the comma is text (not an action verb)
-            after_comma = user_input[user_input.find(',') + 1:].strip()
-            after_comma_lower = after_comma.lower()
-            
-            # If after comma doesn't start with an action verb, it's text to type
-            if not any(after_comma_lower.startswith(action) for action in ACTION_VERBS):
-                should_preserve_typing = True
-                break
+    if _TYPING_VERB_COMMA_RE.match(user_input_lower):
+        # Check if what comes after the comma is text (not an action verb)
+        after_comma_lower = user_input[user_input.find(',') + 1:].strip().lower()
+        
+        # If after comma doesn't start with an action verb, it's text to type
+        if not after_comma_lower.startswith(_ACTION_VERB_PREFIXES):
+            should_preserve_typing = True
     
     # Try comma splitting first for cases like "move to X, click"
     # BUT: Skip if it's a "Escribe, [texto]" pattern
@@ -134,13 +142,11 @@ def split_user_input_into_steps(user_input):
             is_standalone_verb = current_lower in ['click', 'click on', 'move to', 'press']
             
             # Check if current step is a typing/writing command
-            is_typing_command = any(current_lower.startswith(cmd) for cmd in ['type', 'write', 'escribe', 'teclea', 'enter'])
-            
-            # Check if next step doesn't start with an action verb
-            next_has_no_verb = not any(next_lower.startswith(verb) for verb in ACTION_VERBS)
+            is_typing_command = current_lower.startswith(_TYPING_VERB_PREFIXES)
             
             # Check if next step starts with an action verb (different action)
-            next_has_verb = any(next_lower.startswith(verb) for verb in ACTION_VERBS)
+            next_has_verb = next_lower.startswith(_ACTION_VERB_PREFIXES)
+            next_has_no_verb = not next_has_verb
             
             # Don't merge if:
             # 1. They were separated by comma AND next step is a different action
@@ -177,23 +183,16 @@ def split_user_input_into_steps(user_input):
     # Additional parsing for keyboard actions
     refined_steps = []
     
-    # Regex patterns for keyboard actions that should be split
-    keyboard_patterns = [
-        # Modified pattern to handle Spanish "escribe a" and similar constructs
-        (r'(\btype\s+[^\s]+.*|\bteclea\s+[^\s]+.*|\bescribe\s+[^\s]+.*|\bwrite\s+[^\s]+.*|\benter\s+[^\s]+.*)', 'type'),
-        (r'(\bpress\s+\w+|\bpulsa\s+\w+|\bpresiona\s+\w+|\bhit\s+\w+|\boprime\s+\w+)', 'press')
-    ]
-    
     for step in final_steps:
         # Check if this is already a simple step
-        if any(re.match(f'^{pattern[0]}$', step.lower()) for pattern in keyboard_patterns):
+        if _KEYBOARD_STEP_RE.match(step.lower()):
             refined_steps.append(step)
             continue
         
         # Check if we need to split this step for keyboard actions
         matches = []
-        for pattern, action_type in keyboard_patterns:
-            for match in re.finditer(pattern, step, re.IGNORECASE):
+        for pattern, action_type in _KEYBOARD_ACTION_RES:
+            for match in pattern.finditer(step):
                 matches.append((match.start(), match.end(), match.group(), action_type))
         
         # Sort matches by position
@@ -245,7 +244,7 @@ def clean_and_normalize_steps(steps):
         step_lower = step.lower()
         
         # Check if this step starts with an action verb
-        has_action_verb = any(step_lower.startswith(verb) for verb in ACTION_VERBS)
+        has_action_verb = step_lower.startswith(_ACTION_VERB_PREFIXES)
         
         # If not the first step and doesn't start with an action verb, it might be a continuation
         if i > 0 and not has_action_verb and not step_lower.startswith('then') and not step_lower.startswith('and'):
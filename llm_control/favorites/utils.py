@@ -3,11 +3,14 @@ Utility functions for managing favorite commands.
 """
 import os
 import json
+import heapq
 import logging
+import traceback
 from datetime import datetime
 import tempfile
 import subprocess
 import sys
+from functools import lru_cache
 
 # Get the package logger
 logger = logging.getLogger("llm-pc-control")
@@ -19,11 +22,15 @@ def get_favorites_dir():
     Returns:
         str: Path to the favorites directory
     """
+    # Only the environment lookup runs per call; resolving and creating the
+    # directory is cached per FAVORITES_DIR value
+    return _resolve_favorites_dir(os.environ.get("FAVORITES_DIR"))
+
+@lru_cache(maxsize=8)
+def _resolve_favorites_dir(favorites_dir):
+    """Resolve a FAVORITES_DIR value to a directory and make sure it exists."""
     from llm_control import is_packaged
     
-    # Create a directory for storing favorites data
-    favorites_dir = os.environ.get("FAVORITES_DIR")
-    
     if not favorites_dir:
         # Use is_packaged() for cross-platform detection
         if is_packaged():
@@ -146,7 +153,6 @@ print("This is a saved favorite command, but no executable code was available.")
         
     except Exception as e:
         logger.error(f"Error saving favorite: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             'status': 'error',
@@ -167,25 +173,31 @@ def get_favorites(limit=None):
         # Get the favorites directory
         favorites_dir = get_favorites_dir()
         
-        # Check if the directory exists
-        if not os.path.exists(favorites_dir):
+        # List all JSON files in the directory with their modification times
+        # (scandir returns the stat data with the directory entries)
+        metadata_files = []
+        try:
+            with os.scandir(favorites_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.json'):
+                        try:
+                            metadata_files.append((entry.stat().st_mtime, entry.name, entry.path))
+                        except OSError:
+                            continue
+        except FileNotFoundError:
             return []
         
-        # List all JSON files in the directory
-        metadata_files = [f for f in os.listdir(favorites_dir) if f.endswith('.json')]
-        
-        # Sort by modification time (newest first)
-        metadata_files.sort(key=lambda x: os.path.getmtime(os.path.join(favorites_dir, x)), reverse=True)
-        
-        # Apply limit if specified
+        # Newest first; with a limit only the newest entries need to be ordered
         if limit is not None and limit > 0:
-            metadata_files = metadata_files[:limit]
+            metadata_files = heapq.nlargest(limit, metadata_files)
+        else:
+            metadata_files.sort(reverse=True)
         
         # Read metadata for each favorite
         favorites = []
-        for metadata_file in metadata_files:
+        for _, metadata_file, metadata_path in metadata_files:
             try:
-                with open(os.path.join(favorites_dir, metadata_file), 'r', encoding='utf-8') as f:
+                with open(metadata_path, 'r', encoding='utf-8') as f:
                     metadata = json.load(f)
                     favorites.append(metadata)
             except Exception as e:
@@ -253,7 +265,6 @@ def delete_favorite(script_id):
         
     except Exception as e:
         logger.error(f"Error deleting favorite: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             'status': 'error',
@@ -329,7 +340,6 @@ def run_favorite(script_id):
         
     except Exception as e:
         logger.error(f"Error running favorite: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             'status': 'error',
@@ -38,7 +38,7 @@ except ImportError:
     logger.warning("Could not import PyAutoGUI extensions from utils")
 
 # Import Ollama utilities
-from llm_control.utils.ollama import get_model_not_found_message, ollama_chat
+from llm_control.utils.ollama import check_ollama_model, get_model_not_found_message, ollama_chat
 
 def execute_command_with_llm(command: str, 
                           model: str = "qwen3.5:4b", 
@@ -231,20 +231,14 @@ def generate_pyautogui_code(command: str,
     logger.info(f"Generating PyAutoGUI code for command: {command}")
     
     try:
-        # Check if Ollama is running
-        try:
-            response = requests.get(f"{ollama_host}/api/tags", timeout=2)
-            if response.status_code != 200:
-                logger.error(f"Ollama server not responding at {ollama_host}")
-                return {
-                    "success": False,
-                    "error": f"Ollama server not responding at {ollama_host}"
-                }
-        except requests.exceptions.RequestException:
-            logger.error(f"Ollama server not available at {ollama_host}")
+        # Check that the LLM server is running and serves the model (Ollama or OpenAI-compatible)
+        model_available, check_error = check_ollama_model(model, ollama_host, timeout=2)
+        if not model_available:
+            error_msg = check_error or get_model_not_found_message(model)
+            logger.error(error_msg)
             return {
                 "success": False,
-                "error": f"Ollama server not available at {ollama_host}"
+                "error": error_msg
             }
         
         # Prepare the prompt for code generation
@@ -8,12 +8,35 @@ It's separated to avoid circular imports between ui_detection and utils.
 import os
 import sys
 import logging
+import hashlib
 import tempfile
 from typing import Union, Tuple, Dict, Any, Optional
 
 # Get the package logger
 logger = logging.getLogger("llm-pc-control")
 
+# xxhash is optional; xxh3 fingerprints screenshot files much faster than md5
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+def _fingerprint_file(path: str) -> str:
+    """
+    Hash a file's contents for caching/reference.
+    
+    hashlib.file_digest reads through one reusable buffer instead of loading the
+    whole file into a new bytes object.
+    
+    Args:
+        path: File to hash
+        
+    Returns:
+        Hex digest (xxh3-128 when xxhash is installed, md5 otherwise)
+    """
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, xxhash.xxh3_128 if xxhash is not None else "md5").hexdigest()
+
 def take_screenshot(region: Optional[Tuple[int, int, int, int]] = None) -> Dict[str, Any]:
     """
     Take a screenshot of the entire screen or a specific region.
@@ -78,7 +101,6 @@ def enhanced_screenshot_processing(screenshot_path_or_data: Union[str, Dict[str,
     """
     try:
         from PIL import Image
-        import hashlib
         
         # Handle if input is already a dictionary (from take_screenshot)
         if isinstance(screenshot_path_or_data, dict):
@@ -101,8 +123,7 @@ def enhanced_screenshot_processing(screenshot_path_or_data: Union[str, Dict[str,
         image = Image.open(screenshot_path)
         
         # Calculate a hash of the image for caching/reference
-        with open(screenshot_path, 'rb') as f:
-            image_hash = hashlib.md5(f.read()).hexdigest()
+        image_hash = _fingerprint_file(screenshot_path)
         
         # Extract basic image properties
         width, height = image.size
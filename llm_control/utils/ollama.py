@@ -3,11 +3,54 @@ Ollama utility functions for model checking and error handling.
 """
 
 import logging
+import os
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger("llm-pc-control")
 
+# Shared HTTP session so calls to the Ollama server reuse pooled keep-alive connections
+# instead of opening a new TCP connection per request
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
+
+def get_ollama_session() -> requests.Session:
+    """Return the shared, connection-pooled session used for Ollama API calls."""
+    return _session
+
+
+# Ollama options that have an OpenAI chat-completions equivalent
+_OPENAI_OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "seed": "seed",
+    "stop": "stop",
+    "num_predict": "max_tokens",
+}
+
+
+def get_llm_api_format(host: str) -> str:
+    """
+    Return the API flavour spoken by the LLM server at host.
+    
+    LLM_API_FORMAT=openai selects the OpenAI-compatible /v1/chat/completions API
+    (vLLM, llama.cpp server, ...); "ollama" selects Ollama's /api/chat. When unset,
+    hosts ending in /v1 are treated as OpenAI-compatible.
+    """
+    api_format = os.environ.get("LLM_API_FORMAT", "").strip().lower()
+    if api_format in ("ollama", "openai"):
+        return api_format
+    return "openai" if host.rstrip("/").endswith("/v1") else "ollama"
+
+
+def _openai_base_url(host: str) -> str:
+    host = host.rstrip("/")
+    return host if host.endswith("/v1") else f"{host}/v1"
+
 
 def ollama_chat(
     model: str,
@@ -15,16 +58,22 @@ def ollama_chat(
     host: str = "http://localhost:11434",
     options: Optional[Dict[str, Any]] = None,
     timeout: int = 30,
+    session: Optional[requests.Session] = None,
 ) -> Tuple[bool, Optional[str], Optional[str]]:
     """
     Call Ollama /api/chat endpoint (Qwen-compatible format).
     
+    With an OpenAI-compatible server (see get_llm_api_format) the same call is
+    sent to /v1/chat/completions instead, so callers don't need to know which
+    server is running.
+    
     Args:
         model: The model name (e.g., "qwen2.5:7b")
         messages: List of {"role": "user"|"system"|"assistant", "content": "..."}
         host: Ollama API host
         options: Optional dict (temperature, num_ctx, num_predict, etc.)
         timeout: Request timeout in seconds
+        session: Optional requests session (defaults to the shared pooled session)
         
     Returns:
         Tuple of (success, content, error_message)
@@ -32,6 +81,9 @@ def ollama_chat(
         - content: Response text from message.content, or None on failure
         - error_message: Error description if success is False
     """
+    if get_llm_api_format(host) == "openai":
+        return _openai_chat(model, messages, host, options, timeout, session)
+    
     try:
         payload: Dict[str, Any] = {
             "model": model,
@@ -39,10 +91,18 @@ def ollama_chat(
             "stream": False,
             "think": False,  # Get output in content, not thinking field (Qwen, DeepSeek R1, etc.)
         }
+        options = dict(options or {})
+        # Pin the LLM to its own GPU so it does not contend with Whisper
+        llm_device = os.environ.get("LLM_DEVICE", "").strip()
+        if llm_device and "main_gpu" not in options:
+            try:
+                options["main_gpu"] = int(llm_device.rsplit(":", 1)[-1])
+            except ValueError:
+                logger.warning(f"Ignoring invalid LLM_DEVICE value: {llm_device}")
         if options:
             payload["options"] = options
         
-        response = requests.post(
+        response = (session or _session).post(
             f"{host}/api/chat",
             json=payload,
             timeout=timeout,
@@ -69,6 +129,50 @@ def ollama_chat(
         return False, None, str(e)
 
 
+def _openai_chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    host: str,
+    options: Optional[Dict[str, Any]],
+    timeout: int,
+    session: Optional[requests.Session],
+) -> Tuple[bool, Optional[str], Optional[str]]:
+    """Send an ollama_chat call to an OpenAI-compatible /v1/chat/completions endpoint."""
+    try:
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+        }
+        for name, value in (options or {}).items():
+            if name in _OPENAI_OPTION_NAMES:
+                payload[_OPENAI_OPTION_NAMES[name]] = value
+        
+        response = (session or _session).post(
+            f"{_openai_base_url(host)}/chat/completions",
+            json=payload,
+            timeout=timeout,
+        )
+        
+        if response.status_code != 200:
+            error_text = response.text[:200] if response.text else "Unknown error"
+            return False, None, f"HTTP {response.status_code}: {error_text}"
+        
+        result = response.json()
+        choices = result.get("choices") or [{}]
+        message = choices[0].get("message") or {}
+        content = (message.get("content") or "").strip()
+        return True, content, None
+        
+    except requests.exceptions.Timeout:
+        return False, None, f"Request timed out after {timeout}s"
+    except requests.exceptions.RequestException as e:
+        return False, None, str(e)
+    except Exception as e:
+        logger.error(f"ollama_chat error: {e}")
+        return False, None, str(e)
+
+
 def check_ollama_model(model: str, host: str = "http://localhost:11434", timeout: int = 5) -> Tuple[bool, Optional[str]]:
     """
     Check if an Ollama model is available.
@@ -83,20 +187,19 @@ def check_ollama_model(model: str, host: str = "http://localhost:11434", timeout
         - is_available: True if model exists, False otherwise
         - error_message: None if available, error description if not
     """
+    if get_llm_api_format(host) == "openai":
+        return _check_openai_model(model, host, timeout)
+    
     try:
-        # Check if Ollama server is running
+        # Check if Ollama server is running (the same response lists the models)
         try:
-            response = requests.get(f"{host}/api/tags", timeout=timeout)
+            response = _session.get(f"{host}/api/tags", timeout=timeout)
             if response.status_code != 200:
                 return False, f"Ollama server not responding at {host}"
         except requests.exceptions.RequestException as e:
             return False, f"Ollama server not available at {host}: {str(e)}"
         
         # Get list of available models
-        response = requests.get(f"{host}/api/tags", timeout=timeout)
-        if response.status_code != 200:
-            return False, f"Failed to query Ollama models: HTTP {response.status_code}"
-        
         models_data = response.json()
         available_models = [model_info.get("name", "") for model_info in models_data.get("models", [])]
         
@@ -118,6 +221,24 @@ def check_ollama_model(model: str, host: str = "http://localhost:11434", timeout
         return False, f"Error checking model availability: {str(e)}"
 
 
+def _check_openai_model(model: str, host: str, timeout: int) -> Tuple[bool, Optional[str]]:
+    """Check that an OpenAI-compatible server at host serves the given model."""
+    try:
+        try:
+            response = _session.get(f"{_openai_base_url(host)}/models", timeout=timeout)
+            if response.status_code != 200:
+                return False, f"LLM server not responding at {host}"
+        except requests.exceptions.RequestException as e:
+            return False, f"LLM server not available at {host}: {str(e)}"
+        
+        available_models = [model_info.get("id", "") for model_info in response.json().get("data", [])]
+        return model in available_models, None
+        
+    except Exception as e:
+        logger.error(f"Error checking LLM model: {str(e)}")
+        return False, f"Error checking model availability: {str(e)}"
+
+
 def get_model_not_found_message(model: str) -> str:
     """
     Generate a helpful error message when a model is not found.
@@ -6,10 +6,14 @@ This module handles audio transcription and translation.
 
 import os
 import sys
+import shutil
 import tempfile
 import logging
+import traceback
 import time
-from typing import Dict, Any, Optional
+import threading
+import queue
+from typing import Dict, Any, List, Optional
 
 # Configure logging
 logger = logging.getLogger("voice-control-audio")
@@ -26,6 +30,15 @@ def get_default_language():
 def get_whisper_model_size():
     return os.environ.get("WHISPER_MODEL_SIZE", "large")
 
+def get_whisper_device():
+    return os.environ.get("WHISPER_DEVICE") or None
+
+def get_whisper_torch_compile():
+    return os.environ.get("WHISPER_TORCH_COMPILE", "false").lower() in ("true", "1", "yes")
+
+def get_whisper_backend():
+    return os.environ.get("WHISPER_BACKEND", "openai").lower()
+
 def get_ollama_model():
     return os.environ.get("OLLAMA_MODEL", "qwen3.5:4b")
 
@@ -38,6 +51,199 @@ logger.debug(f"Audio module configuration getters initialized (values read dynam
 _whisper_model = None
 _current_model_size = None
 
+# Serializes GPU inference; audio decoding happens outside it so concurrent requests
+# can decode on the CPU while another one is being transcribed
+_inference_lock = threading.Lock()
+
+# Hugging Face Transformers backend (WHISPER_BACKEND=transformers)
+TRANSFORMERS_MODEL_IDS = {
+    "tiny": "openai/whisper-tiny",
+    "base": "openai/whisper-base",
+    "small": "openai/whisper-small",
+    "medium": "openai/whisper-medium",
+    "large": "openai/whisper-large-v3",
+    "turbo": "openai/whisper-large-v3-turbo",
+    # Distil-Whisper: ~6x faster than large with close WER, but English-only
+    "distil-large-v2": "distil-whisper/distil-large-v2",
+    "distil-large-v3": "distil-whisper/distil-large-v3",
+    "distil-medium.en": "distil-whisper/distil-medium.en",
+    "distil-small.en": "distil-whisper/distil-small.en",
+}
+_transformers_pipelines = {}  # model id -> resident pipeline
+_transformers_lock = threading.Lock()
+
+def get_whisper_multilingual_model():
+    return os.environ.get("WHISPER_MULTILINGUAL_MODEL", "large")
+
+def _is_english_only_model(model_id):
+    return model_id.startswith("distil-whisper/") or model_id.endswith(".en")
+
+def _get_transformers_model_id(model_size, language=None):
+    """
+    Map a Whisper model size (or a full Hugging Face model id) to a model id.
+    
+    English-only models (Distil-Whisper, *.en) are swapped for
+    WHISPER_MULTILINGUAL_MODEL when the request is not in English.
+    """
+    if "/" in model_size:
+        model_id = model_size
+    else:
+        model_id = TRANSFORMERS_MODEL_IDS.get(model_size, f"openai/whisper-{model_size}")
+    
+    if language and language != "en" and _is_english_only_model(model_id):
+        fallback = get_whisper_multilingual_model()
+        if fallback != model_size:
+            logger.debug(f"{model_id} is English-only, using {fallback} for language '{language}'")
+            return _get_transformers_model_id(fallback)
+    return model_id
+
+def _get_transformers_pipeline(model_size, language=None):
+    """
+    Return the resident Transformers ASR pipeline for a model, loading it on first use.
+    
+    Uses fp16 and Flash Attention 2 on Ampere or newer GPUs when flash-attn is
+    installed, PyTorch SDPA attention otherwise.
+    
+    Args:
+        model_size: Whisper model size or Hugging Face model id
+        language: Language of the audio, used to pick a multilingual model
+            instead of an English-only one
+        
+    Returns:
+        The transformers pipeline
+    """
+    model_id = _get_transformers_model_id(model_size, language)
+    
+    with _transformers_lock:
+        if model_id in _transformers_pipelines:
+            return _transformers_pipelines[model_id]
+        
+        import torch
+        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+        
+        device = get_whisper_device() or ("cuda:0" if torch.cuda.is_available() else "cpu")
+        on_cuda = device.startswith("cuda")
+        torch_dtype = torch.float16 if on_cuda else torch.float32
+        
+        attn_implementation = "sdpa"
+        if on_cuda and torch.cuda.get_device_capability(torch.device(device))[0] >= 8:
+            try:
+                import flash_attn  # noqa: F401
+                attn_implementation = "flash_attention_2"
+            except ImportError:
+                logger.debug("flash-attn not installed, using SDPA attention")
+        
+        logger.info(f"Loading Transformers Whisper model {model_id} on {device} ({torch_dtype}, {attn_implementation})")
+        start_time = time.time()
+        model = AutoModelForSpeechSeq2Seq.from_pretrained(
+            model_id,
+            torch_dtype=torch_dtype,
+            low_cpu_mem_usage=True,
+            use_safetensors=True,
+            attn_implementation=attn_implementation
+        ).to(device)
+        processor = AutoProcessor.from_pretrained(model_id)
+        _transformers_pipelines[model_id] = pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            torch_dtype=torch_dtype,
+            device=device
+        )
+        logger.info(f"Transformers Whisper model loaded in {time.time() - start_time:.2f} seconds")
+        return _transformers_pipelines[model_id]
+
+# Long-form transcription: audio longer than one Whisper window is split into
+# overlapping chunks that are batched through the model together
+TRANSFORMERS_CHUNK_LENGTH_S = 30
+TRANSFORMERS_STRIDE_LENGTH_S = 5
+TRANSFORMERS_CHUNK_BATCH_SIZE = 24
+
+def _run_transformers_batch(pipe, audios, language) -> List[Dict[str, Any]]:
+    """
+    Run the Transformers pipeline on one or more decoded clips in a single call.
+    
+    Clips that fit in a single 30 s window (typical voice commands) skip the
+    chunking machinery; longer ones use chunked long-form decoding with stride.
+    
+    Args:
+        pipe: Transformers ASR pipeline
+        audios: List of float32 sample arrays at the pipeline's sampling rate
+        language: Language code, or "auto"
+        
+    Returns:
+        List of transcription result dictionaries, one per clip
+    """
+    sampling_rate = pipe.feature_extractor.sampling_rate
+    generate_kwargs = {"task": "transcribe"}
+    if language and language != "auto":
+        generate_kwargs["language"] = language
+    
+    pipe_kwargs = {"batch_size": TRANSFORMERS_CHUNK_BATCH_SIZE}
+    if any(len(audio) > TRANSFORMERS_CHUNK_LENGTH_S * sampling_rate for audio in audios):
+        pipe_kwargs["chunk_length_s"] = TRANSFORMERS_CHUNK_LENGTH_S
+        pipe_kwargs["stride_length_s"] = TRANSFORMERS_STRIDE_LENGTH_S
+    
+    start_time = time.time()
+    with _inference_lock:
+        results = pipe(
+            [{"raw": audio, "sampling_rate": sampling_rate} for audio in audios],
+            return_timestamps=True,
+            generate_kwargs=generate_kwargs,
+            **pipe_kwargs
+        )
+    logger.debug(f"Transformers transcription of {len(audios)} clip(s) completed in {time.time() - start_time:.2f} seconds")
+    
+    return [
+        {
+            "text": result.get("text", "").strip(),
+            "language": language,
+            "segments": [
+                {"start": chunk["timestamp"][0], "end": chunk["timestamp"][1], "text": chunk["text"]}
+                for chunk in result.get("chunks", [])
+            ]
+        }
+        for result in results
+    ]
+
+def _transcribe_with_transformers(audio_data, model_size, language) -> Dict[str, Any]:
+    """
+    Transcribe audio with the Transformers pipeline.
+    
+    Args:
+        audio_data: Audio as bytes, a file path, or a binary file-like object
+        model_size: Whisper model size or Hugging Face model id
+        language: Language code, or "auto"
+        
+    Returns:
+        Dictionary with transcription results (same shape as transcribe_audio)
+    """
+    try:
+        from transformers.pipelines.audio_utils import ffmpeg_read
+        
+        pipe = _get_transformers_pipeline(model_size, language)
+        
+        # Decode in memory on the CPU (no temporary file) before taking the GPU lock
+        sampling_rate = pipe.feature_extractor.sampling_rate
+        audio = ffmpeg_read(_audio_to_bytes(audio_data), sampling_rate)
+        
+        return _run_transformers_batch(pipe, [audio], language)[0]
+    
+    except ImportError as e:
+        logger.error(f"Failed to import required module: {str(e)}")
+        return {
+            "error": f"Required module not installed: {str(e)}",
+            "text": ""
+        }
+    except Exception as e:
+        logger.error(f"Error transcribing audio with transformers: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {
+            "error": f"Error transcribing audio: {str(e)}",
+            "text": ""
+        }
+
 def initialize_whisper_model(model_size=None):
     if model_size is None:
         model_size = get_whisper_model_size()
@@ -53,6 +259,17 @@ def initialize_whisper_model(model_size=None):
     """
     global _whisper_model, _current_model_size
     
+    if get_whisper_backend() == "transformers":
+        try:
+            return _get_transformers_pipeline(model_size, get_default_language())
+        except Exception as e:
+            logger.error(f"Error initializing Transformers Whisper pipeline: {str(e)}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    if model_size.startswith("distil") or "/" in model_size:
+        logger.warning(f"Whisper model '{model_size}' is only available with WHISPER_BACKEND=transformers")
+    
     # If model is already initialized with the same size, return it
     if _whisper_model is not None and _current_model_size == model_size:
         logger.debug(f"Whisper model already initialized with size: {model_size}")
@@ -85,26 +302,28 @@ def initialize_whisper_model(model_size=None):
         
         logger.info(f"Initializing Whisper model with size: {model_size}")
         start_time = time.time()
-        _whisper_model = whisper.load_model(model_size)
+        _whisper_model = whisper.load_model(model_size, device=get_whisper_device())
         _current_model_size = model_size  # Store the current model size
         load_time = time.time() - start_time
-        logger.info(f"Whisper model initialized in {load_time:.2f} seconds")
+        logger.info(f"Whisper model initialized in {load_time:.2f} seconds on {_whisper_model.device}")
         
         # Log CUDA availability and memory usage
-        if hasattr(torch, 'cuda') and torch.cuda.is_available():
-            logger.info(f"CUDA is available. Using device: {torch.cuda.get_device_name(0)}")
+        if _whisper_model.device.type == 'cuda':
+            logger.info(f"CUDA is available. Using device: {torch.cuda.get_device_name(_whisper_model.device)}")
             # Log memory usage to help diagnose VRAM issues
-            allocated = torch.cuda.memory_allocated() / 1024**3
-            reserved = torch.cuda.memory_reserved() / 1024**3
+            allocated = torch.cuda.memory_allocated(_whisper_model.device) / 1024**3
+            reserved = torch.cuda.memory_reserved(_whisper_model.device) / 1024**3
             logger.info(f"GPU memory: {allocated:.2f}GB allocated, {reserved:.2f}GB reserved")
         else:
-            logger.info("CUDA is not available. Using CPU.")
+            logger.info(f"Whisper is not using CUDA. Using device: {_whisper_model.device}")
+        
+        if get_whisper_torch_compile():
+            _compile_whisper_decoder(_whisper_model)
             
         return _whisper_model
         
     except Exception as e:
         logger.error(f"Error initializing Whisper model: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         # Clear CUDA cache on failure to help recovery
         try:
@@ -116,11 +335,130 @@ def initialize_whisper_model(model_size=None):
             pass
         return None
 
+def _compile_whisper_decoder(model):
+    """
+    Compile the Whisper text decoder with torch.compile and warm it up.
+    
+    The decoder runs once per generated token, so it dominates decode latency; the
+    "reduce-overhead" mode also replays the captured steps as CUDA graphs. Compilation
+    happens lazily, so a short dummy transcription is run here to pay that cost at
+    startup instead of on the first request. Falls back to the eager decoder on error.
+    
+    Args:
+        model: Loaded Whisper model (modified in place)
+    """
+    import numpy as np
+    import torch
+    import whisper
+    
+    if model.device.type != 'cuda' or not hasattr(torch, "compile"):
+        logger.info("Skipping torch.compile for Whisper (requires CUDA and PyTorch 2.x)")
+        return
+    
+    eager_decoder = model.decoder
+    mode = os.environ.get("WHISPER_TORCH_COMPILE_MODE", "reduce-overhead")
+    try:
+        logger.info(f"Compiling Whisper decoder with torch.compile (mode={mode}), this can take a while...")
+        start_time = time.time()
+        model.decoder = torch.compile(eager_decoder, mode=mode, fullgraph=False)
+        dummy_audio = np.zeros(whisper.audio.N_SAMPLES, dtype=np.float32)
+        with _inference_lock:
+            model.transcribe(dummy_audio, language="en", fp16=True)
+        logger.info(f"Whisper decoder compiled and warmed up in {time.time() - start_time:.2f} seconds")
+    except Exception as e:
+        logger.warning(f"torch.compile failed for Whisper decoder, using eager mode: {str(e)}")
+        model.decoder = eager_decoder
+
 # NOTE: Whisper model initialization is now done in run_server() AFTER 
 # environment variables are set from command-line arguments.
 # This prevents loading the wrong model size (e.g., "large" default) 
 # before the user's configured size is available.
 
+def is_audio_data(header: bytes) -> bool:
+    """
+    Check the leading bytes of an upload against known audio container signatures.
+    
+    Args:
+        header: First bytes of the upload (at least 12)
+        
+    Returns:
+        True if the data looks like WAV, Ogg, MP3, FLAC, WebM/Matroska, MP4/M4A/3GP or AMR
+    """
+    if len(header) < 4:
+        return False
+    if header[:4] == b"RIFF" and header[8:12] in (b"WAVE", b"AVI "):
+        return True
+    if header[:4] in (b"OggS", b"fLaC", b"\x1aE\xdf\xa3", b"FORM", b"caff"):
+        return True
+    if header[:3] == b"ID3" or (header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return True
+    if header[4:8] == b"ftyp" or header[:5] == b"#!AMR":
+        return True
+    return False
+
+def _get_whisper_model(model_size):
+    """
+    Return the pre-initialized Whisper model, loading it on demand if needed.
+    
+    Args:
+        model_size: Whisper model size
+        
+    Returns:
+        The loaded Whisper model
+    """
+    global _whisper_model
+    import whisper
+    
+    # Use the pre-initialized model or initialize it if needed
+    model = _whisper_model
+    
+    # If the model is not initialized or a different size is requested, initialize it
+    if model is None or (hasattr(model, 'model_size') and model.model_size != model_size):
+        logger.debug(f"Initializing Whisper model on-demand with size: {model_size}")
+        start_time = time.time()
+        model = whisper.load_model(model_size, device=get_whisper_device())
+        load_time = time.time() - start_time
+        logger.debug(f"Loaded Whisper model in {load_time:.2f} seconds")
+        
+        # Update the global model if it's the standard size
+        if model_size == get_whisper_model_size():
+            _whisper_model = model
+    
+    return model
+
+def audio_to_path(audio_data):
+    """
+    Get a filesystem path for audio given as bytes, a path or a file-like object.
+    
+    Paths are used as-is; bytes and streams (e.g. a Werkzeug upload stream) are
+    copied to a temporary file in chunks, without building one large bytes object.
+    
+    Args:
+        audio_data: Audio as bytes, a path (str or PathLike) or a binary file-like object
+        
+    Returns:
+        Tuple of (path, is_temporary)
+    """
+    if isinstance(audio_data, (str, os.PathLike)):
+        return os.fspath(audio_data), False
+    
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        if isinstance(audio_data, (bytes, bytearray, memoryview)):
+            temp_file.write(audio_data)
+        else:
+            shutil.copyfileobj(audio_data, temp_file)
+        logger.debug(f"Wrote audio data to temporary file: {temp_file.name}")
+        return temp_file.name, True
+
+def _audio_to_bytes(audio_data):
+    """Read audio given as bytes, a path or a file-like object into bytes."""
+    if isinstance(audio_data, (bytes, bytearray, memoryview)):
+        return bytes(audio_data)
+    if isinstance(audio_data, (str, os.PathLike)):
+        with open(audio_data, "rb") as f:
+            return f.read()
+    return audio_data.read()
+
 def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, Any]:
     if model_size is None:
         model_size = get_whisper_model_size()
@@ -130,7 +468,7 @@ def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, An
     Transcribe audio data using Whisper.
     
     Args:
-        audio_data: Audio data as bytes
+        audio_data: Audio as bytes, a file path, or a binary file-like object (e.g. an upload stream)
         model_size: Whisper model size
         language: Language code
         
@@ -138,45 +476,37 @@ def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, An
         Dictionary with transcription results
     """
     logger.debug(f"Transcribing audio with Whisper model size: {model_size}, language: {language}")
-    logger.debug(f"Audio data size: {len(audio_data) if audio_data else 0} bytes")
+    if isinstance(audio_data, (bytes, bytearray)):
+        logger.debug(f"Audio data size: {len(audio_data)} bytes")
     
-    global _whisper_model
+    if get_whisper_backend() == "transformers":
+        return _transcribe_with_transformers(audio_data, model_size, language)
     
     try:
         import whisper
         import numpy as np
-        import torch
         
-        # Create a temporary file for the audio data
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            temp_filename = temp_file.name
-            temp_file.write(audio_data)
-            logger.debug(f"Wrote audio data to temporary file: {temp_filename}")
+        # Get a file for ffmpeg to read (only copied when not already a path)
+        temp_filename, is_temporary = audio_to_path(audio_data)
         
         try:
-            # Use the pre-initialized model or initialize it if needed
-            model = _whisper_model
+            # Decode with ffmpeg on the CPU before taking the inference lock, so decoding
+            # of one request overlaps with another request's GPU work
+            start_time = time.time()
+            audio = whisper.load_audio(temp_filename)
+            logger.debug(f"Decoded {len(audio) / whisper.audio.SAMPLE_RATE:.2f}s of audio in {time.time() - start_time:.2f} seconds")
             
-            # If the model is not initialized or a different size is requested, initialize it
-            if model is None or (hasattr(model, 'model_size') and model.model_size != model_size):
-                logger.debug(f"Initializing Whisper model on-demand with size: {model_size}")
-                start_time = time.time()
-                model = whisper.load_model(model_size)
-                load_time = time.time() - start_time
-                logger.debug(f"Loaded Whisper model in {load_time:.2f} seconds")
-                
-                # Update the global model if it's the standard size
-                if model_size == get_whisper_model_size():
-                    _whisper_model = model
+            model = _get_whisper_model(model_size)
             
             # Transcribe the audio
             logger.debug(f"Starting transcription...")
             start_time = time.time()
-            result = model.transcribe(
-                temp_filename,
-                language=language if language != "auto" else None,
-                fp16=torch.cuda.is_available()
-            )
+            with _inference_lock:
+                result = model.transcribe(
+                    audio,
+                    language=language if language != "auto" else None,
+                    fp16=model.device.type == "cuda"
+                )
             transcription_time = time.time() - start_time
             logger.debug(f"Transcription completed in {transcription_time:.2f} seconds")
             
@@ -200,7 +530,6 @@ def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, An
             
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
-            import traceback
             logger.error(traceback.format_exc())
             return {
                 "error": f"Error transcribing audio: {str(e)}",
@@ -208,12 +537,13 @@ def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, An
             }
         finally:
             # Clean up the temporary file
-            try:
-                os.unlink(temp_filename)
-                logger.debug(f"Removed temporary file: {temp_filename}")
-            except:
-                logger.warning(f"Failed to remove temporary file: {temp_filename}")
-                pass
+            if is_temporary:
+                try:
+                    os.unlink(temp_filename)
+                    logger.debug(f"Removed temporary file: {temp_filename}")
+                except:
+                    logger.warning(f"Failed to remove temporary file: {temp_filename}")
+                    pass
     
     except ImportError as e:
         logger.error(f"Failed to import required module: {str(e)}")
@@ -223,13 +553,412 @@ def transcribe_audio(audio_data, model_size=None, language=None) -> Dict[str, An
         }
     except Exception as e:
         logger.error(f"Error setting up transcription: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             "error": f"Error setting up transcription: {str(e)}",
             "text": ""
         }
 
+# True inside the inference worker process, which must transcribe locally
+_inference_worker_mode = False
+
+def set_inference_worker_mode(enabled):
+    """Mark this process as the inference worker (see inference_worker.py)."""
+    global _inference_worker_mode
+    _inference_worker_mode = enabled
+
+class BatchedTranscriber:
+    """
+    Dynamic micro-batcher in front of the Transformers Whisper pipeline.
+    
+    Concurrent requests are queued and a single worker thread coalesces up to
+    max_batch of them (waiting at most max_wait_ms for more to arrive) into one
+    pipeline call, so the GPU streams the weights once per batch instead of once
+    per request. Audio is decoded in the caller's thread before queuing.
+    
+    openai-whisper has no batched API, so with that backend submit() simply
+    calls transcribe_audio().
+    """
+    
+    def __init__(self, max_batch=16, max_wait_ms=30):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def submit(self, audio_data, model_size=None, language=None) -> Dict[str, Any]:
+        """
+        Transcribe audio, batching it with other concurrent requests when possible.
+        
+        Args:
+            audio_data: Audio as bytes, a file path, or a binary file-like object
+            model_size: Whisper model size
+            language: Language code
+            
+        Returns:
+            Dictionary with transcription results (same shape as transcribe_audio)
+        """
+        if model_size is None:
+            model_size = get_whisper_model_size()
+        if language is None:
+            language = get_default_language()
+        
+        # Forward to the persistent inference worker process when one is configured
+        if os.environ.get("WHISPER_WORKER_ADDRESS") and not _inference_worker_mode:
+            from llm_control.voice.inference_worker import transcribe_remote
+            return transcribe_remote(audio_data, model_size, language)
+        
+        if get_whisper_backend() != "transformers":
+            return transcribe_audio(audio_data, model_size, language)
+        
+        try:
+            from transformers.pipelines.audio_utils import ffmpeg_read
+            pipe = _get_transformers_pipeline(model_size, language)
+            audio = ffmpeg_read(_audio_to_bytes(audio_data), pipe.feature_extractor.sampling_rate)
+        except Exception as e:
+            logger.error(f"Error preparing audio for batched transcription: {str(e)}")
+            return {
+                "error": f"Error transcribing audio: {str(e)}",
+                "text": ""
+            }
+        
+        self._ensure_worker()
+        item = {
+            "audio": audio,
+            "model_size": model_size,
+            "language": language,
+            "event": threading.Event(),
+            "result": None
+        }
+        self._queue.put(item)
+        item["event"].wait()
+        return item["result"]
+    
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True, name="whisper-batcher")
+                self._worker.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Only requests for the same model and language can share a pipeline call
+            groups = {}
+            for item in batch:
+                groups.setdefault((item["model_size"], item["language"]), []).append(item)
+            
+            for (model_size, language), items in groups.items():
+                try:
+                    pipe = _get_transformers_pipeline(model_size, language)
+                    results = _run_transformers_batch(pipe, [item["audio"] for item in items], language)
+                    if len(items) > 1:
+                        logger.debug(f"Transcribed a batch of {len(items)} requests")
+                except Exception as e:
+                    logger.error(f"Error in batched transcription: {str(e)}")
+                    logger.error(traceback.format_exc())
+                    results = [{"error": f"Error transcribing audio: {str(e)}", "text": ""}] * len(items)
+                
+                for item, result in zip(items, results):
+                    item["result"] = result
+                    item["event"].set()
+
+batched_transcriber = BatchedTranscriber(
+    max_batch=int(os.environ.get("WHISPER_MAX_BATCH", "16")),
+    max_wait_ms=int(os.environ.get("WHISPER_MAX_WAIT_MS", "30"))
+)
+
+# Streaming transcription sessions (used by /voice-command/stream)
+STREAM_SAMPLE_RATE = 16000
+# Whisper decodes 30 s windows; keeping the buffer under that bounds per-call cost and VRAM
+STREAM_MAX_BUFFER_SECONDS = 30
+STREAM_SESSION_TIMEOUT = 300  # Drop idle sessions after 5 minutes
+# webm/ogg streams are re-decoded as a whole on each chunk; cap them so that cost stays bounded
+# (2 MiB is several minutes of Opus speech)
+STREAM_MAX_ENCODED_BYTES = int(os.environ.get("STREAM_MAX_ENCODED_BYTES", str(2 * 1024 * 1024)))
+
+_stream_sessions = {}
+_stream_sessions_lock = threading.Lock()
+
+def stream_transcription_unsupported_reason():
+    """
+    Explain why streaming transcription is unavailable with the configured backend.
+    
+    Streaming needs the in-process openai-whisper model (word timestamps on a
+    numpy buffer); the transformers pipeline and the remote inference worker
+    only transcribe complete uploads.
+    
+    Returns:
+        Error message, or None if streaming is supported
+    """
+    if os.environ.get("WHISPER_WORKER_ADDRESS") and not _inference_worker_mode:
+        return "Streaming transcription is not supported with a remote inference worker (WHISPER_WORKER_ADDRESS); use /voice-command instead"
+    if get_whisper_backend() == "transformers":
+        return "Streaming transcription is not supported with WHISPER_BACKEND=transformers; use /voice-command instead"
+    return None
+
+def _decode_audio_chunk(audio_data, raw_pcm=False):
+    """
+    Decode audio to 16 kHz mono float32 samples.
+    
+    Args:
+        audio_data: Audio data as bytes (any format ffmpeg understands, or raw PCM)
+        raw_pcm: If True, audio_data is raw signed 16-bit little-endian 16 kHz mono PCM
+        
+    Returns:
+        numpy float32 array of samples
+    """
+    import numpy as np
+    
+    if raw_pcm:
+        usable = len(audio_data) - (len(audio_data) % 2)
+        return np.frombuffer(audio_data[:usable], dtype=np.int16).astype(np.float32) / 32768.0
+    
+    import whisper
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
+        temp_filename = temp_file.name
+        temp_file.write(audio_data)
+    try:
+        return whisper.load_audio(temp_filename, sr=STREAM_SAMPLE_RATE)
+    finally:
+        try:
+            os.unlink(temp_filename)
+        except OSError:
+            logger.warning(f"Failed to remove temporary file: {temp_filename}")
+
+def _is_self_contained_chunk(audio_data, raw_pcm=False):
+    """Return True if a streamed chunk decodes on its own (raw PCM or a complete WAV file)."""
+    return raw_pcm or audio_data[:4] == b'RIFF'
+
+def _decode_stream_chunk(session, audio_data, raw_pcm=False, final=False):
+    """
+    Decode the new samples carried by a streaming chunk.
+    
+    Raw PCM and WAV chunks are self-contained and decoded one by one. Compressed
+    containers (webm/ogg from MediaRecorder) only have their header in the first
+    chunk, so their bytes are accumulated per session and the whole stream is
+    decoded again, keeping only the samples past what was already returned
+    (the caller enforces STREAM_MAX_ENCODED_BYTES on the accumulated bytes).
+    
+    Args:
+        session: Streaming session dict
+        audio_data: Audio chunk as bytes
+        raw_pcm: If True, audio_data is raw 16-bit 16 kHz mono PCM
+        final: If True, a decoding failure is an error instead of a partial chunk
+        
+    Returns:
+        numpy float32 array of new samples (empty if more data is needed)
+    """
+    import numpy as np
+    
+    if _is_self_contained_chunk(audio_data, raw_pcm):
+        return _decode_audio_chunk(audio_data, raw_pcm=raw_pcm)
+    
+    session["encoded"] += audio_data
+    try:
+        samples = _decode_audio_chunk(session["encoded"])
+    except Exception as e:
+        if final:
+            raise
+        # A chunk can end mid-frame; wait for the next one
+        logger.debug(f"Could not decode streamed audio yet: {str(e)}")
+        return np.zeros(0, dtype=np.float32)
+    
+    new_samples = samples[session["decoded"]:]
+    session["decoded"] = len(samples)
+    return new_samples
+
+def _expire_stream_sessions():
+    """Remove streaming sessions that have been idle longer than STREAM_SESSION_TIMEOUT."""
+    now = time.time()
+    with _stream_sessions_lock:
+        expired = [sid for sid, session in _stream_sessions.items()
+                   if now - session["updated"] > STREAM_SESSION_TIMEOUT]
+        for sid in expired:
+            del _stream_sessions[sid]
+    if expired:
+        logger.debug(f"Expired {len(expired)} idle streaming session(s)")
+
+def _commit_point(segment):
+    """Return the time (seconds) at which a segment starts, preferring its first word timestamp."""
+    words = segment.get("words") or []
+    if words and words[0].get("start") is not None:
+        return words[0]["start"]
+    return segment.get("start", 0.0)
+
+def _transcribe_stream_window(session_id, session, samples, model_size, language):
+    """
+    Transcribe a window of streamed samples with the shared Whisper model.
+    
+    Args:
+        session_id: Identifier of the streaming session (for logging)
+        session: Streaming session dict (provides the committed text as prompt)
+        samples: numpy float32 samples, at most STREAM_MAX_BUFFER_SECONDS long
+        model_size: Whisper model size
+        language: Language code
+        
+    Returns:
+        List of Whisper segments
+    """
+    model = _get_whisper_model(model_size)
+    
+    start_time = time.time()
+    with _inference_lock:
+        result = model.transcribe(
+            samples,
+            language=language if language != "auto" else None,
+            fp16=model.device.type == "cuda",
+            word_timestamps=True,
+            condition_on_previous_text=False,
+            initial_prompt=" ".join(session["committed"])[-200:] or None
+        )
+    logger.debug(f"Stream {session_id}: transcribed {len(samples) / STREAM_SAMPLE_RATE:.2f}s in {time.time() - start_time:.2f} seconds")
+    
+    session["language"] = result.get("language", language)
+    return result.get("segments", [])
+
+def transcribe_stream_chunk(session_id, audio_data, model_size=None, language=None,
+                            final=False, raw_pcm=False) -> Dict[str, Any]:
+    """
+    Append an audio chunk to a streaming session and transcribe the pending buffer.
+    
+    Only the unconfirmed tail of the dictation is kept in memory: after each Whisper call
+    every segment except the last is committed and the buffer is trimmed to the start of
+    the last segment, so the cost of each call stays bounded on long dictations. If the
+    tail grows past STREAM_MAX_BUFFER_SECONDS (e.g. no pause in the speech), the first
+    window is transcribed and committed before the buffer is trimmed.
+    
+    Chunks may be raw PCM, self-contained WAV files, or consecutive pieces of one
+    compressed stream (webm/ogg), which is decoded as a whole on each call. A compressed
+    stream is rejected once it grows past STREAM_MAX_ENCODED_BYTES ("buffer_full" in the
+    result); the session is kept so the client can still finish it with final=True.
+    
+    Streaming is only available with the in-process openai-whisper backend; see
+    stream_transcription_unsupported_reason().
+    
+    Args:
+        session_id: Identifier of the streaming session
+        audio_data: Audio chunk as bytes (may be empty, e.g. for the final call)
+        model_size: Whisper model size
+        language: Language code
+        final: If True, commit everything that is left and close the session
+        raw_pcm: If True, audio_data is raw 16-bit 16 kHz mono PCM
+        
+    Returns:
+        Dictionary with committed text, tentative text and buffer length
+    """
+    if model_size is None:
+        model_size = get_whisper_model_size()
+    if language is None:
+        language = get_default_language()
+    
+    unsupported = stream_transcription_unsupported_reason()
+    if unsupported:
+        return {"error": unsupported, "session_id": session_id, "text": ""}
+    
+    _expire_stream_sessions()
+    
+    try:
+        import numpy as np
+        
+        with _stream_sessions_lock:
+            session = _stream_sessions.setdefault(session_id, {
+                "buffer": np.zeros(0, dtype=np.float32),
+                "encoded": b"",
+                "decoded": 0,
+                "committed": [],
+                "language": None,
+                "lock": threading.Lock(),
+                "updated": time.time(),
+            })
+        
+        with session["lock"]:
+            session["updated"] = time.time()
+            
+            if (audio_data and not _is_self_contained_chunk(audio_data, raw_pcm)
+                    and len(session["encoded"]) + len(audio_data) > STREAM_MAX_ENCODED_BYTES):
+                logger.warning(f"Stream {session_id}: encoded audio over {STREAM_MAX_ENCODED_BYTES} bytes, rejecting chunk")
+                return {
+                    "error": f"Streamed recording exceeds {STREAM_MAX_ENCODED_BYTES} bytes; send final=true to finish the dictation, or stream raw PCM/WAV chunks",
+                    "session_id": session_id,
+                    "text": "",
+                    "buffer_full": True
+                }
+            
+            if audio_data:
+                samples = _decode_stream_chunk(session, audio_data, raw_pcm=raw_pcm, final=final)
+                session["buffer"] = np.concatenate([session["buffer"], samples])
+            
+            # Never feed Whisper more than one window: commit the oldest window first
+            max_samples = STREAM_MAX_BUFFER_SECONDS * STREAM_SAMPLE_RATE
+            while len(session["buffer"]) > max_samples:
+                segments = _transcribe_stream_window(session_id, session, session["buffer"][:max_samples],
+                                                     model_size, language)
+                cut = int(_commit_point(segments[-1]) * STREAM_SAMPLE_RATE) if len(segments) > 1 else 0
+                if cut > 0:
+                    session["committed"].extend(seg.get("text", "").strip() for seg in segments[:-1])
+                else:
+                    session["committed"].extend(seg.get("text", "").strip() for seg in segments)
+                    cut = max_samples
+                logger.debug(f"Stream {session_id}: buffer over {STREAM_MAX_BUFFER_SECONDS}s, committed {cut / STREAM_SAMPLE_RATE:.2f}s of audio")
+                session["buffer"] = session["buffer"][cut:]
+            
+            tentative_text = ""
+            if len(session["buffer"]) > 0:
+                segments = _transcribe_stream_window(session_id, session, session["buffer"], model_size, language)
+                
+                if final:
+                    session["committed"].extend(seg.get("text", "").strip() for seg in segments)
+                    session["buffer"] = session["buffer"][:0]
+                elif len(segments) > 1:
+                    # Commit all but the last segment and trim the buffer to where it starts
+                    session["committed"].extend(seg.get("text", "").strip() for seg in segments[:-1])
+                    cut = int(_commit_point(segments[-1]) * STREAM_SAMPLE_RATE)
+                    session["buffer"] = session["buffer"][cut:]
+                    tentative_text = segments[-1].get("text", "").strip()
+                elif segments:
+                    tentative_text = segments[0].get("text", "").strip()
+            
+            committed_text = " ".join(t for t in session["committed"] if t)
+            response = {
+                "session_id": session_id,
+                "text": " ".join(t for t in (committed_text, tentative_text) if t),
+                "committed_text": committed_text,
+                "tentative_text": tentative_text,
+                "language": session["language"] or language,
+                "buffer_seconds": len(session["buffer"]) / STREAM_SAMPLE_RATE,
+                "final": final
+            }
+        
+        if final:
+            with _stream_sessions_lock:
+                _stream_sessions.pop(session_id, None)
+        
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error transcribing stream chunk: {str(e)}")
+        logger.error(traceback.format_exc())
+        if final:
+            with _stream_sessions_lock:
+                _stream_sessions.pop(session_id, None)
+        return {
+            "error": f"Error transcribing stream chunk: {str(e)}",
+            "session_id": session_id,
+            "text": ""
+        }
+
 def translate_text(text, model=None, ollama_host=None) -> Optional[str]:
     """
     Translate text using the Ollama LLM.
@@ -287,6 +1016,5 @@ def translate_text(text, model=None, ollama_host=None) -> Optional[str]:
     
     except Exception as e:
         logger.error(f"Error translating text: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return None
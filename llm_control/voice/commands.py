@@ -7,19 +7,20 @@ This module handles command parsing, validation, and execution.
 import os
 import sys
 import logging
+import traceback
 import json
 import re
+import threading
+import copy
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional, Tuple, Union
 import time
 
 # Configure logging
 logger = logging.getLogger("voice-control-commands")
 
-# Set up debug mode based on environment variable
-DEBUG = os.environ.get("DEBUG", "").lower() in ("true", "1", "yes")
-
 # Import from our modules
-from llm_control.voice.utils import clean_llm_response, get_screenshot_dir, cleanup_old_screenshots
+from llm_control.voice.utils import clean_llm_response, get_screenshot_dir, DEBUG
 from llm_control.voice.screenshots import capture_screenshot_with_name
 from llm_control.voice.feedback import summarize_screen_delta_v2
 from llm_control.voice.prompts import (
@@ -52,6 +53,62 @@ def get_ollama_model():
 def get_ollama_host():
     return os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 
+# LRU cache of generated pipeline results, keyed by (command, model, ollama_host). Repeated voice
+# commands ("abrir chrome", "presiona enter") skip the LLM and only run the execution step.
+PLAN_CACHE_SIZE = int(os.environ.get("PLAN_CACHE_SIZE", "512"))
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+def _plan_cache_key(command, model, ollama_host):
+    return ((command or "").strip(), model, ollama_host)
+
+def get_cached_plan(command, model, ollama_host):
+    """Return a copy of the cached pipeline result for the command, or None on a miss."""
+    key = _plan_cache_key(command, model, ollama_host)
+    with _plan_cache_lock:
+        plan = _plan_cache.get(key)
+        if plan is None:
+            return None
+        _plan_cache.move_to_end(key)
+    # Callers attach the plan to their result and may modify it; keep the cached one intact
+    return copy.deepcopy(plan)
+
+def store_plan(command, model, ollama_host, pipeline_result):
+    """
+    Cache a pipeline result if it can be safely replayed.
+
+    Only successful plans that did not depend on the current screen contents (no
+    OCR/UI detection, so no screen coordinates baked into the code) are cached.
+
+    Returns:
+        True if the plan was cached
+    """
+    if PLAN_CACHE_SIZE <= 0:
+        return False
+    if not pipeline_result.get("success", False) or not pipeline_result.get("code"):
+        return False
+    ui_description = pipeline_result.get("ui_description") or {}
+    if not ui_description.get("screenshot_skipped", False):
+        return False
+
+    key = _plan_cache_key(command, model, ollama_host)
+    with _plan_cache_lock:
+        _plan_cache[key] = copy.deepcopy(pipeline_result)
+        _plan_cache.move_to_end(key)
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return True
+
+def invalidate_plan(command, model, ollama_host):
+    """Drop a cached plan, e.g. after it failed to execute."""
+    with _plan_cache_lock:
+        _plan_cache.pop(_plan_cache_key(command, model, ollama_host), None)
+
+def clear_plan_cache():
+    """Drop all cached plans."""
+    with _plan_cache_lock:
+        _plan_cache.clear()
+
 # Import from our own modules if available
 try:
     from llm_control.llm.simple_executor import execute_command_with_llm
@@ -112,7 +169,7 @@ def validate_pyautogui_cmd(cmd):
                     part = part[:part.find('#')].strip()
                 
                 # Skip common imports and utility lines
-                if part.startswith('import ') or part.startswith('from ') or part.startswith('print('):
+                if part.startswith(('import ', 'from ', 'print(')):
                     continue
                 
                 # Check if this part contains any allowed functions
@@ -141,7 +198,7 @@ def validate_pyautogui_cmd(cmd):
                 continue
         
         # Skip common imports and utility lines
-        if line.startswith('import ') or line.startswith('from ') or line.startswith('print('):
+        if line.startswith(('import ', 'from ', 'print(')):
             continue
         
         # Check if line contains any allowed functions
@@ -258,7 +315,6 @@ def split_command_into_steps(command, model=None):
         
     except Exception as e:
         logger.error(f"Error splitting command into steps: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return None
 
@@ -362,7 +418,6 @@ def identify_ocr_targets(steps, model=None):
         
     except Exception as e:
         logger.error(f"Error identifying OCR targets: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return [{"step": step, "needs_ocr": False} for step in steps]
 
@@ -500,7 +555,6 @@ def generate_pyautogui_actions(steps_with_targets, model=None):
         
     except Exception as e:
         logger.error(f"Error generating PyAutoGUI actions: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return []
 
@@ -530,15 +584,6 @@ def get_ui_snapshot(steps_with_targets):
     try:
         import pyautogui
         
-        # Clean up old screenshots before capturing a new one
-        max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
-        max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
-        cleanup_count, cleanup_error = cleanup_old_screenshots(max_age_days, max_count)
-        if cleanup_error:
-            logger.warning(f"Error cleaning up screenshots before capture: {cleanup_error}")
-        else:
-            logger.debug(f"Cleaned up {cleanup_count} old screenshots before capture")
-        
         # Capture screenshot using helper function
         timestamp = int(time.time())
         screenshot_path = capture_screenshot_with_name(f"temp_screenshot_{timestamp}.png")
@@ -904,7 +949,16 @@ def process_command_pipeline(command, model=None):
     return result
 
 # Wrap execute_command_with_llm to add more logging
-def execute_command_with_logging(command, model=None, ollama_host=None):
+def _notify_progress(progress_callback, event, data):
+    """Call a progress callback, never letting its failures affect command execution."""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(event, data)
+    except Exception as error:
+        logger.warning(f"Progress callback failed for event '{event}': {error}")
+
+def execute_command_with_logging(command, model=None, ollama_host=None, progress_callback=None):
     if model is None:
         model = get_ollama_model()
     if ollama_host is None:
@@ -916,9 +970,12 @@ def execute_command_with_logging(command, model=None, ollama_host=None):
         command: The command to execute
         model: The LLM model to use
         ollama_host: The Ollama API host
+        progress_callback: Optional callable(event, data) notified when the pipeline
+            has produced code ("pipeline") and when execution has finished ("executed")
         
     Returns:
-        Dictionary with the execution results
+        Dictionary with the execution results; "cache_hit" is True when the
+        generated code came from the plan cache instead of the LLM pipeline
     """
     logger.debug(f"Executing command with logging: '{command}'")
 
@@ -937,27 +994,32 @@ def execute_command_with_logging(command, model=None, ollama_host=None):
     screen_summary = ""
     ok = False
 
-    result = {"success": False, "command": command}
+    result = {"success": False, "command": command, "cache_hit": False}
     code_for_summary = None
+    cache_hit = False
 
     logger.info("Capturing screenshots before and after command execution for consistent change detection")
     if any(c in command for c in ['á', 'é', 'í', 'ó', 'ú', 'ñ', 'ü', '¿', '¡']):
         logger.info("Command contains special characters that will be sanitized for typing")
 
     try:
-        pipeline_result = process_command_pipeline(command, model=model)
+        pipeline_result = get_cached_plan(command, model, ollama_host)
+        cache_hit = pipeline_result is not None
+        if cache_hit:
+            logger.info(f"Plan cache hit for command '{command}', skipping LLM pipeline")
+        else:
+            pipeline_result = process_command_pipeline(command, model=model)
+            store_plan(command, model, ollama_host, pipeline_result)
         result["pipeline"] = pipeline_result
+        result["cache_hit"] = cache_hit
+        _notify_progress(progress_callback, "pipeline", {
+            "success": pipeline_result.get("success", False),
+            "steps": pipeline_result.get("steps", []),
+            "code": pipeline_result.get("code")
+        })
 
         # BEFORE screenshot (si aplica)
         if capture_screenshot:
-            max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
-            max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
-            cleanup_count, cleanup_error = cleanup_old_screenshots(max_age_days, max_count)
-            if cleanup_error:
-                logger.warning(f"Error cleaning up screenshots before 'before' capture: {cleanup_error}")
-            else:
-                logger.debug(f"Cleaned up {cleanup_count} old screenshots before 'before' capture")
-
             before_path = capture_screenshot_with_name(f"before_{int(time.time())}.png")
             if before_path:
                 logger.info(f"Captured before-execution screenshot: {before_path}")
@@ -1025,17 +1087,21 @@ def execute_command_with_logging(command, model=None, ollama_host=None):
             code_for_summary = fallback.get("code")
 
     except Exception as e:
-        import traceback
         logger.error(f"Error in execute_command_with_logging: {str(e)}")
         logger.error(traceback.format_exc())
+        # Never replay a plan that failed to execute
+        invalidate_plan(command, model, ollama_host)
         result = {
             "success": False,
             "command": command,
             "error": str(e),
+            "cache_hit": cache_hit,
         }
         ok = False
 
     finally:
+        _notify_progress(progress_callback, "executed", {"success": ok, "error": result.get("error")})
+        
         # AFTER screenshot (si aplica)
         if capture_screenshot:
             try:
@@ -1045,16 +1111,8 @@ def execute_command_with_logging(command, model=None, ollama_host=None):
                     logger.info(f"Captured after-execution screenshot: {after_path}")
                 else:
                     logger.warning("Failed to capture after-execution screenshot")
-
-                max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
-                max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
-                cleanup_count, cleanup_error = cleanup_old_screenshots(max_age_days, max_count)
-                if cleanup_error:
-                    logger.warning(f"Error cleaning up screenshots after capture: {cleanup_error}")
-                else:
-                    logger.debug(f"Cleaned up {cleanup_count} old screenshots after capture")
             except Exception as error:
-                logger.warning(f"Failed during after-screenshot/cleanup: {error}")
+                logger.warning(f"Failed during after-screenshot: {error}")
 
         # Summary
         try:
@@ -0,0 +1,183 @@
+"""
+Persistent Whisper inference worker.
+
+Runs in its own process, loads the Whisper model once at startup and serves
+transcription requests over a Unix domain socket, so web server processes can be
+restarted or scaled without reloading model weights or duplicating VRAM.
+
+Start it with:
+
+    WHISPER_WORKER_ADDRESS=/tmp/llm-control-whisper.sock python -m llm_control.voice.inference_worker
+
+and set the same WHISPER_WORKER_ADDRESS for the voice server, which then forwards
+transcriptions to the worker (see audio.BatchedTranscriber.submit). With
+WHISPER_WORKER_AUTOSTART=true the voice server launches the worker itself.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import subprocess
+from multiprocessing.connection import Listener, Client
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger("voice-control-inference-worker")
+
+from llm_control.voice import audio
+
+# Configuration getter functions (read dynamically from environment)
+def get_whisper_worker_address():
+    return os.environ.get("WHISPER_WORKER_ADDRESS") or None
+
+def get_whisper_worker_authkey():
+    authkey = os.environ.get("WHISPER_WORKER_AUTHKEY")
+    return authkey.encode("utf-8") if authkey else None
+
+def get_whisper_worker_autostart():
+    return os.environ.get("WHISPER_WORKER_AUTOSTART", "false").lower() in ("true", "1", "yes")
+
+def transcribe_remote(audio_data, model_size=None, language=None, address=None) -> Dict[str, Any]:
+    """
+    Transcribe audio through the inference worker.
+
+    Args:
+        audio_data: Audio as bytes, a file path, or a binary file-like object
+        model_size: Whisper model size
+        language: Language code
+        address: Worker socket path (defaults to WHISPER_WORKER_ADDRESS)
+
+    Returns:
+        Dictionary with transcription results (same shape as audio.transcribe_audio)
+    """
+    address = address or get_whisper_worker_address()
+    try:
+        payload = audio._audio_to_bytes(audio_data)
+        with Client(address, authkey=get_whisper_worker_authkey()) as conn:
+            conn.send({
+                "op": "transcribe",
+                "audio": payload,
+                "model_size": model_size,
+                "language": language
+            })
+            return conn.recv()
+    except Exception as e:
+        logger.error(f"Error transcribing audio through inference worker at {address}: {str(e)}")
+        return {
+            "error": f"Error transcribing audio: inference worker unavailable ({str(e)})",
+            "text": ""
+        }
+
+def ping_worker(address=None, timeout=1.0) -> bool:
+    """Return True if an inference worker is answering on the given address."""
+    address = address or get_whisper_worker_address()
+    if not address or not os.path.exists(address):
+        return False
+    try:
+        with Client(address, authkey=get_whisper_worker_authkey()) as conn:
+            conn.send({"op": "ping"})
+            if not conn.poll(timeout):
+                return False
+            return conn.recv().get("status") == "ok"
+    except Exception:
+        return False
+
+def start_inference_worker(startup_timeout=300) -> Optional[subprocess.Popen]:
+    """
+    Launch the inference worker as a child process and wait until it answers.
+
+    Args:
+        startup_timeout: Seconds to wait for the model to load
+
+    Returns:
+        The worker process, or None if a worker was already running or it failed to start
+    """
+    address = get_whisper_worker_address()
+    if not address:
+        return None
+    if ping_worker(address):
+        logger.info(f"Inference worker already running at {address}")
+        return None
+
+    process = subprocess.Popen([sys.executable, "-m", "llm_control.voice.inference_worker"], env=os.environ.copy())
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            logger.error(f"Inference worker exited during startup with code {process.returncode}")
+            return None
+        if ping_worker(address):
+            logger.info(f"Inference worker started at {address} (pid {process.pid})")
+            return process
+        time.sleep(0.5)
+
+    logger.error(f"Inference worker did not become ready within {startup_timeout}s")
+    return process
+
+def _handle_connection(conn):
+    """Serve requests from one client connection until it closes."""
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            op = message.get("op")
+            if op == "ping":
+                conn.send({"status": "ok"})
+            elif op == "transcribe":
+                conn.send(audio.batched_transcriber.submit(
+                    message["audio"],
+                    message.get("model_size"),
+                    message.get("language")
+                ))
+            else:
+                conn.send({"error": f"Unknown operation: {op}", "text": ""})
+
+def serve(address=None):
+    """
+    Load the Whisper model and serve transcription requests forever.
+
+    Each connection is handled on its own thread so concurrent requests reach the
+    batched transcriber together.
+
+    Args:
+        address: Unix socket path (defaults to WHISPER_WORKER_ADDRESS)
+    """
+    address = address or get_whisper_worker_address()
+    if not address:
+        raise ValueError("WHISPER_WORKER_ADDRESS is not set")
+
+    # Transcribe locally in this process instead of forwarding back to ourselves
+    audio.set_inference_worker_mode(True)
+
+    model_size = audio.get_whisper_model_size()
+    logger.info(f"Loading Whisper model ({model_size}) in inference worker...")
+    if audio.initialize_whisper_model(model_size) is None:
+        logger.warning("Whisper model failed to preload; it will be loaded on first request")
+
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(address):
+        os.unlink(address)
+
+    old_umask = os.umask(0o077)
+    try:
+        listener = Listener(address, authkey=get_whisper_worker_authkey())
+    finally:
+        os.umask(old_umask)
+
+    logger.info(f"Inference worker listening on {address}")
+    with listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logger.warning(f"Rejected inference worker connection: {str(e)}")
+                continue
+            threading.Thread(target=_handle_connection, args=(conn,), daemon=True).start()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    serve()
@@ -7,8 +7,12 @@ This module handles capturing, storing, and serving screenshots.
 import os
 import time
 import logging
+import traceback
 import base64
 import io
+import uuid
+import threading
+from types import MappingProxyType
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
@@ -16,45 +20,271 @@ from datetime import datetime
 logger = logging.getLogger("voice-control-screenshots")
 
 # Import from our modules
-from llm_control.voice.utils import get_screenshot_dir, error_response, cors_preflight, DEBUG, is_debug_mode, cleanup_old_screenshots
+from llm_control.voice.utils import get_screenshot_dir, error_response, DEBUG, is_debug_mode, cleanup_old_screenshots, is_screenshot_file
 
-def capture_screenshot():
+# Supported encodings for captured screenshots: format -> (extension, PIL format, save options)
+SCREENSHOT_FORMATS = MappingProxyType({
+    # zlib level 1: much faster than the default level 6 for a slightly larger file
+    "png": (".png", "PNG", {"compress_level": 1, "optimize": False}),
+    "jpg": (".jpg", "JPEG", {"quality": 85}),
+    "webp": (".webp", "WEBP", {"quality": 80, "method": 4}),
+})
+# Lookup tables built once: accepted names (including aliases) and file extensions
+_SCREENSHOT_FORMAT_NAMES = MappingProxyType({**{fmt: fmt for fmt in SCREENSHOT_FORMATS}, "jpeg": "jpg"})
+_SCREENSHOT_FORMAT_BY_EXT = MappingProxyType({ext: fmt for fmt, (ext, _, _) in SCREENSHOT_FORMATS.items()})
+
+# Process-wide screenshot suspension (e.g. while the unlock flow types a password).
+# A counter so overlapping suspensions nest; every capture function checks it, so
+# captures from concurrent requests are blocked too
+_screenshot_suspend_count = 0
+_screenshot_suspend_lock = threading.Lock()
+
+def suspend_screenshots():
+    """Stop all screenshot captures until a matching resume_screenshots() call."""
+    global _screenshot_suspend_count
+    with _screenshot_suspend_lock:
+        _screenshot_suspend_count += 1
+
+def resume_screenshots():
+    """Undo one suspend_screenshots() call."""
+    global _screenshot_suspend_count
+    with _screenshot_suspend_lock:
+        _screenshot_suspend_count = max(0, _screenshot_suspend_count - 1)
+        resumed = _screenshot_suspend_count == 0
+    if resumed:
+        # Frames grabbed while suspended (or just before) must never be handed out
+        with _ring_condition:
+            _ring[:] = [None] * _ring_size
+
+def screenshots_suspended():
+    """Return True while screenshot captures are suspended."""
+    with _screenshot_suspend_lock:
+        return _screenshot_suspend_count > 0
+
+def resolve_screenshot_format(name):
+    """Return the SCREENSHOT_FORMATS key for a format name (case-insensitive, 'jpeg' accepted), or None."""
+    return _SCREENSHOT_FORMAT_NAMES.get(name.lower()) if name else None
+
+def get_default_screenshot_format():
+    """Format for captures that don't ask for one (SCREENSHOT_FORMAT, default webp)."""
+    return resolve_screenshot_format(os.environ.get("SCREENSHOT_FORMAT", "webp")) or "png"
+
+def _format_from_filename(filename):
+    """Return the SCREENSHOT_FORMATS key matching a filename's extension, if any."""
+    return _SCREENSHOT_FORMAT_BY_EXT.get(os.path.splitext(filename)[1].lower())
+
+# Optional mss ring buffer: one thread grabs the screen at SCREENSHOT_RING_FPS and
+# captures hand out the latest frame instead of grabbing the screen per request
+try:
+    import mss
+except ImportError:
+    mss = None
+
+_ring_size = max(1, int(os.environ.get("SCREENSHOT_RING_SIZE", "4")))
+_ring = [None] * _ring_size  # (timestamp, mss ScreenShot)
+_ring_index = 0
+_ring_fps = 0.0
+_ring_condition = threading.Condition()
+_ring_thread = None
+
+def _ring_loop(fps):
+    """Grab the screen into the ring buffer at a fixed rate (runs in a daemon thread)."""
+    global _ring_index
+    interval = 1.0 / fps
+    with mss.mss() as sct:
+        monitor = sct.monitors[0]  # All monitors, like pyautogui.screenshot()
+        while True:
+            started = time.time()
+            try:
+                if not screenshots_suspended():
+                    shot = sct.grab(monitor)
+                    with _ring_condition:
+                        # Drop the frame if a suspension started while it was being grabbed
+                        if not screenshots_suspended():
+                            _ring[_ring_index] = (started, shot)
+                            _ring_index = (_ring_index + 1) % _ring_size
+                            _ring_condition.notify_all()
+            except Exception as e:
+                logger.warning(f"Screenshot ring grab failed: {str(e)}")
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+def start_screenshot_ring(fps=None):
+    """
+    Start the background screen grabber if SCREENSHOT_RING_FPS (or fps) is set.
+    
+    Args:
+        fps: Frames per second (defaults to env var SCREENSHOT_RING_FPS, 0 = disabled)
+        
+    Returns:
+        bool: True if the ring buffer is running
+    """
+    global _ring_thread, _ring_fps
+    if fps is None:
+        fps = float(os.environ.get("SCREENSHOT_RING_FPS", "0"))
+    if fps <= 0:
+        return False
+    if mss is None:
+        logger.warning("SCREENSHOT_RING_FPS is set but mss is not installed; capturing per request")
+        return False
+    if _ring_thread is None:
+        _ring_fps = fps
+        _ring_thread = threading.Thread(target=_ring_loop, args=(fps,), daemon=True, name="screenshot-ring")
+        _ring_thread.start()
+        logger.info(f"Screenshot ring buffer started at {fps} fps ({_ring_size} frames)")
+    return True
+
+def _latest_ring_frame():
+    """Return the newest (timestamp, shot) in the ring, or None. Caller holds _ring_condition."""
+    return _ring[(_ring_index - 1) % _ring_size]
+
+def grab_screen(newer_than=None):
+    """
+    Grab the screen as a PIL image.
+    
+    Uses the ring buffer when it is running, otherwise pyautogui.
+    
+    Args:
+        newer_than: If set, only accept a ring frame captured after this time.time()
+                    (used when the screen must reflect an action that just ran)
+        
+    Returns:
+        PIL image of the screen
+    """
+    if _ring_thread is not None:
+        from PIL import Image
+        max_age = 2.0 / _ring_fps
+        with _ring_condition:
+            frame = _latest_ring_frame()
+            if newer_than is not None:
+                deadline = time.time() + max_age
+                while (frame is None or frame[0] < newer_than) and time.time() < deadline:
+                    _ring_condition.wait(deadline - time.time())
+                    frame = _latest_ring_frame()
+        if frame is not None and time.time() - frame[0] <= max_age and (newer_than is None or frame[0] >= newer_than):
+            shot = frame[1]
+            return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+        logger.debug("No fresh frame in screenshot ring, grabbing directly")
+    
+    import pyautogui
+    return pyautogui.screenshot()
+
+def save_screenshot_image(image, full_path, fmt="png", quality=None, write=True):
+    """
+    Encode and save a screenshot image in the requested format.
+    
+    The image is encoded in memory and written with a single write, and the
+    encoded bytes are returned so callers can use them without reading the file back.
+    
+    Args:
+        image: PIL image to save
+        full_path: Destination path
+        fmt: One of SCREENSHOT_FORMATS ('png', 'jpg', 'webp')
+        quality: Optional quality override (1-100) for lossy formats
+        write: Write the file; with False only the encoded bytes are returned
+            (the caller persists them later with write_screenshot_file)
+        
+    Returns:
+        The encoded image bytes
+    """
+    _, pil_format, options = SCREENSHOT_FORMATS[fmt]
+    if quality is not None and "quality" in options:
+        options = {**options, "quality": quality}
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    start_time = time.time()
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, **options)
+    data = buffer.getvalue()
+    logger.debug(f"Encoded {fmt} screenshot ({len(data)} bytes) in {time.time() - start_time:.3f} seconds")
+    if write:
+        with open(full_path, "wb") as f:
+            f.write(data)
+    return data
+
+def write_screenshot_file(full_path, data):
+    """
+    Write already-encoded screenshot bytes to disk.
+    
+    Args:
+        full_path: Destination path
+        data: Encoded image bytes
+    """
+    with open(full_path, "wb") as f:
+        f.write(data)
+    invalidate_screenshot_listing()
+
+def new_screenshot_filename(fmt=None) -> str:
+    """
+    Generate a unique filename for a new screenshot.
+    
+    The timestamp prefix keeps files sortable and matched by cleanup; the random
+    suffix lets callers hand out the URL before the file is written.
+    
+    Args:
+        fmt: Image format, determines the extension (defaults to SCREENSHOT_FORMAT)
+    
+    Returns:
+        Filename such as screenshot_20240101_120000_1a2b3c4d.webp
+    """
+    if fmt is None:
+        fmt = get_default_screenshot_format()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"screenshot_{timestamp}_{uuid.uuid4().hex[:8]}{SCREENSHOT_FORMATS[fmt][0]}"
+
+def capture_screenshot(filename=None, fmt=None, newer_than=None, return_data=False, quality=None, write=True):
     """
     Capture a screenshot of the entire screen.
     
+    Args:
+        filename: Optional filename to save to (generated if not given)
+        fmt: Image format ('png', 'jpg' or 'webp'); defaults to the filename's
+            extension, or SCREENSHOT_FORMAT (webp) for generated names
+        newer_than: Only use a ring buffer frame grabbed after this time.time()
+        return_data: Also return the encoded image bytes
+        quality: Optional quality override (1-100) for jpg/webp
+        write: Save the file; with False the caller persists the returned data
+            (requires return_data)
+    
     Returns:
-        Tuple of (filename, filepath, success)
+        Tuple of (filename, filepath, success), or (filename, filepath, success, data)
+        when return_data is True
     """
+    if screenshots_suspended():
+        logger.debug("Screenshots are suspended, skipping capture")
+        result = (None, None, False, None)
+    else:
+        result = _capture_screenshot(filename, fmt, newer_than, quality, write=write or not return_data)
+    return result if return_data else result[:3]
+
+def _capture_screenshot(filename, fmt, newer_than, quality=None, write=True):
+    """Capture and save a screenshot; returns (filename, filepath, success, data)."""
     logger.debug("Capturing screenshot of entire screen")
     
+    if fmt is None:
+        fmt = (filename and _format_from_filename(filename)) or get_default_screenshot_format()
+    
     try:
-        # Try to import pyautogui
-        try:
-            import pyautogui
-            logger.debug("Successfully imported pyautogui")
-        except ImportError:
-            logger.error("Failed to import pyautogui")
-            return None, None, False
-        
         # Get the screenshot directory
         screenshot_dir = get_screenshot_dir()
         logger.debug(f"Using screenshot directory: {screenshot_dir}")
         
         # Generate a filename based on timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"screenshot_{timestamp}.png"
+        if filename is None:
+            filename = new_screenshot_filename(fmt)
         full_path = os.path.join(screenshot_dir, filename)
         logger.debug(f"Screenshot will be saved to: {full_path}")
         
         # Take the screenshot
         start_time = time.time()
-        screenshot = pyautogui.screenshot()
+        screenshot = grab_screen(newer_than)
         capture_time = time.time() - start_time
         logger.debug(f"Screenshot captured in {capture_time:.3f} seconds")
         
         # Save the screenshot
-        screenshot.save(full_path)
-        logger.debug(f"Screenshot saved successfully to {full_path}")
+        data = save_screenshot_image(screenshot, full_path, fmt, quality, write=write)
+        if write:
+            invalidate_screenshot_listing()
+            logger.debug(f"Screenshot saved successfully to {full_path}")
         
         # Log some information about the image
         if DEBUG:
@@ -62,13 +292,12 @@ def capture_screenshot():
             width, height = screenshot.size
             logger.debug(f"Screenshot dimensions: {width}x{height} pixels")
         
-        return filename, full_path, True
+        return filename, full_path, True, data
     
     except Exception as e:
         logger.error(f"Error capturing screenshot: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
-        return None, None, False
+        return None, None, False, None
 
 def capture_screenshot_with_name(filename: str) -> Optional[str]:
     """
@@ -80,13 +309,15 @@ def capture_screenshot_with_name(filename: str) -> Optional[str]:
     Returns:
         Full path to the saved screenshot, or None if failed
     """
+    if screenshots_suspended():
+        logger.debug(f"Screenshots are suspended, not capturing {filename}")
+        return None
+    
     try:
-        import pyautogui
-        
         screenshot_dir = get_screenshot_dir()
         full_path = os.path.join(screenshot_dir, filename)
         
-        screenshot = pyautogui.screenshot()
+        screenshot = grab_screen(newer_than=time.time())
         screenshot.save(full_path)
         logger.debug(f"Screenshot saved to {full_path}")
         
@@ -111,6 +342,10 @@ def capture_with_highlight(x=None, y=None, width=20, height=20, color='red'):
     """
     logger.debug(f"Capturing screenshot with highlight at ({x}, {y}), size={width}x{height}, color={color}")
     
+    if screenshots_suspended():
+        logger.debug("Screenshots are suspended, skipping highlighted capture")
+        return None, None, False
+    
     try:
         # Try to import pyautogui and PIL
         try:
@@ -151,7 +386,7 @@ def capture_with_highlight(x=None, y=None, width=20, height=20, color='red'):
         # Take the screenshot
         logger.debug("Capturing screenshot")
         start_time = time.time()
-        screenshot = pyautogui.screenshot()
+        screenshot = grab_screen()
         capture_time = time.time() - start_time
         logger.debug(f"Screenshot captured in {capture_time:.3f} seconds")
         
@@ -187,10 +422,78 @@ def capture_with_highlight(x=None, y=None, width=20, height=20, color='red'):
     
     except Exception as e:
         logger.error(f"Error capturing highlighted screenshot: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return None, None, False
 
+# Directory listings are cached briefly so clients polling /screenshots/* don't
+# rescan and stat the whole directory on every request
+SCREENSHOT_LIST_TTL = 0.5  # seconds
+_listing_cache = {}  # screenshot_dir -> (scanned_at, entries)
+_listing_cache_lock = threading.Lock()
+
+def invalidate_screenshot_listing():
+    """Drop cached directory listings, e.g. after screenshots are written or deleted."""
+    with _listing_cache_lock:
+        _listing_cache.clear()
+
+def _scan_screenshots(screenshot_dir):
+    """
+    List screenshot files with their stat data, newest first.
+    
+    Uses os.scandir so the stat results come with the directory entries, and
+    caches the result for SCREENSHOT_LIST_TTL seconds.
+    
+    Returns:
+        List of (filename, mtime, size) tuples
+    """
+    now = time.time()
+    with _listing_cache_lock:
+        cached = _listing_cache.get(screenshot_dir)
+        if cached is not None and now - cached[0] < SCREENSHOT_LIST_TTL:
+            return cached[1]
+    
+    entries = []
+    try:
+        with os.scandir(screenshot_dir) as it:
+            for entry in it:
+                if not is_screenshot_file(entry.name):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    # Deleted between listing and stat
+                    logger.debug(f"Skipping screenshot {entry.name}: {str(e)}")
+                    continue
+                entries.append((entry.name, stat.st_mtime, stat.st_size))
+    except FileNotFoundError:
+        logger.error(f"Screenshot directory not found: {screenshot_dir}")
+        os.makedirs(screenshot_dir, exist_ok=True)
+        logger.debug(f"Created screenshot directory: {screenshot_dir}")
+    
+    # Sort by modification time (newest first)
+    entries.sort(key=lambda item: item[1], reverse=True)
+    
+    with _listing_cache_lock:
+        _listing_cache[screenshot_dir] = (now, entries)
+    return entries
+
+def count_screenshots(screenshot_dir=None):
+    """
+    Count screenshot files from the directory entries alone (no stat per file).
+    
+    Args:
+        screenshot_dir: Directory to count in (defaults to the screenshot directory)
+        
+    Returns:
+        Number of screenshot files
+    """
+    screenshot_dir = screenshot_dir or get_screenshot_dir()
+    try:
+        with os.scandir(screenshot_dir) as it:
+            return sum(1 for entry in it if is_screenshot_file(entry.name) and entry.is_file())
+    except FileNotFoundError:
+        return 0
+
 def get_latest_screenshots(limit=10):
     """
     Get a list of the latest screenshots.
@@ -208,30 +511,8 @@ def get_latest_screenshots(limit=10):
         screenshot_dir = get_screenshot_dir()
         logger.debug(f"Using screenshot directory: {screenshot_dir}")
         
-        # List all files in the screenshot directory
-        all_files = []
-        try:
-            all_files = os.listdir(screenshot_dir)
-            logger.debug(f"Found {len(all_files)} files in screenshot directory")
-        except FileNotFoundError:
-            logger.error(f"Screenshot directory not found: {screenshot_dir}")
-            os.makedirs(screenshot_dir, exist_ok=True)
-            logger.debug(f"Created screenshot directory: {screenshot_dir}")
-            return []
-        
-        # Filter out non-screenshot files - include all supported patterns
-        screenshots = [f for f in all_files if (f.startswith("screenshot_") or 
-                                               f.startswith("temp_") or 
-                                               f.startswith("before_") or 
-                                               f.startswith("after_")) and f.endswith(".png")]
-        logger.debug(f"Found {len(screenshots)} screenshot files")
-        
-        # Sort by modification time (newest first)
-        screenshots.sort(key=lambda x: os.path.getmtime(os.path.join(screenshot_dir, x)), reverse=True)
-        logger.debug("Screenshots sorted by modification time (newest first)")
-        
         # Limit the results
-        limited_screenshots = screenshots[:limit]
+        limited_screenshots = [filename for filename, _, _ in _scan_screenshots(screenshot_dir)[:limit]]
         logger.debug(f"Limited to {len(limited_screenshots)} screenshots")
         
         # Log the filenames if in debug mode
@@ -243,7 +524,6 @@ def get_latest_screenshots(limit=10):
     
     except Exception as e:
         logger.error(f"Error getting latest screenshots: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return []
 
@@ -252,7 +532,7 @@ def list_all_screenshots():
     List all screenshots with metadata.
     
     Returns:
-        List of dictionaries with screenshot metadata
+        List of dictionaries with screenshot metadata, newest first
     """
     logger.debug("Listing all screenshots with metadata")
     
@@ -261,58 +541,22 @@ def list_all_screenshots():
         screenshot_dir = get_screenshot_dir()
         logger.debug(f"Using screenshot directory: {screenshot_dir}")
         
-        # List all files in the screenshot directory
-        all_files = []
-        try:
-            all_files = os.listdir(screenshot_dir)
-            logger.debug(f"Found {len(all_files)} files in screenshot directory")
-        except FileNotFoundError:
-            logger.error(f"Screenshot directory not found: {screenshot_dir}")
-            os.makedirs(screenshot_dir, exist_ok=True)
-            logger.debug(f"Created screenshot directory: {screenshot_dir}")
-            return []
-        
-        # Filter out non-screenshot files - include all supported patterns
-        screenshots = [f for f in all_files if (f.startswith("screenshot_") or 
-                                               f.startswith("temp_") or 
-                                               f.startswith("before_") or 
-                                               f.startswith("after_")) and f.endswith(".png")]
-        logger.debug(f"Found {len(screenshots)} screenshot files")
-        
-        # Get metadata for each screenshot
-        result = []
-        for filename in screenshots:
-            full_path = os.path.join(screenshot_dir, filename)
-            try:
-                # Get file metadata
-                stat = os.stat(full_path)
-                
-                # Check if it's a highlight screenshot
-                is_highlight = "highlight" in filename
-                
-                # Add to result
-                result.append({
-                    "filename": filename,
-                    "timestamp": stat.st_mtime,
-                    "size": stat.st_size,
-                    "highlight": is_highlight,
-                    "date": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-                })
-                
-                if DEBUG:
-                    logger.debug(f"Screenshot metadata: {filename}, {stat.st_size} bytes, created at {datetime.fromtimestamp(stat.st_mtime)}")
-            except Exception as e:
-                logger.warning(f"Error getting metadata for {filename}: {str(e)}")
-        
-        # Sort by modification time (newest first)
-        result.sort(key=lambda x: x["timestamp"], reverse=True)
+        result = [
+            {
+                "filename": filename,
+                "timestamp": mtime,
+                "size": size,
+                "highlight": "highlight" in filename,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(mtime))
+            }
+            for filename, mtime, size in _scan_screenshots(screenshot_dir)
+        ]
         logger.debug(f"Returning metadata for {len(result)} screenshots, sorted by time")
         
         return result
     
     except Exception as e:
         logger.error(f"Error listing all screenshots: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return []
 
@@ -321,8 +565,8 @@ def manual_cleanup_screenshots(max_age_days=None, max_count=None):
     Manually trigger cleanup of old screenshots.
     
     Args:
-        max_age_days: Maximum age in days for screenshots (defaults to env var SCREENSHOT_MAX_AGE_DAYS or 7)
-        max_count: Maximum number of screenshots to keep (defaults to env var SCREENSHOT_MAX_COUNT or 100)
+        max_age_days: Maximum age in days for screenshots (defaults to SCREENSHOT_MAX_AGE_DAYS, 1)
+        max_count: Maximum number of screenshots to keep (defaults to SCREENSHOT_MAX_COUNT, 10)
         
     Returns:
         Dictionary with cleanup results
@@ -332,10 +576,10 @@ def manual_cleanup_screenshots(max_age_days=None, max_count=None):
     try:
         # Call the cleanup function - it will use environment variables if parameters are None
         deleted_count, error = cleanup_old_screenshots(max_age_days, max_count)
+        invalidate_screenshot_listing()
         
         # Get the current screenshot count
-        screenshots = list_all_screenshots()
-        current_count = len(screenshots)
+        current_count = count_screenshots()
         
         # Build the response
         result = {
@@ -353,7 +597,6 @@ def manual_cleanup_screenshots(max_age_days=None, max_count=None):
         
     except Exception as e:
         logger.error(f"Error in manual cleanup: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             "success": False,
@@ -408,6 +651,5 @@ def get_screenshot_data(filename, format='base64'):
     
     except Exception as e:
         logger.error(f"Error getting screenshot data: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return None
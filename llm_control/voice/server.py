@@ -6,23 +6,35 @@ This module provides a Flask web server for voice command processing.
 
 # Set CUDA device explicitly before any imports that might use CUDA
 import os
-os.environ["CUDA_VISIBLE_DEVICES"] = "0"  # Use the first GPU
+# Use the first GPU unless the user pinned devices explicitly (e.g. WHISPER_DEVICE=cuda:1
+# needs the second GPU to stay visible)
+if "CUDA_VISIBLE_DEVICES" not in os.environ and not os.environ.get("WHISPER_DEVICE"):
+    os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 # Add more CUDA environment settings to help with initialization
 os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"  # Match NVIDIA-SMI order
-os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "max_split_size_mb:512"  # Reduce memory fragmentation
+# Expandable segments let Whisper's variable-length activations grow in place instead of
+# fragmenting the cache; max_split_size_mb is kept as a fallback for older PyTorch builds.
+os.environ["PYTORCH_CUDA_ALLOC_CONF"] = "expandable_segments:True,max_split_size_mb:512"
 
 # Standard library imports
 import sys
 import time
 import logging
-import json
 import uuid
 import secrets
+import shutil
+import subprocess
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple, Union
 from functools import wraps
 import threading
+import atexit
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 import base64
+import io
+import gzip
+import mimetypes
 import tempfile
 import numpy as np
 
@@ -37,6 +49,38 @@ logger = logging.getLogger("voice-control-server")
 pending_updates_lock = threading.Lock()
 pending_updates: List[Dict[str, Any]] = []
 
+# ============================================
+# BACKGROUND SCREENSHOT CAPTURE
+# ============================================
+# Post-command screenshots run off the request path; the response
+# carries the URL right away and /screenshots/<filename> waits for the pending capture if needed
+_background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="screenshot")
+_pending_screenshots_lock = threading.Lock()
+_pending_screenshots: Dict[str, Any] = {}
+
+# Cleanup runs on its own single worker; requests made while a cleanup is already
+# queued are coalesced into it instead of queuing another directory scan
+_cleanup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-cleanup")
+_cleanup_pending = threading.Event()
+# Debounce: clean up at most every SCREENSHOT_CLEANUP_INTERVAL seconds, or sooner once
+# SCREENSHOT_CLEANUP_EVERY captures have accumulated (bounds overshoot of SCREENSHOT_MAX_COUNT)
+SCREENSHOT_CLEANUP_INTERVAL = 30.0
+SCREENSHOT_CLEANUP_EVERY = 20
+_cleanup_state_lock = threading.Lock()
+_last_cleanup_time = 0.0
+_captures_since_cleanup = 0
+
+# ============================================
+# BACKGROUND VOICE-COMMAND JOBS
+# ============================================
+# /voice-command with async=true returns a job id right away; progress and the final
+# result are polled from /voice-command/<job_id> or streamed from /voice-command/<job_id>/stream
+VOICE_JOB_TTL = 600  # Seconds to keep finished jobs
+_voice_job_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("VOICE_JOB_WORKERS", "2")),
+                                         thread_name_prefix="voice-job")
+_voice_jobs_condition = threading.Condition()
+_voice_jobs: Dict[str, Dict[str, Any]] = {}
+
 # Load environment variables from .env file if present
 try:
     from dotenv import load_dotenv
@@ -48,75 +92,158 @@ except Exception as e:
     logger.warning(f"Error loading .env file: {e}")
 
 try:
-    from flask import Flask, request, jsonify, send_file, abort, Response, render_template_string, redirect, make_response, send_from_directory
+    from flask import Flask, request, jsonify, send_file, abort, Response, render_template_string, redirect, make_response, send_from_directory, g
+    from flask.json.provider import DefaultJSONProvider
     from flask_cors import CORS
     logger.debug("Successfully imported Flask and Flask-CORS")
 except ImportError:
     logger.critical("Flask not installed. Please install flask and flask-cors.")
     sys.exit(1)
 
+# orjson is optional; it serializes large payloads (e.g. base64 screenshots) much faster.
+# ujson is used as a second choice, then the standard json module
+ujson = None
+try:
+    import orjson
+    logger.debug("Using orjson for JSON responses")
+except ImportError:
+    orjson = None
+    try:
+        import ujson
+        logger.debug("orjson not installed, using ujson for JSON responses")
+    except ImportError:
+        logger.debug("orjson/ujson not installed, using the standard json module")
+
+# flask-compress is optional; without it a small after_request hook gzips responses
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
 # Import from our own modules
-from llm_control.voice.utils import error_response, cors_preflight, add_cors_headers, test_cuda_availability, get_screenshot_dir
-from llm_control.voice.utils import is_debug_mode, configure_logging, DEBUG
+from llm_control.voice.utils import error_response, limit_content_length, test_cuda_availability, detect_nvidia_gpu, get_screenshot_dir, cleanup_old_screenshots, SCREENSHOT_MAX_AGE_DAYS, SCREENSHOT_MAX_COUNT
+from llm_control.voice.utils import is_debug_mode, configure_logging, DEBUG, HISTORY_MAX_AGE_DAYS, HISTORY_MAX_COUNT
 from llm_control.voice.utils import add_to_command_history, get_command_history, get_command_history_file, get_latest_command_summary, clean_llm_response
-from llm_control.voice.audio import transcribe_audio, translate_text, initialize_whisper_model
-from llm_control.voice.screenshots import capture_screenshot, capture_with_highlight, get_latest_screenshots, list_all_screenshots, get_screenshot_data
+from llm_control.voice.inference_worker import get_whisper_worker_address, get_whisper_worker_autostart, start_inference_worker
+from llm_control.voice.audio import batched_transcriber, audio_to_path, translate_text, initialize_whisper_model, transcribe_stream_chunk, stream_transcription_unsupported_reason, is_audio_data
+from llm_control.voice.screenshots import capture_screenshot, capture_with_highlight, get_latest_screenshots, list_all_screenshots, count_screenshots, new_screenshot_filename, write_screenshot_file, get_default_screenshot_format, resolve_screenshot_format, suspend_screenshots, resume_screenshots, invalidate_screenshot_listing, SCREENSHOT_FORMATS, start_screenshot_ring
 from llm_control.voice.vnc import get_vnc_status, start_vnc_server, stop_vnc_server, ensure_vnc_running, register_shutdown_hook
-from llm_control.voice.commands import execute_command_with_logging, process_command_pipeline
+from llm_control.voice.commands import execute_command_with_logging, _notify_progress
 from llm_control.favorites.utils import save_as_favorite, get_favorites, delete_favorite, run_favorite
 from llm_control.utils.ollama import check_ollama_model_with_message, warmup_ollama_model
 from llm_control import structured_usage_log
 
-# Class to handle JSON serialization for NumPy types
-class CustomJSONEncoder(json.JSONEncoder):
-    """Custom JSON Encoder that handles NumPy types."""
-    def default(self, obj):
-        # Handle numpy types by converting them to Python native types
+def _json_default(obj):
+    """Convert NumPy arrays/scalars and datetimes that the JSON backend can't serialize natively."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson (or ujson) when available and understands NumPy types."""
+    
+    @staticmethod
+    def default(obj):
         try:
-            if isinstance(obj, np.integer):
-                return int(obj)
-            elif isinstance(obj, np.floating):
-                return float(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif isinstance(obj, np.bool_):
-                return bool(obj)
-        except ImportError:
-            pass
-        
-        # Let the base class default method handle other types or raise TypeError
-        return super().default(obj)
+            return _json_default(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs.get("indent"):
+            return orjson.dumps(obj, default=self.default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+        if ujson is not None and not kwargs.get("indent"):
+            return self._ujson_dumps(obj)
+        return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        # orjson parses request bodies (get_json) in C; its JSONDecodeError is a ValueError
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+    
+    def _ujson_dumps(self, obj):
+        # default only fires for values ujson can't encode natively (NumPy arrays/ints, datetimes)
+        return ujson.dumps(obj, default=self.default, ensure_ascii=False, escape_forward_slashes=False)
+    
+    def response(self, *args, **kwargs):
+        if (orjson is None and ujson is None) or (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return self._app.response_class(f"{self._ujson_dumps(obj)}\n", mimetype=self.mimetype)
+        # Hand the bytes straight to the response to skip a decode/encode round trip
+        body = orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
 
-def sanitize_for_json(obj):
+def _extract_executed_code(pipeline_code):
     """
-    Recursively sanitize an object for JSON serialization, converting NumPy types to native Python types.
+    Format the code a command pipeline executed for API responses and history.
     
     Args:
-        obj: The object to sanitize
+        pipeline_code: The pipeline's "code" entry: a string, or a dict with
+            "imports" and "raw" code (or per-step "steps" when there is no raw code)
         
     Returns:
-        The sanitized object safe for JSON serialization
+        The executed code as a single string ("" if there is none)
     """
-    try:
-        if isinstance(obj, dict):
-            return {k: sanitize_for_json(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [sanitize_for_json(item) for item in obj]
-        elif isinstance(obj, tuple):
-            return tuple(sanitize_for_json(item) for item in obj)
-        elif isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, np.bool_):
-            return bool(obj)
-        else:
-            return obj
-    except ImportError:
-        # If numpy isn't available, just return the object as is
-        return obj
+    if not pipeline_code:
+        return ""
+    if isinstance(pipeline_code, str):
+        return pipeline_code
+    if not isinstance(pipeline_code, dict):
+        return ""
+    
+    imports = pipeline_code.get('imports')
+    raw = pipeline_code.get('raw')
+    if raw is not None:
+        return f"{imports}\n\n{raw}" if imports is not None else raw
+    if imports is not None:
+        return imports
+    
+    # No raw code: reconstruct it from the individual steps
+    code_parts = []
+    for step in pipeline_code.get('steps') or []:
+        if 'original' in step:
+            code_parts.append(f"# {step['original']}")
+        if 'code' in step:
+            code_parts.append(step['code'])
+    return '\n\n'.join(code_parts)
+
+def _track_pending_screenshot(filename, future):
+    """Let /screenshots/<filename> wait for a screenshot still being written in the background."""
+    with _pending_screenshots_lock:
+        _pending_screenshots[filename] = future
+    
+    def _done(_):
+        with _pending_screenshots_lock:
+            _pending_screenshots.pop(filename, None)
+    future.add_done_callback(_done)
+
+def schedule_screenshot_capture():
+    """
+    Capture a screenshot in the background.
+    
+    Returns:
+        Dictionary with the filename, filepath and URL the screenshot will be served from
+    """
+    filename = new_screenshot_filename()
+    g.schedule_screenshot_cleanup = True
+    # Only accept ring buffer frames grabbed after the command finished
+    future = _background_executor.submit(capture_screenshot, filename, newer_than=time.time())
+    _track_pending_screenshot(filename, future)
+    
+    return {
+        'filename': filename,
+        'filepath': os.path.join(get_screenshot_dir(), filename),
+        'url': f"/screenshots/{filename}"
+    }
 
 # Configuration getter functions (read dynamically from environment)
 def get_default_language():
@@ -134,6 +261,10 @@ def get_ollama_model():
 def get_ollama_host():
     return os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 
+def get_screenshot_accel_redirect():
+    """Internal nginx location that maps to SCREENSHOT_DIR (enables X-Accel-Redirect), or None."""
+    return os.environ.get("SCREENSHOT_ACCEL_REDIRECT") or None
+
 # Log initial configuration (for debugging)
 logger.debug(f"Configuration getters initialized (values read dynamically from environment)")
 logger.debug(f"- DEBUG: {DEBUG}")
@@ -143,18 +274,57 @@ app = Flask(__name__)
 # Use environment variable for secret key, generate secure random key if not set
 # WARNING: In production, set FLASK_SECRET_KEY environment variable to a secure random value
 app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(32))
-# Increase maximum content length for audio uploads (50MB)
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
-# Use the custom JSON encoder
-app.json.encoder = CustomJSONEncoder
+# Per-endpoint request body limits: audio uploads may be large, everything else is small JSON
+AUDIO_MAX_CONTENT_LENGTH = 50 * 1024 * 1024
+JSON_MAX_CONTENT_LENGTH = 1 * 1024 * 1024
+# App-wide ceiling (also covers chunked uploads that have no Content-Length)
+app.config['MAX_CONTENT_LENGTH'] = AUDIO_MAX_CONTENT_LENGTH
+# Serialize responses with orjson when available (handles NumPy types either way)
+app.json = FastJSONProvider(app)
 
-# Enable CORS for all routes
-CORS(app)
+# Enable CORS for all routes; flask_cors answers preflight OPTIONS requests and adds
+# the headers to every response from a single after_request hook
+CORS(app, resources={r"/*": {
+    "origins": "*",
+    "send_wildcard": True,
+    "allow_headers": ["Content-Type", "Authorization"],
+    "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+    "expose_headers": ["Content-Length", "Content-Disposition"],
+}})
 
-# Apply CORS headers to all responses
-@app.after_request
-def after_request(response):
-    return add_cors_headers(response)
+# Gzip JSON and HTML responses (history, favorites, base64 screenshots, the index
+# page). Level 1 keeps the CPU cost small while still shrinking text several times.
+COMPRESS_LEVEL = 1
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ['application/json', 'text/html']
+
+if Compress is not None:
+    app.config.update(
+        COMPRESS_ALGORITHM='gzip',
+        COMPRESS_LEVEL=COMPRESS_LEVEL,
+        COMPRESS_MIN_SIZE=COMPRESS_MIN_SIZE,
+        COMPRESS_MIMETYPES=COMPRESS_MIMETYPES,
+    )
+    Compress(app)
+else:
+    @app.after_request
+    def gzip_response(response):
+        """Gzip eligible responses for clients that accept it."""
+        if (response.direct_passthrough or response.is_streamed
+                or not 200 <= response.status_code < 300
+                or response.mimetype not in COMPRESS_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+            return response
+        
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        
+        response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
 
 # Import PyAutoGUI extensions from utils (already auto-executes on import)
 try:
@@ -176,7 +346,7 @@ def health_check():
     })
 
 @app.route('/transcribe', methods=['POST'])
-@cors_preflight
+@limit_content_length(AUDIO_MAX_CONTENT_LENGTH)
 def transcribe_endpoint():
     """Endpoint for transcribing audio to text."""
     try:
@@ -191,8 +361,15 @@ def transcribe_endpoint():
         if audio_file.filename == '':
             return error_response("Empty audio file", 400)
         
-        # Read the audio data
-        audio_data = audio_file.read()
+        # Reject non-audio uploads before reading the whole file
+        header = audio_file.stream.read(12)
+        audio_file.stream.seek(0)
+        if not is_audio_data(header):
+            return error_response("Unsupported file type: expected an audio file", 415)
+        
+        # Pass the upload stream through instead of reading it into memory
+        audio_data = audio_file.stream
+        audio_size = request.content_length or 0
         
         # Get the language from the request
         language = request.form.get('language', get_default_language())
@@ -202,7 +379,7 @@ def transcribe_endpoint():
         
         # Transcribe the audio
         transcription_start = time.time()
-        result = transcribe_audio(audio_data, model_size, language)
+        result = batched_transcriber.submit(audio_data, model_size, language)
         transcription_time = time.time() - transcription_start
         
         # Check if there was an error
@@ -220,7 +397,7 @@ def transcribe_endpoint():
             detected_language=detected_language,
             transcription_time=transcription_time,
             whisper_model_size=model_size,
-            audio_size_bytes=len(audio_data)
+            audio_size_bytes=audio_size
         )
         
         # Return the transcription
@@ -231,13 +408,11 @@ def transcribe_endpoint():
         })
     
     except Exception as e:
-        logger.error(f"Error transcribing audio: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error transcribing audio: {str(e)}")
         return error_response(f"Error transcribing audio: {str(e)}", 500)
 
 @app.route('/translate', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def translate_endpoint():
     """Endpoint for translating text to English."""
     try:
@@ -272,13 +447,11 @@ def translate_endpoint():
         })
     
     except Exception as e:
-        logger.error(f"Error translating text: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error translating text: {str(e)}")
         return error_response(f"Error translating text: {str(e)}", 500)
 
 @app.route('/command', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def command_endpoint():
     """Endpoint for executing a command."""
     try:
@@ -303,16 +476,13 @@ def command_endpoint():
         
         logger.info(f"Received command: '{command}'")
         
-        # Process command pipeline first to gather detailed debugging info
-        if DEBUG:
-            # Gather debug information by processing the command pipeline
-            pipeline_result = process_command_pipeline(command, model=model)
-            logger.debug(f"Command pipeline processed with success: {pipeline_result.get('success', False)}")
-        
         # Execute the command with enhanced logging
         execution_start = time.time()
         result = execute_command_with_logging(command, model=model, ollama_host=ollama_host)
-        execution_time = time.time() - execution_start
+        execution_end = time.time()
+        execution_time = execution_end - execution_start
+        # Commands take screenshots (OCR, before/after); trim them off the request path
+        schedule_screenshot_cleanup()
         logger.info(f"Command execution completed in {execution_time:.2f} seconds")
         
         # Add timing information
@@ -321,83 +491,307 @@ def command_endpoint():
         }
         
         # Extract the executed PyAutoGUI code and add it to the result
-        executed_code = ""
-        if 'pipeline' in result and 'code' in result['pipeline']:
-            pipeline_code = result['pipeline']['code']
-            if isinstance(pipeline_code, dict):
-                # Combine imports and raw code into a formatted string
-                code_parts = []
-                
-                # Add imports
-                if 'imports' in pipeline_code:
-                    code_parts.append(pipeline_code['imports'])
-                
-                # Add the raw code
-                if 'raw' in pipeline_code:
-                    code_parts.append(pipeline_code['raw'])
-                
-                # If no raw code but steps available, reconstruct from steps
-                elif 'steps' in pipeline_code and not code_parts:
-                    for step in pipeline_code['steps']:
-                        if 'original' in step:
-                            code_parts.append(f"# {step['original']}")
-                        if 'code' in step:
-                            code_parts.append(step['code'])
-                
-                executed_code = '\n\n'.join(code_parts)
-            elif isinstance(pipeline_code, str):
-                # If code is directly a string, use it as is
-                executed_code = pipeline_code
-                
-        # Add the executed code to the result
+        executed_code = _extract_executed_code((result.get('pipeline') or {}).get('code'))
         result['executed_code'] = executed_code
         
         # Store command in history
         command_history_data = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.fromtimestamp(execution_end).isoformat(),
             'command': command,
-            'steps': pipeline_result.get('steps', []) if 'pipeline_result' in locals() else [],
+            'steps': result.get('pipeline', {}).get('steps', []),
             'code': executed_code,
             'success': result.get('success', False),
             'screen_summary': result.get('screen_summary', '')
         }
         add_to_command_history(command_history_data)
         
-        # Capture a screenshot if requested
+        # Capture a screenshot if requested (written in the background)
         if capture_screenshot_flag:
-            filename, filepath, success = capture_screenshot()
-            if success and filepath:
-                result['screenshot'] = {
-                    'filename': filename,
-                    'filepath': filepath,
-                    'url': f"/screenshots/{filename}"
-                }
-                logger.info(f"Captured screenshot and saved to {filepath}")
+            result['screenshot'] = schedule_screenshot_capture()
+            logger.info(f"Scheduled screenshot capture to {result['screenshot']['filepath']}")
         
-        # Sanitize the result to ensure all values are JSON serializable
-        sanitized_result = sanitize_for_json(result)
-        
-        # Return the sanitized result
-        return jsonify(sanitized_result)
+        # The JSON provider serializes NumPy values directly
+        return jsonify(result)
     
     except Exception as e:
-        logger.error(f"Error executing command: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error executing command: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 "error": f"Error executing command: {str(e)}",
                 "status": "error",
-                "traceback": error_trace
+                "traceback": traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error executing command: {str(e)}", 500)
 
+def _process_voice_command(audio_data, audio_size, language, model_size, capture_screenshot_flag,
+                           progress_callback=None):
+    """
+    Transcribe a voice command and execute it.
+    
+    Shared by the synchronous /voice-command handler and background voice-command jobs.
+    
+    Args:
+        audio_data: Audio as bytes, a file path, or a binary file-like object
+        audio_size: Size of the upload in bytes (for logging)
+        language: Language code
+        model_size: Whisper model size
+        capture_screenshot_flag: Whether to capture a screenshot after execution
+        progress_callback: Optional callable(event, data) notified as each stage finishes
+        
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    # Log the start of voice command processing
+    logger.info(f"Processing voice command with language: {language}, model: {model_size}")
+    logger.debug(f"Audio upload size: {audio_size} bytes")
+    
+    # Transcribe the audio
+    transcription_start = time.time()
+    transcription_result = batched_transcriber.submit(audio_data, model_size, language)
+    transcription_time = time.time() - transcription_start
+    
+    # Check if there was an error
+    if 'error' in transcription_result and transcription_result['error']:
+        logger.error(f"Transcription error: {transcription_result['error']}")
+        return {"error": transcription_result['error'], "status": "error"}, 500
+    
+    return _execute_transcribed_command(transcription_result, transcription_time, audio_size, language,
+                                        model_size, capture_screenshot_flag, progress_callback)
+
+def _execute_transcribed_command(transcription_result, transcription_time, audio_size, language, model_size,
+                                 capture_screenshot_flag, progress_callback=None, session_id=None):
+    """
+    Execute a transcribed voice command, record it in the history and build the response.
+    
+    Shared by the upload (/voice-command) and streaming (/voice-command/stream) paths
+    once the audio has been transcribed.
+    
+    Args:
+        transcription_result: Transcription dict with 'text', 'language' and optionally 'segments'
+        transcription_time: Seconds spent transcribing
+        audio_size: Size of the audio in bytes (for logging)
+        language: Requested language code
+        model_size: Whisper model size
+        capture_screenshot_flag: Whether to capture a screenshot after execution
+        progress_callback: Optional callable(event, data) notified as each stage finishes
+        session_id: Streaming session id, when the audio was dictated in chunks
+        
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    # Get the transcribed text
+    transcribed_text = transcription_result.get('text', '')
+    detected_language = transcription_result.get('language', 'unknown')
+    
+    logger.info(f"Transcription completed in {transcription_time:.2f} seconds")
+    logger.info(f"Detected language: {detected_language}")
+    logger.info(f"Transcribed text: '{transcribed_text}'")
+    
+    _notify_progress(progress_callback, "transcription", {"text": transcribed_text, "language": detected_language})
+    
+    # Log structured event with transcription
+    structured_usage_log(
+        "voice_command.transcription",
+        transcription=transcribed_text,
+        detected_language=detected_language,
+        transcription_time=transcription_time,
+        whisper_model_size=model_size,
+        audio_size_bytes=audio_size,
+        **({'streamed': True, 'session_id': session_id} if session_id else {})
+    )
+    
+    # Skip empty transcription
+    if not transcribed_text:
+        logger.warning("No speech detected in audio")
+        return {"error": "No speech detected", "status": "error"}, 400
+    
+    # Translate if needed
+    command_text = transcribed_text
+    was_translated = False
+    translation_time = 0
+    
+    # Log detailed information about the command
+    logger.info(f"Processing command: '{command_text}'")
+    
+    # Execute the command with enhanced logging
+    execution_start = time.time()
+    result = execute_command_with_logging(command_text, model=get_ollama_model(), ollama_host=get_ollama_host(),
+                                          progress_callback=progress_callback)
+    execution_end = time.time()
+    execution_time = execution_end - execution_start
+    # Commands take screenshots (OCR, before/after); trim them off the request path
+    schedule_screenshot_cleanup()
+    
+    logger.info(f"Command execution completed in {execution_time:.2f} seconds")
+    logger.info(f"Command execution success: {result.get('success', False)}")
+    
+    # Log structured event for voice command completion with transcription
+    structured_usage_log(
+        "voice_command.complete",
+        transcription=transcribed_text,
+        command_text=command_text,
+        detected_language=detected_language,
+        execution_success=result.get('success', False),
+        transcription_time=transcription_time,
+        execution_time=execution_time,
+        total_time=transcription_time + execution_time
+    )
+    
+    # Add transcription information to result
+    result['transcription'] = {
+        'text': transcribed_text,
+        'language': detected_language,
+        'translated': was_translated,
+        'translated_text': command_text if was_translated else None,
+        'processing_time': {
+            'transcription': transcription_time,
+            'translation': translation_time if was_translated else 0,
+            'execution': execution_time,
+            'total': transcription_time + (translation_time if was_translated else 0) + execution_time
+        }
+    }
+    
+    if session_id:
+        result['transcription']['session_id'] = session_id
+    
+    # Add segments information if in debug mode
+    if DEBUG and 'segments' in transcription_result:
+        result['transcription']['segments'] = transcription_result['segments']
+    
+    # Include command processing pipeline information if in debug mode
+    if DEBUG and 'processed_steps' in result:
+        logger.info(f"Command processed into {len(result['processed_steps'])} steps")
+    
+    # Extract the executed PyAutoGUI code and add it to the result
+    executed_code = _extract_executed_code((result.get('pipeline') or {}).get('code'))
+    result['executed_code'] = executed_code
+    
+    # Store command in history
+    command_history_data = {
+        'timestamp': datetime.fromtimestamp(execution_end).isoformat(),
+        'command': command_text,
+        'steps': result.get('pipeline', {}).get('steps', []),
+        'code': executed_code,
+        'success': result.get('success', False),
+        'screen_summary': result.get('screen_summary', '')
+    }
+    add_to_command_history(command_history_data)
+        
+    # Add detailed debug information
+    if DEBUG:
+        # Create a debug section with all processing details
+        result['debug'] = {
+            'server_version': '1.0.0',
+            'timestamp': datetime.fromtimestamp(execution_end).isoformat(),
+            'environment': {
+                'whisper_model': get_whisper_model_size(),
+                'ollama_model': get_ollama_model(),
+                'ollama_host': get_ollama_host(),
+                'default_language': get_default_language(),
+                'translation_enabled': get_translation_enabled(),
+            },
+            'request': {
+                'audio_size': audio_size,
+                'language': language,
+                'model': model_size,
+                'capture_screenshot': capture_screenshot_flag
+            }
+        }
+        
+        # Add pipeline debugging info if available - including PyAutoGUI code
+        # (reuses the pipeline run by execute_command_with_logging instead of running it again)
+        pipeline_result = result.get('pipeline')
+        if pipeline_result:
+            result['debug']['pipeline'] = pipeline_result
+            
+            # Explicitly extract and format PyAutoGUI code for easier access
+            if 'code' in pipeline_result and pipeline_result['code']:
+                pyautogui_code = []
+                
+                # Add imports
+                if 'imports' in pipeline_result['code']:
+                    pyautogui_code.append(pipeline_result['code']['imports'])
+                
+                # Add step-by-step code
+                if 'steps' in pipeline_result['code']:
+                    for step in pipeline_result['code']['steps']:
+                        pyautogui_code.append(f"# {step.get('original', 'Step')}")
+                        pyautogui_code.append(step.get('code', ''))
+                
+                # Add the formatted code to the debug section
+                result['debug']['pyautogui_code'] = '\n\n'.join(pyautogui_code)
+    
+    # Capture a screenshot if requested (written in the background)
+    if capture_screenshot_flag:
+        result['screenshot'] = schedule_screenshot_capture()
+        logger.info(f"Scheduled screenshot capture to {result['screenshot']['filepath']}")
+    
+    return result, 200
+
+def _add_voice_job_event(job_id, event, data):
+    """Record a progress event for a voice-command job and wake up stream readers."""
+    with _voice_jobs_condition:
+        job = _voice_jobs.get(job_id)
+        if job is not None:
+            now = time.time()
+            job['events'].append({'event': event, 'data': data, 'timestamp': now})
+            job['updated'] = now
+            _voice_jobs_condition.notify_all()
+
+def _run_voice_command_job(job_id, audio_path, audio_size, language, model_size, capture_screenshot_flag):
+    """Run a queued voice command (on the job pool) and store its result."""
+    with _voice_jobs_condition:
+        _voice_jobs[job_id]['status'] = 'running'
+    try:
+        with app.app_context():
+            payload, status_code = _process_voice_command(
+                audio_path, audio_size, language, model_size, capture_screenshot_flag,
+                progress_callback=lambda event, data: _add_voice_job_event(job_id, event, data)
+            )
+    except Exception as e:
+        logger.exception(f"Error in voice-command job {job_id}: {str(e)}")
+        payload, status_code = {"error": f"Error processing voice command: {str(e)}", "status": "error"}, 500
+    finally:
+        try:
+            os.unlink(audio_path)
+        except OSError:
+            logger.warning(f"Failed to remove temporary file: {audio_path}")
+    
+    with _voice_jobs_condition:
+        job = _voice_jobs[job_id]
+        job['status'] = 'done' if status_code < 400 else 'error'
+        job['status_code'] = status_code
+        job['result'] = payload
+    _add_voice_job_event(job_id, 'result' if status_code < 400 else 'error', payload)
+
+def _submit_voice_command_job(audio_data, audio_size, language, model_size, capture_screenshot_flag):
+    """Queue a voice command for background processing and return a 202 response with its job id."""
+    # The upload stream is closed once the response is sent, so spool it to disk first
+    audio_path, _ = audio_to_path(audio_data)
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _voice_jobs_condition:
+        # Forget finished jobs that nobody collected
+        for stale_id in [jid for jid, job in _voice_jobs.items()
+                         if job['status'] in ('done', 'error') and now - job['updated'] > VOICE_JOB_TTL]:
+            del _voice_jobs[stale_id]
+        _voice_jobs[job_id] = {'status': 'queued', 'events': [], 'result': None,
+                               'status_code': None, 'created': now, 'updated': now}
+    _voice_job_executor.submit(_run_voice_command_job, job_id, audio_path, audio_size,
+                               language, model_size, capture_screenshot_flag)
+    logger.info(f"Queued voice-command job {job_id}")
+    return jsonify({
+        "status": "accepted",
+        "job_id": job_id,
+        "status_url": f"/voice-command/{job_id}",
+        "stream_url": f"/voice-command/{job_id}/stream"
+    }), 202
+
 @app.route('/voice-command', methods=['POST'])
-@cors_preflight
+@limit_content_length(AUDIO_MAX_CONTENT_LENGTH)
 def voice_command_endpoint():
     """Endpoint for processing and executing a voice command."""
     logger.info("Received voice-command request")
@@ -413,8 +807,15 @@ def voice_command_endpoint():
         if audio_file.filename == '':
             return error_response("Empty audio file", 400)
         
-        # Read the audio data
-        audio_data = audio_file.read()
+        # Reject non-audio uploads before reading the whole file
+        header = audio_file.stream.read(12)
+        audio_file.stream.seek(0)
+        if not is_audio_data(header):
+            return error_response("Unsupported file type: expected an audio file", 415)
+        
+        # Pass the upload stream through instead of reading it into memory
+        audio_data = audio_file.stream
+        audio_size = request.content_length or 0
         
         # Get the language from the request
         language = request.form.get('language', get_default_language())
@@ -425,217 +826,131 @@ def voice_command_endpoint():
         # Get screenshot option
         capture_screenshot_flag = request.form.get('capture_screenshot', 'true').lower() == 'true'
         
-        # Log the start of voice command processing
-        logger.info(f"Processing voice command with language: {language}, model: {model_size}")
-        logger.debug(f"Audio file size: {len(audio_data)} bytes")
+        if request.form.get('async', 'false').lower() == 'true':
+            return _submit_voice_command_job(audio_data, audio_size, language, model_size, capture_screenshot_flag)
         
-        # Transcribe the audio
-        transcription_start = time.time()
-        transcription_result = transcribe_audio(audio_data, model_size, language)
-        transcription_time = time.time() - transcription_start
-        
-        # Check if there was an error
-        if 'error' in transcription_result and transcription_result['error']:
-            logger.error(f"Transcription error: {transcription_result['error']}")
-            return error_response(transcription_result['error'], 500)
-        
-        # Get the transcribed text
-        transcribed_text = transcription_result.get('text', '')
-        detected_language = transcription_result.get('language', 'unknown')
-        
-        logger.info(f"Transcription completed in {transcription_time:.2f} seconds")
-        logger.info(f"Detected language: {detected_language}")
-        logger.info(f"Transcribed text: '{transcribed_text}'")
-        
-        # Log structured event with transcription
-        structured_usage_log(
-            "voice_command.transcription",
-            transcription=transcribed_text,
-            detected_language=detected_language,
-            transcription_time=transcription_time,
-            whisper_model_size=model_size,
-            audio_size_bytes=len(audio_data)
-        )
-        
-        # Skip empty transcription
-        if not transcribed_text:
-            logger.warning("No speech detected in audio")
-            return error_response("No speech detected", 400)
-        
-        # Translate if needed
-        command_text = transcribed_text
-        was_translated = False
-        translation_time = 0
-        
-        # Log detailed information about the command
-        logger.info(f"Processing command: '{command_text}'")
-        
-        # Process command pipeline first to gather detailed debugging info if in debug mode
-        if DEBUG:
-            # Gather debug information by processing the command pipeline
-            pipeline_result = process_command_pipeline(command_text, model=get_ollama_model())
-            logger.debug(f"Command pipeline processed with success: {pipeline_result.get('success', False)}")
-        
-        # Execute the command with enhanced logging
-        execution_start = time.time()
-        result = execute_command_with_logging(command_text, model=get_ollama_model(), ollama_host=get_ollama_host())
-        execution_time = time.time() - execution_start
-        
-        logger.info(f"Command execution completed in {execution_time:.2f} seconds")
-        logger.info(f"Command execution success: {result.get('success', False)}")
-        
-        # Log structured event for voice command completion with transcription
-        structured_usage_log(
-            "voice_command.complete",
-            transcription=transcribed_text,
-            command_text=command_text,
-            detected_language=detected_language,
-            execution_success=result.get('success', False),
-            transcription_time=transcription_time,
-            execution_time=execution_time,
-            total_time=transcription_time + execution_time
-        )
-        
-        # Add transcription information to result
-        result['transcription'] = {
-            'text': transcribed_text,
-            'language': detected_language,
-            'translated': was_translated,
-            'translated_text': command_text if was_translated else None,
-            'processing_time': {
-                'transcription': transcription_time,
-                'translation': translation_time if was_translated else 0,
-                'execution': execution_time,
-                'total': transcription_time + (translation_time if was_translated else 0) + execution_time
-            }
-        }
-        
-        # Add segments information if in debug mode
-        if DEBUG and 'segments' in transcription_result:
-            result['transcription']['segments'] = transcription_result['segments']
-        
-        # Include command processing pipeline information if in debug mode
-        if DEBUG and 'processed_steps' in result:
-            logger.info(f"Command processed into {len(result['processed_steps'])} steps")
-        
-        # Extract the executed PyAutoGUI code and add it to the result
-        executed_code = ""
-        if 'pipeline' in result and 'code' in result['pipeline']:
-            pipeline_code = result['pipeline']['code']
-            if isinstance(pipeline_code, dict):
-                # Combine imports and raw code into a formatted string
-                code_parts = []
-                
-                # Add imports
-                if 'imports' in pipeline_code:
-                    code_parts.append(pipeline_code['imports'])
-                
-                # Add the raw code
-                if 'raw' in pipeline_code:
-                    code_parts.append(pipeline_code['raw'])
-                
-                # If no raw code but steps available, reconstruct from steps
-                elif 'steps' in pipeline_code and not code_parts:
-                    for step in pipeline_code['steps']:
-                        if 'original' in step:
-                            code_parts.append(f"# {step['original']}")
-                        if 'code' in step:
-                            code_parts.append(step['code'])
-                
-                executed_code = '\n\n'.join(code_parts)
-            elif isinstance(pipeline_code, str):
-                # If code is directly a string, use it as is
-                executed_code = pipeline_code
-                
-        # Add the executed code to the result
-        result['executed_code'] = executed_code
-        
-        # Store command in history
-        command_history_data = {
-            'timestamp': datetime.now().isoformat(),
-            'command': command_text,
-            'steps': result.get('pipeline', {}).get('steps', []),
-            'code': executed_code,
-            'success': result.get('success', False),
-            'screen_summary': result.get('screen_summary', '')
-        }
-        add_to_command_history(command_history_data)
-            
-        # Add detailed debug information
-        if DEBUG:
-            # Create a debug section with all processing details
-            result['debug'] = {
-                'server_version': '1.0.0',
-                'timestamp': datetime.now().isoformat(),
-                'environment': {
-                    'whisper_model': get_whisper_model_size(),
-                    'ollama_model': get_ollama_model(),
-                    'ollama_host': get_ollama_host(),
-                    'default_language': get_default_language(),
-                    'translation_enabled': get_translation_enabled(),
-                },
-                'request': {
-                    'audio_size': len(audio_data),
-                    'language': language,
-                    'model': model_size,
-                    'capture_screenshot': capture_screenshot_flag
-                }
-            }
-            
-            # Add pipeline debugging info if available - including PyAutoGUI code
-            if 'pipeline_result' in locals() and pipeline_result:
-                result['debug']['pipeline'] = pipeline_result
-                
-                # Explicitly extract and format PyAutoGUI code for easier access
-                if 'code' in pipeline_result and pipeline_result['code']:
-                    pyautogui_code = []
-                    
-                    # Add imports
-                    if 'imports' in pipeline_result['code']:
-                        pyautogui_code.append(pipeline_result['code']['imports'])
-                    
-                    # Add step-by-step code
-                    if 'steps' in pipeline_result['code']:
-                        for step in pipeline_result['code']['steps']:
-                            pyautogui_code.append(f"# {step.get('original', 'Step')}")
-                            pyautogui_code.append(step.get('code', ''))
-                    
-                    # Add the formatted code to the debug section
-                    result['debug']['pyautogui_code'] = '\n\n'.join(pyautogui_code)
-        
-        # Capture a screenshot if requested
-        if capture_screenshot_flag:
-            filename, filepath, success = capture_screenshot()
-            if success and filepath:
-                result['screenshot'] = {
-                    'filename': filename,
-                    'filepath': filepath,
-                    'url': f"/screenshots/{filename}"
-                }
-                logger.info(f"Captured screenshot and saved to {filepath}")
-        
-        # Sanitize the result to ensure all values are JSON serializable
-        sanitized_result = sanitize_for_json(result)
-        
-        # Return the sanitized result
-        return jsonify(sanitized_result)
+        payload, status_code = _process_voice_command(audio_data, audio_size, language, model_size, capture_screenshot_flag)
+        return jsonify(payload), status_code
     
     except Exception as e:
-        logger.error(f"Error processing voice command: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error processing voice command: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 "error": f"Error processing voice command: {str(e)}",
                 "status": "error",
-                "traceback": error_trace
+                "traceback": traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error processing voice command: {str(e)}", 500)
 
+@app.route('/voice-command/<job_id>', methods=['GET'])
+def voice_command_job_endpoint(job_id):
+    """Endpoint for polling the status and result of an async voice-command job."""
+    with _voice_jobs_condition:
+        job = _voice_jobs.get(job_id)
+        if job is None:
+            return error_response(f"Job not found: {job_id}", 404)
+        response_data = {
+            "job_id": job_id,
+            "status": job['status'],
+            "events": list(job['events']),
+            "result": job['result']
+        }
+    return jsonify(response_data)
+
+@app.route('/voice-command/<job_id>/stream', methods=['GET'])
+def voice_command_job_stream_endpoint(job_id):
+    """Endpoint streaming the progress events of an async voice-command job as Server-Sent Events."""
+    with _voice_jobs_condition:
+        if job_id not in _voice_jobs:
+            return error_response(f"Job not found: {job_id}", 404)
+    
+    def generate():
+        sent = 0
+        while True:
+            with _voice_jobs_condition:
+                job = _voice_jobs.get(job_id)
+                if job is None:
+                    return
+                if sent >= len(job['events']) and job['status'] not in ('done', 'error'):
+                    _voice_jobs_condition.wait(timeout=15)
+                events = job['events'][sent:]
+                finished = job['status'] in ('done', 'error')
+            if not events and not finished:
+                # Keep-alive comment so proxies don't close an idle stream
+                yield ": keep-alive\n\n"
+            for item in events:
+                yield f"event: {item['event']}\ndata: {app.json.dumps(item['data'])}\n\n"
+            sent += len(events)
+            if finished and not events:
+                return
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/voice-command/stream', methods=['POST'])
+@limit_content_length(AUDIO_MAX_CONTENT_LENGTH)
+def voice_command_stream_endpoint():
+    """
+    Endpoint for streaming dictation.
+    
+    The client sends audio chunks (raw body, optionally with Transfer-Encoding: chunked,
+    or an 'audio' file field) tagged with a session_id. Chunks are raw PCM (audio/pcm),
+    self-contained WAV files, or consecutive pieces of one webm/ogg recording. Each call
+    returns the text transcribed so far; the call with final=true executes the full command.
+    Requires the in-process openai-whisper backend (501 otherwise).
+    """
+    unsupported = stream_transcription_unsupported_reason()
+    if unsupported:
+        return error_response(unsupported, 501)
+    
+    try:
+        params = request.args if request.args else request.form
+        session_id = params.get('session_id') or uuid.uuid4().hex
+        final = params.get('final', 'false').lower() == 'true'
+        language = params.get('language', get_default_language())
+        model_size = params.get('model', get_whisper_model_size())
+        capture_screenshot_flag = params.get('capture_screenshot', 'true').lower() == 'true'
+        
+        # Accept either a multipart upload or the raw (possibly chunked) request body
+        if 'audio' in request.files:
+            audio_data = request.files['audio'].read()
+        else:
+            audio_data = request.get_data()
+        raw_pcm = request.mimetype in ('audio/pcm', 'audio/l16')
+        if audio_data and not raw_pcm and not is_audio_data(audio_data[:12]):
+            return error_response("Unsupported file type: expected an audio file or audio/pcm", 415)
+        
+        if not audio_data and not final:
+            return error_response("No audio data provided", 400)
+        
+        transcription_start = time.time()
+        transcription_result = transcribe_stream_chunk(
+            session_id, audio_data, model_size, language, final=final, raw_pcm=raw_pcm
+        )
+        transcription_time = time.time() - transcription_start
+        
+        if 'error' in transcription_result and transcription_result['error']:
+            logger.error(f"Stream transcription error: {transcription_result['error']}")
+            return error_response(transcription_result['error'], 413 if transcription_result.get('buffer_full') else 500)
+        
+        if not final:
+            transcription_result['status'] = 'partial'
+            return jsonify(transcription_result)
+        
+        logger.info(f"Stream {session_id} finished")
+        payload, status_code = _execute_transcribed_command(
+            transcription_result, transcription_time, len(audio_data), language, model_size,
+            capture_screenshot_flag, session_id=session_id
+        )
+        return jsonify(payload), status_code
+    
+    except Exception as e:
+        logger.exception(f"Error processing streamed voice command: {str(e)}")
+        return error_response(f"Error processing streamed voice command: {str(e)}", 500)
+
 @app.route('/screenshots', methods=['GET'])
 def list_screenshots_endpoint():
     """Endpoint for listing available screenshots."""
@@ -675,76 +990,81 @@ def latest_screenshots_endpoint():
         logger.error(f"Error getting latest screenshots: {str(e)}")
         return error_response(f"Error getting latest screenshots: {str(e)}", 500)
 
+# Cache lifetime (seconds) for screenshot files served by /screenshots/<filename>
+SCREENSHOT_CACHE_MAX_AGE = 3600
+
 @app.route('/screenshots/<filename>', methods=['GET'])
 def serve_screenshot_endpoint(filename):
     """Endpoint for serving a specific screenshot file."""
     try:
-        from flask import send_from_directory
-        
         # Get the screenshot directory
         screenshot_dir = get_screenshot_dir()
         
+        # Wait for a capture that is still being written in the background
+        with _pending_screenshots_lock:
+            pending = _pending_screenshots.get(filename)
+        if pending is not None:
+            try:
+                pending.result(timeout=10)
+            except Exception as e:
+                logger.warning(f"Pending screenshot {filename} did not complete: {str(e)}")
+        
         # Check if the file exists
-        if not os.path.exists(os.path.join(screenshot_dir, filename)):
+        if not os.path.isfile(os.path.join(screenshot_dir, filename)):
             return error_response(f"Screenshot not found: {filename}", 404)
         
-        # Serve the file
-        return send_from_directory(screenshot_dir, filename)
+        # Behind nginx, hand the file transfer off to it instead of reading it in Python
+        accel_location = get_screenshot_accel_redirect()
+        if accel_location:
+            response = make_response('')
+            response.headers['X-Accel-Redirect'] = f"{accel_location.rstrip('/')}/{filename}"
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response.cache_control.public = True
+            response.cache_control.max_age = SCREENSHOT_CACHE_MAX_AGE
+            return response
+        
+        # Serve the file with conditional GET/range support; names are unique per
+        # capture, so browsers may cache them
+        return send_from_directory(screenshot_dir, filename, conditional=True, max_age=SCREENSHOT_CACHE_MAX_AGE)
     
     except Exception as e:
         logger.error(f"Error serving screenshot: {str(e)}")
         return error_response(f"Error serving screenshot: {str(e)}", 500)
 
-@app.route('/screenshots/view', methods=['GET'])
-def view_screenshots_endpoint():
-    """Endpoint for viewing screenshots in a simple HTML page."""
-    try:
-        # Get the latest screenshots
-        screenshots = get_latest_screenshots(20)
-        
-        # Generate HTML for each screenshot separately 
-        screenshot_html_parts = []
-        for screenshot in screenshots:
-            screenshot_html = f"""
+# Compiled once at import; the stylesheet is served from voice/static so browsers can cache it
+_SCREENSHOTS_VIEW_TEMPLATE = app.jinja_env.from_string("""
+<html>
+    <head>
+        <title>Voice Control Screenshots</title>
+        <link rel="stylesheet" href="{{ url_for('static', filename='screenshots.css') }}">
+    </head>
+    <body>
+        <h1>Voice Control Screenshots</h1>
+        <p>Showing the {{ screenshots|length }} most recent screenshots.</p>
+        <div class="screenshots">
+            {% for screenshot in screenshots %}
             <div class="screenshot">
-                <img src="/screenshots/{screenshot["filename"]}" alt="{screenshot["filename"]}">
+                <img src="/screenshots/{{ screenshot.filename }}" alt="{{ screenshot.filename }}">
                 <div class="info">
-                    <strong>Filename:</strong> {screenshot["created_formatted"]}<br>
-                    <strong>Time:</strong> {screenshot["time"]}<br>
-                    <strong>Size:</strong> {screenshot["size"]} bytes
+                    <strong>Filename:</strong> {{ screenshot.filename }}<br>
+                    <strong>Time:</strong> {{ screenshot.date }}<br>
+                    <strong>Size:</strong> {{ screenshot.size }} bytes
                 </div>
             </div>
-            """
-            screenshot_html_parts.append(screenshot_html)
-        
-        # Join all screenshot HTML parts
-        all_screenshots_html = "".join(screenshot_html_parts)
-        
-        # Generate complete HTML
-        html = f"""
-        <html>
-            <head>
-                <title>Voice Control Screenshots</title>
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    h1 {{ color: #333; }}
-                    .screenshots {{ display: flex; flex-wrap: wrap; gap: 20px; }}
-                    .screenshot {{ border: 1px solid #ddd; padding: 10px; border-radius: 5px; width: 300px; }}
-                    .screenshot img {{ max-width: 100%; height: auto; }}
-                    .info {{ font-size: 12px; color: #666; margin-top: 5px; }}
-                </style>
-            </head>
-            <body>
-                <h1>Voice Control Screenshots</h1>
-                <p>Showing the {len(screenshots)} most recent screenshots.</p>
-                <div class="screenshots">
-                    {all_screenshots_html}
-                </div>
-            </body>
-        </html>
-        """
+            {% endfor %}
+        </div>
+    </body>
+</html>
+""")
+
+@app.route('/screenshots/view', methods=['GET'])
+def view_screenshots_endpoint():
+    """Endpoint for viewing screenshots in a simple HTML page."""
+    try:
+        # Get the latest screenshots with metadata (sorted newest first)
+        screenshots = list_all_screenshots()[:20]
         
-        return html
+        return _SCREENSHOTS_VIEW_TEMPLATE.render(screenshots=screenshots)
     
     except Exception as e:
         logger.error(f"Error viewing screenshots: {str(e)}")
@@ -765,6 +1085,7 @@ def vnc_status_endpoint():
 
 
 @app.route('/vnc/start', methods=['POST'])
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def vnc_start_endpoint():
     """Endpoint for starting the VNC server."""
     try:
@@ -781,6 +1102,7 @@ def vnc_start_endpoint():
 
 
 @app.route('/vnc/stop', methods=['POST'])
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def vnc_stop_endpoint():
     """Endpoint for stopping the VNC server."""
     try:
@@ -795,16 +1117,16 @@ def vnc_stop_endpoint():
 
 def run_screenshot_cleanup():
     """Run screenshot cleanup in the background to prevent disk filling.
-    This function is intended to be run in a separate thread after responding to user requests.
+    This function is intended to be run on the cleanup worker (see schedule_screenshot_cleanup) after responding to user requests.
     """
     try:
         # Get current cleanup settings
-        from llm_control.voice.utils import cleanup_old_screenshots
-        max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
-        max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
+        max_age_days = SCREENSHOT_MAX_AGE_DAYS
+        max_count = SCREENSHOT_MAX_COUNT
         
         logger.info(f"Running background screenshot cleanup with max_age_days={max_age_days}, max_count={max_count}")
         cleanup_count, cleanup_error = cleanup_old_screenshots(max_age_days, max_count)
+        invalidate_screenshot_listing()
         
         if cleanup_error:
             logger.warning(f"Background screenshot cleanup error: {cleanup_error}")
@@ -813,19 +1135,101 @@ def run_screenshot_cleanup():
             
         # Get total screenshot count for monitoring
         try:
-            from llm_control.voice.screenshots import list_all_screenshots
-            all_screenshots = list_all_screenshots()
-            logger.info(f"Total screenshots after background cleanup: {len(all_screenshots)}")
+            logger.info(f"Total screenshots after background cleanup: {count_screenshots()}")
         except Exception as e:
             logger.warning(f"Error counting screenshots after background cleanup: {str(e)}")
             
     except Exception as e:
-        logger.error(f"Error in background screenshot cleanup: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error in background screenshot cleanup: {str(e)}")
+
+def _run_pending_screenshot_cleanup():
+    # Clear before running so captures made during this cleanup queue one more
+    _cleanup_pending.clear()
+    run_screenshot_cleanup()
+
+def schedule_screenshot_cleanup(force=False):
+    """
+    Queue a screenshot cleanup on the cleanup worker.
+    
+    Calls are debounced: a cleanup is only queued if none is already queued and
+    either SCREENSHOT_CLEANUP_INTERVAL seconds have passed since the last one or
+    SCREENSHOT_CLEANUP_EVERY (at most SCREENSHOT_MAX_COUNT) captures have been taken since.
+    
+    Args:
+        force: Queue a cleanup regardless of the debounce window
+    """
+    global _last_cleanup_time, _captures_since_cleanup
+    
+    with _cleanup_state_lock:
+        _captures_since_cleanup += 1
+        now = time.monotonic()
+        due = (force or now - _last_cleanup_time >= SCREENSHOT_CLEANUP_INTERVAL
+               or _captures_since_cleanup >= min(SCREENSHOT_CLEANUP_EVERY, max(1, SCREENSHOT_MAX_COUNT)))
+        if not due or _cleanup_pending.is_set():
+            return
+        _last_cleanup_time = now
+        _captures_since_cleanup = 0
+        _cleanup_pending.set()
+    _cleanup_executor.submit(_run_pending_screenshot_cleanup)
+
+@app.after_request
+def schedule_cleanup_after_capture(response):
+    """Queue a screenshot cleanup once a request has taken a screenshot."""
+    if g.get('schedule_screenshot_cleanup') and response.status_code < 400:
+        schedule_screenshot_cleanup()
+    return response
+
+# Periodic cleanup independent of requests, so screenshots left by commands and
+# background jobs are trimmed even when no new captures come in
+SCREENSHOT_CLEANUP_PERIOD = 300
+_cleanup_daemon_lock = threading.Lock()
+_cleanup_daemon = None
+
+def start_screenshot_cleanup_daemon(interval=SCREENSHOT_CLEANUP_PERIOD):
+    """
+    Start a daemon thread that queues a screenshot cleanup every `interval` seconds.
+    
+    The cleanup itself runs on the cleanup worker (see schedule_screenshot_cleanup),
+    so it never overlaps another cleanup. Calling this again is a no-op.
+    
+    Args:
+        interval: Seconds between cleanups
+    """
+    global _cleanup_daemon
+    
+    def _loop():
+        while True:
+            time.sleep(interval)
+            schedule_screenshot_cleanup(force=True)
+    
+    with _cleanup_daemon_lock:
+        if _cleanup_daemon is None:
+            _cleanup_daemon = threading.Thread(target=_loop, name="screenshot-cleanup-timer", daemon=True)
+            _cleanup_daemon.start()
+
+# Raw bytes per streamed chunk; a multiple of 3 so each chunk encodes to base64 without padding
+SCREENSHOT_STREAM_CHUNK_SIZE = 57 * 1024
+
+def _stream_image_json(image_bytes, metadata):
+    """
+    Yield a JSON object with the image as base64 "image_data", encoded chunk by chunk.
+    
+    Only one chunk of base64 text exists at a time, instead of the full string plus
+    the serialized JSON body.
+    
+    Args:
+        image_bytes: Encoded image
+        metadata: Other fields of the JSON object
+    """
+    yield '{"image_data":"'
+    view = memoryview(image_bytes)
+    for offset in range(0, len(view), SCREENSHOT_STREAM_CHUNK_SIZE):
+        yield base64.b64encode(view[offset:offset + SCREENSHOT_STREAM_CHUNK_SIZE])
+    # Splice the remaining fields (a non-empty object) in after image_data
+    yield '",' + app.json.dumps(metadata)[1:]
 
 @app.route('/screenshot/capture', methods=['GET', 'POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def capture_screenshot_endpoint():
     """Endpoint for capturing a screenshot on demand."""
     try:
@@ -835,14 +1239,21 @@ def capture_screenshot_endpoint():
         # Create directory if it doesn't exist
         os.makedirs(screenshot_dir, exist_ok=True)
         
-        # Take a screenshot immediately without waiting for cleanup
-        filename, filepath, success = capture_screenshot()
-        
-        if not filename or not filepath:
-            return error_response("Failed to capture screenshot", 500)
+        # Image encoding: webp (default, see SCREENSHOT_FORMAT), jpg or png ('encoding' is accepted as an alias)
+        requested_format = request.args.get('fmt') or request.args.get('encoding')
+        image_format = resolve_screenshot_format(requested_format) if requested_format else get_default_screenshot_format()
+        if image_format is None:
+            return error_response(f"Unsupported fmt '{requested_format}', use one of: {', '.join(SCREENSHOT_FORMATS)}", 400)
         
-        # Get file information
-        file_size = os.path.getsize(filepath)
+        # Optional quality for jpg/webp (1-100)
+        quality = request.args.get('quality', None)
+        if quality is not None:
+            try:
+                quality = int(quality)
+            except ValueError:
+                quality = 0
+            if not 1 <= quality <= 100:
+                return error_response("quality must be an integer between 1 and 100", 400)
         
         # Determine response format based on query parameter or request content type
         format_param = request.args.get('format', None)
@@ -850,14 +1261,38 @@ def capture_screenshot_endpoint():
         # If format not specified in query params, check if it's a JSON request
         if format_param is None and request.is_json:
             format_param = 'json'
-        # Default to redirect if not specified
+        # Default to returning the image itself (format=redirect redirects to its URL instead)
         if format_param is None:
-            format_param = 'redirect'
+            format_param = 'image'
+        serve_image = format_param not in ('json', 'redirect')
+        
+        # Take a screenshot immediately; cleanup runs on the background pool after the response.
+        # When the image is returned directly, the file is written in the background
+        filename, filepath, success, image_bytes = capture_screenshot(fmt=image_format, return_data=True, quality=quality,
+                                                                      write=not serve_image)
+        captured_at = time.time()
+        g.schedule_screenshot_cleanup = True
+        
+        if not filename or not filepath:
+            return error_response("Failed to capture screenshot", 500)
+        
+        # Get file information from the encoded bytes (no stat or re-read of the file)
+        file_size = len(image_bytes)
+        
+        if serve_image:
+            _track_pending_screenshot(filename, _background_executor.submit(write_screenshot_file, filepath, image_bytes))
+            response = send_file(io.BytesIO(image_bytes), download_name=filename)
+            response.headers['X-Screenshot-URL'] = f"/screenshots/{filename}"
+            return response
         
         # Prepare response before starting cleanup
         if format_param == 'json':
-            # Get base64 image data
-            img_str = get_screenshot_data(filename, format='base64')
+            # Only base64-encode the image for clients that want it inline;
+            # include_image=false returns just the URL
+            include_image = request.args.get('include_image', 'true').lower() != 'false'
+            # stream=true sends the base64 data in chunks instead of building the whole string
+            stream_image = include_image and request.args.get('stream', 'false').lower() == 'true'
+            img_str = base64.b64encode(image_bytes).decode('ascii') if include_image and not stream_image else None
             
             response_data = {
                 "status": "success",
@@ -866,37 +1301,29 @@ def capture_screenshot_endpoint():
                 "filepath": filepath,
                 "url": f"/screenshots/{filename}",
                 "size": file_size,
-                "timestamp": int(time.time()),
-                "image_data": img_str,
+                "format": image_format,
+                "timestamp": int(captured_at),
                 "cleanup_info": {
                     "status": "scheduled",
                     "message": "Cleanup will run in background"
                 }
             }
-            
-            # Start cleanup in background thread after preparing response
-            cleanup_thread = threading.Thread(target=run_screenshot_cleanup)
-            cleanup_thread.daemon = True  # Allow the thread to be terminated when the main process exits
-            cleanup_thread.start()
+            if stream_image:
+                return Response(_stream_image_json(image_bytes, response_data), mimetype='application/json')
+            if include_image:
+                response_data["image_data"] = img_str
             
             return jsonify(response_data)
         else:
-            # Start cleanup in background thread
-            cleanup_thread = threading.Thread(target=run_screenshot_cleanup)
-            cleanup_thread.daemon = True
-            cleanup_thread.start()
-            
             # Redirect to the screenshot URL
             return redirect(f"/screenshots/{filename}")
     
     except Exception as e:
-        logger.error(f"Error capturing screenshot: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error capturing screenshot: {str(e)}")
         return error_response(f"Error capturing screenshot: {str(e)}", 500)
 
 @app.route('/screenshots/cleanup', methods=['GET', 'POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def cleanup_screenshots_endpoint():
     """Endpoint for manually cleaning up old screenshots."""
     try:
@@ -907,12 +1334,12 @@ def cleanup_screenshots_endpoint():
         if max_age_days is not None:
             max_age_days = int(max_age_days)
         else:
-            max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
+            max_age_days = SCREENSHOT_MAX_AGE_DAYS
             
         if max_count is not None:
             max_count = int(max_count)
         else:
-            max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
+            max_count = SCREENSHOT_MAX_COUNT
         
         # Force more aggressive cleanup if force parameter is set
         if request.args.get('force', 'false').lower() == 'true':
@@ -926,9 +1353,7 @@ def cleanup_screenshots_endpoint():
         # Get screenshot counts before cleanup
         before_count = 0
         try:
-            from llm_control.voice.screenshots import list_all_screenshots
-            all_screenshots = list_all_screenshots()
-            before_count = len(all_screenshots)
+            before_count = count_screenshots()
             logger.info(f"Found {before_count} screenshots before cleanup")
         except Exception as e:
             logger.warning(f"Error counting screenshots before cleanup: {str(e)}")
@@ -949,13 +1374,35 @@ def cleanup_screenshots_endpoint():
         return jsonify(result)
     
     except Exception as e:
-        logger.error(f"Error cleaning up screenshots: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error cleaning up screenshots: {str(e)}")
         return error_response(f"Error cleaning up screenshots: {str(e)}", 500)
 
+def _unlock_with_xdotool(password, delay, interval):
+    """
+    Wake the screen and type the password with xdotool.
+    
+    The password is passed on stdin (--file -) so it never appears in the process list.
+    
+    Args:
+        password: Password to type
+        delay: Seconds to wait for the password field after waking the screen
+        interval: Seconds between keystrokes
+    """
+    subprocess.run(['xdotool', 'key', 'shift'], check=True)
+    logger.info("Pressed shift key to wake up screen")
+    
+    logger.info(f"Waiting {delay} seconds for password field")
+    time.sleep(delay)
+    
+    logger.info(f"Typing password with interval {interval} (xdotool)")
+    subprocess.run(['xdotool', 'type', '--delay', str(int(float(interval) * 1000)), '--file', '-'],
+                   input=password.encode('utf-8'), check=True)
+    
+    logger.info("Pressing Enter to unlock")
+    subprocess.run(['xdotool', 'key', 'Return'], check=True)
+
 @app.route('/unlock-screen', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def unlock_screen_endpoint():
     """Endpoint for unlocking the screen with a password."""
     try:
@@ -976,21 +1423,29 @@ def unlock_screen_endpoint():
         
         logger.info("Executing screen unlock operation")
         
-        # Set screenshot environment variable temporarily if needed
-        original_screenshot_setting = os.environ.get("CAPTURE_SCREENSHOTS", "true")
-        if not capture_screenshot:
-            os.environ["CAPTURE_SCREENSHOTS"] = "false"
-            logger.info("Temporarily disabled screenshots for screen unlock operation")
-        
         # Execute unlock operation in a background thread to avoid blocking the response
         def unlock_background():
+            # Suspend screenshots process-wide so no capture (from any request) can
+            # record the password screen while it is showing
+            if not capture_screenshot:
+                suspend_screenshots()
+                logger.info("Temporarily disabled screenshots for screen unlock operation")
             try:
-                import pyautogui
-                import time
-                
                 # Log the beginning of the operation
                 logger.info("Starting screen unlock process")
                 
+                # On Linux, xdotool types the whole password natively in one process
+                # instead of one pyautogui call and Python sleep per character
+                if sys.platform.startswith('linux') and shutil.which('xdotool'):
+                    try:
+                        _unlock_with_xdotool(password, delay, interval)
+                        logger.info("Screen unlock operation completed")
+                        return
+                    except (subprocess.CalledProcessError, OSError) as e:
+                        logger.warning(f"xdotool failed ({str(e)}), falling back to PyAutoGUI")
+                
+                import pyautogui
+                
                 # Wake up the screen
                 pyautogui.press('shift')
                 logger.info("Pressed shift key to wake up screen")
@@ -1010,12 +1465,10 @@ def unlock_screen_endpoint():
                 
                 logger.info("Screen unlock operation completed")
             except Exception as e:
-                logger.error(f"Error in unlock background thread: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
+                logger.exception(f"Error in unlock background thread: {str(e)}")
             finally:
-                # Restore original screenshot setting
-                os.environ["CAPTURE_SCREENSHOTS"] = original_screenshot_setting
+                if not capture_screenshot:
+                    resume_screenshots()
                 
         # Start the background thread
         unlock_thread = threading.Thread(target=unlock_background)
@@ -1031,13 +1484,7 @@ def unlock_screen_endpoint():
         })
         
     except Exception as e:
-        # Restore original screenshot setting in case of error
-        if 'original_screenshot_setting' in locals():
-            os.environ["CAPTURE_SCREENSHOTS"] = original_screenshot_setting
-            
-        logger.error(f"Error unlocking screen: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.exception(f"Error unlocking screen: {str(e)}")
         return error_response(f"Error unlocking screen: {str(e)}", 500)
 
 @app.route('/command-history', methods=['GET'])
@@ -1060,17 +1507,14 @@ def command_history_endpoint():
         })
         
     except Exception as e:
-        logger.error(f"Error retrieving command history: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error retrieving command history: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error retrieving command history: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error retrieving command history: {str(e)}", 500)
@@ -1095,22 +1539,19 @@ def latest_command_summary_endpoint():
         })
 
     except Exception as e:
-        logger.error(f"Error retrieving latest command summary: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error retrieving latest command summary: {str(e)}")
 
         if DEBUG:
             return jsonify({
                 'error': f"Error retrieving latest command summary: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error retrieving latest command summary: {str(e)}", 500)
 
 @app.route('/command-history/cleanup', methods=['GET', 'POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def cleanup_command_history_endpoint():
     """Endpoint for cleaning up old command history entries."""
     try:
@@ -1123,12 +1564,12 @@ def cleanup_command_history_endpoint():
         if max_age_days is not None:
             max_age_days = int(max_age_days)
         else:
-            max_age_days = int(os.environ.get("HISTORY_MAX_AGE_DAYS", "30"))
+            max_age_days = HISTORY_MAX_AGE_DAYS
         
         if max_count is not None:
             max_count = int(max_count)
         else:
-            max_count = int(os.environ.get("HISTORY_MAX_COUNT", "1000"))
+            max_count = HISTORY_MAX_COUNT
         
         # Force more aggressive cleanup if force parameter is set
         if force:
@@ -1167,23 +1608,20 @@ def cleanup_command_history_endpoint():
             return error_response(f"Error during command history cleanup: {result.get('error', 'Unknown error')}", 500)
         
     except Exception as e:
-        logger.error(f"Error in command history cleanup endpoint: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error in command history cleanup endpoint: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error in command history cleanup: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error in command history cleanup: {str(e)}", 500)
 
 @app.route('/save-favorite', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def save_favorite_endpoint():
     """Endpoint for saving a command as a favorite script."""
     try:
@@ -1211,17 +1649,14 @@ def save_favorite_endpoint():
             return error_response(result['error'], 500)
         
     except Exception as e:
-        logger.error(f"Error saving favorite: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error saving favorite: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error saving favorite: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error saving favorite: {str(e)}", 500)
@@ -1244,23 +1679,20 @@ def favorites_endpoint():
         })
         
     except Exception as e:
-        logger.error(f"Error retrieving favorites: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error retrieving favorites: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error retrieving favorites: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error retrieving favorites: {str(e)}", 500)
 
 @app.route('/delete-favorite/<script_id>', methods=['DELETE'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def delete_favorite_endpoint(script_id):
     """Endpoint for deleting a favorite script."""
     try:
@@ -1274,23 +1706,20 @@ def delete_favorite_endpoint(script_id):
             return error_response(result['error'], 404 if "not found" in result.get('error', '').lower() else 500)
         
     except Exception as e:
-        logger.error(f"Error deleting favorite: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error deleting favorite: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error deleting favorite: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error deleting favorite: {str(e)}", 500)
 
 @app.route('/run-favorite/<script_id>', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def run_favorite_endpoint(script_id):
     """Endpoint for running a favorite script."""
     try:
@@ -1304,17 +1733,14 @@ def run_favorite_endpoint(script_id):
             return error_response(result['error'], 404 if "not found" in result.get('error', '').lower() else 500)
         
     except Exception as e:
-        logger.error(f"Error running favorite: {str(e)}")
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(error_trace)
+        logger.exception(f"Error running favorite: {str(e)}")
         
         # Include stack trace in debug mode
         if DEBUG:
             return jsonify({
                 'error': f"Error running favorite: {str(e)}",
                 'status': 'error',
-                'traceback': error_trace
+                'traceback': traceback.format_exc()
             }), 500
         else:
             return error_response(f"Error running favorite: {str(e)}", 500)
@@ -1324,7 +1750,7 @@ def run_favorite_endpoint(script_id):
 # ============================================
 
 @app.route('/push-update', methods=['POST'])
-@cors_preflight
+@limit_content_length(JSON_MAX_CONTENT_LENGTH)
 def push_update_endpoint():
     """
     Endpoint for external sources (e.g., Cursor MCP) to push updates.
@@ -1370,7 +1796,6 @@ def push_update_endpoint():
 
 
 @app.route('/pending-updates', methods=['GET'])
-@cors_preflight
 def pending_updates_endpoint():
     """
     Long polling endpoint for clients to receive pending updates.
@@ -1455,198 +1880,220 @@ def peek_pending_updates_endpoint():
         return error_response(f"Error: {str(e)}", 500)
 
 
-@app.route('/', methods=['GET'])
-def index():
-    """Main page showing server information and available endpoints."""
-    screenshot_dir = get_screenshot_dir()
-    server_config = {
-        "whisper_model": get_whisper_model_size(),
-        "ollama_model": get_ollama_model(),
-        "ollama_host": get_ollama_host(),
-        "language": get_default_language(),
-        "translation_enabled": str(get_translation_enabled()),
-        "screenshot_dir": screenshot_dir,
-        "vnc": get_vnc_status()
+# Endpoints documented on the index page
+INDEX_ENDPOINTS = [
+    {
+        "path": "/",
+        "methods": ["GET"],
+        "description": "This page - Server information and API documentation"
+    },
+    {
+        "path": "/health",
+        "methods": ["GET"],
+        "description": "Health check endpoint"
+    },
+    {
+        "path": "/transcribe",
+        "methods": ["POST"],
+        "description": "Transcribe audio to text",
+        "example": """curl -X POST -F "audio=@your-audio-file.wav" http://localhost:5000/transcribe"""
+    },
+    {
+        "path": "/translate",
+        "methods": ["POST"],
+        "description": "Translate text using the configured LLM",
+        "example": """curl -X POST -H "Content-Type: application/json" -d '{"text": "your text to translate"}' http://localhost:5000/translate"""
+    },
+    {
+        "path": "/command",
+        "methods": ["POST"],
+        "description": "Execute a command",
+        "example": """curl -X POST -H "Content-Type: application/json" -d '{"command": "click on Firefox", "capture_screenshot": true}' http://localhost:5000/command"""
+    },
+    {
+        "path": "/voice-command",
+        "methods": ["POST"],
+        "description": "Process and execute a voice command",
+        "example": """curl -X POST -F "audio=@your-command.wav" http://localhost:5000/voice-command"""
+    },
+    {
+        "path": "/voice-command/<job_id>",
+        "methods": ["GET"],
+        "description": "Status and result of a voice command submitted with async=true (202 + job_id)",
+        "example": """curl -X POST -F "audio=@your-command.wav" -F "async=true" http://localhost:5000/voice-command && curl http://localhost:5000/voice-command/JOB_ID"""
+    },
+    {
+        "path": "/voice-command/<job_id>/stream",
+        "methods": ["GET"],
+        "description": "Server-Sent Events for an async voice command: transcription, pipeline, executed, result",
+        "example": """curl -N http://localhost:5000/voice-command/JOB_ID/stream"""
+    },
+    {
+        "path": "/voice-command/stream",
+        "methods": ["POST"],
+        "description": "Stream dictation chunks (raw PCM, WAV or one webm/ogg recording) for a session; final=true executes the command (openai-whisper backend only)",
+        "example": """curl -X POST -H "Content-Type: audio/pcm" --data-binary @chunk.pcm "http://localhost:5000/voice-command/stream?session_id=abc&final=true\""""
+    },
+    {
+        "path": "/screenshots",
+        "methods": ["GET"],
+        "description": "List available screenshots",
+        "example": """curl http://localhost:5000/screenshots"""
+    },
+    {
+        "path": "/screenshots/latest",
+        "methods": ["GET"],
+        "description": "Get information about the latest screenshots",
+        "example": """curl http://localhost:5000/screenshots/latest"""
+    },
+    {
+        "path": "/screenshots/<filename>",
+        "methods": ["GET"],
+        "description": "Serve a specific screenshot file",
+        "example": """curl http://localhost:5000/screenshots/ocr_screenshot.png > screenshot.png"""
+    },
+    {
+        "path": "/screenshots/view",
+        "methods": ["GET"],
+        "description": "View screenshots in a simple HTML page",
+        "example": """Open http://localhost:5000/screenshots/view in your browser"""
+    },
+    {
+        "path": "/screenshot/capture",
+        "methods": ["GET", "POST"],
+        "description": "Capture a screenshot and return the image (format=redirect redirects to its URL instead; fmt=webp|jpg|png, default webp; quality=1-100 for webp/jpg; format=json returns base64 image_data unless include_image=false; stream=true streams it in chunks)",
+        "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/screenshot/capture?format=json"""
+    },
+    {
+        "path": "/screenshots/cleanup",
+        "methods": ["GET", "POST"],
+        "description": "Manually clean up old screenshots",
+        "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/screenshots/cleanup?max_age_days=3&max_count=50"""
+    },
+    {
+        "path": "/vnc/status",
+        "methods": ["GET"],
+        "description": "Get VNC server status and connection info",
+        "example": """curl http://localhost:5000/vnc/status"""
+    },
+    {
+        "path": "/vnc/start",
+        "methods": ["POST"],
+        "description": "Start the VNC server (requires VNC_ENABLED=true)",
+        "example": """curl -X POST http://localhost:5000/vnc/start"""
+    },
+    {
+        "path": "/vnc/stop",
+        "methods": ["POST"],
+        "description": "Stop the VNC server",
+        "example": """curl -X POST http://localhost:5000/vnc/stop"""
+    },
+    {
+        "path": "/unlock-screen",
+        "methods": ["POST"],
+        "description": "Unlock the screen with a password",
+        "example": """curl -X POST -H "Content-Type: application/json" -d '{"password": "your_password"}' http://localhost:5000/unlock-screen"""
+    },
+    {
+        "path": "/command-history",
+        "methods": ["GET"],
+        "description": "Get command execution history (defaults to today only)",
+        "example": """curl http://localhost:5000/command-history?limit=10&date_filter=today
+        # Other date_filter options: 'all', '2024-01-15' (specific date)"""
+    },
+    {
+        "path": "/command-summary/latest",
+        "methods": ["GET"],
+        "description": "Get the latest screen-change summary for TTS",
+        "example": """curl http://localhost:5000/command-summary/latest"""
+    },
+    {
+        "path": "/command-history/cleanup",
+        "methods": ["GET", "POST"],
+        "description": "Manually clean up old command history entries",
+        "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/command-history/cleanup?max_age_days=30&max_count=500"""
+    },
+    {
+        "path": "/save-favorite",
+        "methods": ["POST"],
+        "description": "Save a command as a favorite script",
+        "example": """curl -X POST -H "Content-Type: application/json" -d '{"command": "your command", "code": "your code", "steps": ["step1", "step2"], "success": true}' http://localhost:5000/save-favorite"""
+    },
+    {
+        "path": "/favorites",
+        "methods": ["GET"],
+        "description": "Get favorite commands",
+        "example": """curl http://localhost:5000/favorites?limit=10"""
+    },
+    {
+        "path": "/delete-favorite/<script_id>",
+        "methods": ["DELETE"],
+        "description": "Delete a favorite script",
+        "example": """curl -X DELETE http://localhost:5000/delete-favorite/open_firefox_20250426_183939"""
+    },
+    {
+        "path": "/run-favorite/<script_id>",
+        "methods": ["POST"],
+        "description": "Run a favorite script",
+        "example": """curl -X POST http://localhost:5000/run-favorite/open_firefox_20250426_183939"""
+    },
+    {
+        "path": "/push-update",
+        "methods": ["POST"],
+        "description": "Push an update to the queue (for Cursor MCP or external sources)",
+        "example": """curl -X POST -H "Content-Type: application/json" -d '{"summary": "Changed login.py", "changes": ["login.py"]}' http://localhost:5000/push-update"""
+    },
+    {
+        "path": "/pending-updates",
+        "methods": ["GET"],
+        "description": "Long polling endpoint to receive pending updates (waits up to 30s)",
+        "example": """curl "http://localhost:5000/pending-updates?timeout=30" """
+    },
+    {
+        "path": "/pending-updates/peek",
+        "methods": ["GET"],
+        "description": "Check pending updates without consuming them (for debugging)",
+        "example": """curl http://localhost:5000/pending-updates/peek"""
     }
-    
-    # List of available endpoints
-    endpoints = [
-        {
-            "path": "/",
-            "methods": ["GET"],
-            "description": "This page - Server information and API documentation"
-        },
-        {
-            "path": "/health",
-            "methods": ["GET"],
-            "description": "Health check endpoint"
-        },
-        {
-            "path": "/transcribe",
-            "methods": ["POST"],
-            "description": "Transcribe audio to text",
-            "example": """curl -X POST -F "audio=@your-audio-file.wav" http://localhost:5000/transcribe"""
-        },
-        {
-            "path": "/translate",
-            "methods": ["POST"],
-            "description": "Translate text using the configured LLM",
-            "example": """curl -X POST -H "Content-Type: application/json" -d '{"text": "your text to translate"}' http://localhost:5000/translate"""
-        },
-        {
-            "path": "/command",
-            "methods": ["POST"],
-            "description": "Execute a command",
-            "example": """curl -X POST -H "Content-Type: application/json" -d '{"command": "click on Firefox", "capture_screenshot": true}' http://localhost:5000/command"""
-        },
-        {
-            "path": "/voice-command",
-            "methods": ["POST"],
-            "description": "Process and execute a voice command",
-            "example": """curl -X POST -F "audio=@your-command.wav" http://localhost:5000/voice-command"""
-        },
-        {
-            "path": "/screenshots",
-            "methods": ["GET"],
-            "description": "List available screenshots",
-            "example": """curl http://localhost:5000/screenshots"""
-        },
-        {
-            "path": "/screenshots/latest",
-            "methods": ["GET"],
-            "description": "Get information about the latest screenshots",
-            "example": """curl http://localhost:5000/screenshots/latest"""
-        },
-        {
-            "path": "/screenshots/<filename>",
-            "methods": ["GET"],
-            "description": "Serve a specific screenshot file",
-            "example": """curl http://localhost:5000/screenshots/ocr_screenshot.png > screenshot.png"""
-        },
-        {
-            "path": "/screenshots/view",
-            "methods": ["GET"],
-            "description": "View screenshots in a simple HTML page",
-            "example": """Open http://localhost:5000/screenshots/view in your browser"""
-        },
-        {
-            "path": "/screenshot/capture",
-            "methods": ["GET", "POST"],
-            "description": "Capture a screenshot on demand",
-            "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/screenshot/capture?format=json"""
-        },
-        {
-            "path": "/screenshots/cleanup",
-            "methods": ["GET", "POST"],
-            "description": "Manually clean up old screenshots",
-            "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/screenshots/cleanup?max_age_days=3&max_count=50"""
-        },
-        {
-            "path": "/vnc/status",
-            "methods": ["GET"],
-            "description": "Get VNC server status and connection info",
-            "example": """curl http://localhost:5000/vnc/status"""
-        },
-        {
-            "path": "/vnc/start",
-            "methods": ["POST"],
-            "description": "Start the VNC server (requires VNC_ENABLED=true)",
-            "example": """curl -X POST http://localhost:5000/vnc/start"""
-        },
-        {
-            "path": "/vnc/stop",
-            "methods": ["POST"],
-            "description": "Stop the VNC server",
-            "example": """curl -X POST http://localhost:5000/vnc/stop"""
-        },
-        {
-            "path": "/unlock-screen",
-            "methods": ["POST"],
-            "description": "Unlock the screen with a password",
-            "example": """curl -X POST -H "Content-Type: application/json" -d '{"password": "your_password"}' http://localhost:5000/unlock-screen"""
-        },
-        {
-            "path": "/command-history",
-            "methods": ["GET"],
-            "description": "Get command execution history (defaults to today only)",
-            "example": """curl http://localhost:5000/command-history?limit=10&date_filter=today
-            # Other date_filter options: 'all', '2024-01-15' (specific date)"""
-        },
-        {
-            "path": "/command-summary/latest",
-            "methods": ["GET"],
-            "description": "Get the latest screen-change summary for TTS",
-            "example": """curl http://localhost:5000/command-summary/latest"""
-        },
-        {
-            "path": "/command-history/cleanup",
-            "methods": ["GET", "POST"],
-            "description": "Manually clean up old command history entries",
-            "example": """curl -X POST -H "Content-Type: application/json" http://localhost:5000/command-history/cleanup?max_age_days=30&max_count=500"""
-        },
-        {
-            "path": "/save-favorite",
-            "methods": ["POST"],
-            "description": "Save a command as a favorite script",
-            "example": """curl -X POST -H "Content-Type: application/json" -d '{"command": "your command", "code": "your code", "steps": ["step1", "step2"], "success": true}' http://localhost:5000/save-favorite"""
-        },
-        {
-            "path": "/favorites",
-            "methods": ["GET"],
-            "description": "Get favorite commands",
-            "example": """curl http://localhost:5000/favorites?limit=10"""
-        },
-        {
-            "path": "/delete-favorite/<script_id>",
-            "methods": ["DELETE"],
-            "description": "Delete a favorite script",
-            "example": """curl -X DELETE http://localhost:5000/delete-favorite/open_firefox_20250426_183939"""
-        },
-        {
-            "path": "/run-favorite/<script_id>",
-            "methods": ["POST"],
-            "description": "Run a favorite script",
-            "example": """curl -X POST http://localhost:5000/run-favorite/open_firefox_20250426_183939"""
-        },
-        {
-            "path": "/push-update",
-            "methods": ["POST"],
-            "description": "Push an update to the queue (for Cursor MCP or external sources)",
-            "example": """curl -X POST -H "Content-Type: application/json" -d '{"summary": "Changed login.py", "changes": ["login.py"]}' http://localhost:5000/push-update"""
-        },
-        {
-            "path": "/pending-updates",
-            "methods": ["GET"],
-            "description": "Long polling endpoint to receive pending updates (waits up to 30s)",
-            "example": """curl "http://localhost:5000/pending-updates?timeout=30" """
-        },
-        {
-            "path": "/pending-updates/peek",
-            "methods": ["GET"],
-            "description": "Check pending updates without consuming them (for debugging)",
-            "example": """curl http://localhost:5000/pending-updates/peek"""
-        }
-    ]
-    
-    # Generate HTML response
-    html = f"""
+]
+
+def generate_endpoint_rows(endpoints):
+    """Helper function to generate HTML rows for endpoints table."""
+    rows = []
+    for endpoint in endpoints:
+        example_html = '<div class="example"><code>' + endpoint.get('example', 'N/A') + '</code></div>' if endpoint.get('example') else 'N/A'
+        row = f"""
+        <tr>
+            <td>{endpoint['path']}</td>
+            <td class="method">{', '.join(endpoint['methods'])}</td>
+            <td>{endpoint['description']}</td>
+            <td>{example_html}</td>
+        </tr>
+        """
+        rows.append(row)
+    return ''.join(rows)
+
+# The index page is assembled from parts rendered once at import time; only the
+# configuration block (which reflects live settings and VNC state) is formatted
+# per request.
+_INDEX_HTML_HEAD = """
     <html>
         <head>
             <title>Voice Control Server</title>
             <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }}
-                h1, h2, h3 {{ color: #333; }}
-                .section {{ margin-bottom: 30px; }}
-                .config {{ background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-                .config-item {{ margin-bottom: 5px; }}
-                .config-value {{ font-weight: bold; }}
-                table {{ border-collapse: collapse; width: 100%; }}
-                th, td {{ text-align: left; padding: 12px; }}
-                th {{ background-color: #f2f2f2; }}
-                tr:nth-child(even) {{ background-color: #f9f9f9; }}
-                .method {{ font-weight: bold; }}
-                .example {{ background-color: #f5f5f5; padding: 10px; border-radius: 3px; overflow-x: auto; }}
-                code {{ font-family: monospace; }}
+                body { font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }
+                h1, h2, h3 { color: #333; }
+                .section { margin-bottom: 30px; }
+                .config { background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; }
+                .config-item { margin-bottom: 5px; }
+                .config-value { font-weight: bold; }
+                table { border-collapse: collapse; width: 100%; }
+                th, td { text-align: left; padding: 12px; }
+                th { background-color: #f2f2f2; }
+                tr:nth-child(even) { background-color: #f9f9f9; }
+                .method { font-weight: bold; }
+                .example { background-color: #f5f5f5; padding: 10px; border-radius: 3px; overflow-x: auto; }
+                code { font-family: monospace; }
             </style>
         </head>
         <body>
@@ -1654,16 +2101,20 @@ def index():
             
             <div class="section">
                 <h2>Server Configuration</h2>
-                <div class="config">
-                    <div class="config-item">Whisper Model: <span class="config-value">{server_config['whisper_model']}</span></div>
-                    <div class="config-item">Ollama Model: <span class="config-value">{server_config['ollama_model']}</span></div>
-                    <div class="config-item">Ollama Host: <span class="config-value">{server_config['ollama_host']}</span></div>
-                <div class="config-item">Default Language: <span class="config-value">{server_config['language']}</span></div>
-                <div class="config-item">Translation Enabled: <span class="config-value">{server_config['translation_enabled']}</span></div>
-                <div class="config-item">Screenshot Directory: <span class="config-value">{server_config['screenshot_dir']}</span></div>
-                <div class="config-item">VNC Enabled: <span class="config-value">{server_config['vnc']['enabled']}</span></div>
-                <div class="config-item">VNC Running: <span class="config-value">{server_config['vnc']['running']}</span></div>
-                <div class="config-item">VNC Host/Port: <span class="config-value">{server_config['vnc']['host']}:{server_config['vnc']['port']}</span></div>
+                <div class="config">"""
+
+_INDEX_CONFIG_TEMPLATE = """
+                    <div class="config-item">Whisper Model: <span class="config-value">{whisper_model}</span></div>
+                    <div class="config-item">Ollama Model: <span class="config-value">{ollama_model}</span></div>
+                    <div class="config-item">Ollama Host: <span class="config-value">{ollama_host}</span></div>
+                <div class="config-item">Default Language: <span class="config-value">{language}</span></div>
+                <div class="config-item">Translation Enabled: <span class="config-value">{translation_enabled}</span></div>
+                <div class="config-item">Screenshot Directory: <span class="config-value">{screenshot_dir}</span></div>
+                <div class="config-item">VNC Enabled: <span class="config-value">{vnc_enabled}</span></div>
+                <div class="config-item">VNC Running: <span class="config-value">{vnc_running}</span></div>
+                <div class="config-item">VNC Host/Port: <span class="config-value">{vnc_host}:{vnc_port}</span></div>"""
+
+_INDEX_HTML_TAIL = """
             </div>
         </div>
             
@@ -1685,58 +2136,62 @@ def index():
                         <th>Description</th>
                         <th>Example</th>
                     </tr>
-                    {generate_endpoint_rows(endpoints)}
+                    """ + generate_endpoint_rows(INDEX_ENDPOINTS) + """
                 </table>
             </div>
         </body>
     </html>
     """
-    
-    return html
 
-def generate_endpoint_rows(endpoints):
-    """Helper function to generate HTML rows for endpoints table."""
-    rows = []
-    for endpoint in endpoints:
-        example_html = '<div class="example"><code>' + endpoint.get('example', 'N/A') + '</code></div>' if endpoint.get('example') else 'N/A'
-        row = f"""
-        <tr>
-            <td>{endpoint['path']}</td>
-            <td class="method">{', '.join(endpoint['methods'])}</td>
-            <td>{endpoint['description']}</td>
-            <td>{example_html}</td>
-        </tr>
-        """
-        rows.append(row)
-    return ''.join(rows)
+@app.route('/', methods=['GET'])
+def index():
+    """Main page showing server information and available endpoints."""
+    vnc = get_vnc_status()
+    config_html = _INDEX_CONFIG_TEMPLATE.format(
+        whisper_model=get_whisper_model_size(),
+        ollama_model=get_ollama_model(),
+        ollama_host=get_ollama_host(),
+        language=get_default_language(),
+        translation_enabled=str(get_translation_enabled()),
+        screenshot_dir=get_screenshot_dir(),
+        vnc_enabled=vnc['enabled'],
+        vnc_running=vnc['running'],
+        vnc_host=vnc['host'],
+        vnc_port=vnc['port']
+    )
+    return _INDEX_HTML_HEAD + config_html + _INDEX_HTML_TAIL
 
-def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
+_server_status = None
+_server_status_lock = threading.Lock()
+
+def initialize_server(debug=False):
     """
-    Run the Flask server for voice command processing.
+    Load models and start the background services the server needs.
+    
+    Shared by run_server and the WSGI entrypoint (llm_control/voice/wsgi.py). It
+    must run in the process that serves requests, not in a pre-forking master, so
+    the CUDA context and the Whisper model belong to the worker. Calling it again
+    is a no-op.
     
     Args:
-        host: Host to bind to
-        port: Port to bind to
-        debug: Enable debug mode
-        ssl_context: SSL context for HTTPS
+        debug: Enable debug logging
+        
+    Returns:
+        Dictionary with startup status information
     """
-    global app
+    global _server_status
     
+    with _server_status_lock:
+        if _server_status is None:
+            _server_status = _initialize_server(debug)
+    return _server_status
+
+def _initialize_server(debug):
     # Configure logging level based on debug flag
     configure_logging(debug)
     
-    # Initialize UI detection models if available
-    try:
-        from llm_control.ui_detection.element_finder import get_ui_detector
-        
-        # Initialize UI detector (this will download if missing)
-        ui_detector = get_ui_detector(download_if_missing=True)
-        if ui_detector:
-            logger.info("UI detector initialized successfully")
-        else:
-            logger.warning("UI detector initialization failed")
-    except ImportError as e:
-        logger.warning(f"UI detection module import failed: {e}")
+    # The UI detector (YOLO) is not loaded here: get_ui_detector() loads and caches it
+    # the first time a command needs UI element detection
     
     # Add PyAutoGUI extensions
     # Suppress mouseinfo/tkinter warnings - they're optional
@@ -1756,14 +2211,27 @@ def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
         else:
             logger.warning(f"Failed to add PyAutoGUI extensions: {e}")
     
-    # Test CUDA availability for informational purposes
-    test_cuda_availability()
+    # Check GPU availability without importing PyTorch; the CUDA diagnostics (and
+    # allocator settings) only import it when there is a GPU to use
+    gpu_available, gpu_name = detect_nvidia_gpu()
+    if gpu_available:
+        test_cuda_availability()
+    else:
+        logger.info("No NVIDIA GPU detected, skipping CUDA checks")
     
     # Initialize the Whisper model at server startup to avoid loading it for each request
     # Use the current model size from environment (may have changed)
     current_whisper_size = get_whisper_model_size()
-    logger.info(f"Pre-initializing Whisper model with size: {current_whisper_size}...")
-    initialize_whisper_model(current_whisper_size)
+    if get_whisper_worker_address():
+        # Whisper lives in the persistent inference worker process instead
+        logger.info(f"Using Whisper inference worker at {get_whisper_worker_address()}")
+        if get_whisper_worker_autostart():
+            worker_process = start_inference_worker()
+            if worker_process is not None:
+                atexit.register(worker_process.terminate)
+    else:
+        logger.info(f"Pre-initializing Whisper model with size: {current_whisper_size}...")
+        initialize_whisper_model(current_whisper_size)
     
     # Check Ollama model availability
     ollama_model = get_ollama_model()
@@ -1786,27 +2254,57 @@ def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
             print(f"   First command may take longer while the model loads.")
     
     # Get screenshot settings
-    screenshot_dir = os.environ.get("SCREENSHOT_DIR", ".")
     screenshot_dir = get_screenshot_dir()  # This will resolve to the actual directory used
-    screenshot_max_age = os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1")
-    screenshot_max_count = os.environ.get("SCREENSHOT_MAX_COUNT", "10")
+    screenshot_max_age = SCREENSHOT_MAX_AGE_DAYS
+    screenshot_max_count = SCREENSHOT_MAX_COUNT
     
     # Get command history file path
     from llm_control.voice.utils import get_command_history_file
     history_file = get_command_history_file()
     
-    # Check GPU availability
-    import torch
-    gpu_available = torch.cuda.is_available()
-    gpu_name = torch.cuda.get_device_name(0) if gpu_available else "None"
+    # Run an initial screenshot cleanup on the cleanup worker, then periodically
+    schedule_screenshot_cleanup(force=True)
+    start_screenshot_cleanup_daemon()
     
-    # Start the background thread for screenshot cleanup
-    cleanup_thread = threading.Thread(target=run_screenshot_cleanup, daemon=True)
-    cleanup_thread.start()
+    # Start the optional screen grabber ring buffer (SCREENSHOT_RING_FPS > 0)
+    screenshot_ring_running = start_screenshot_ring()
 
     register_shutdown_hook()
     vnc_status = ensure_vnc_running()
     
+    logger.info(f"Screenshot settings - Directory: {screenshot_dir}, Max age: {screenshot_max_age} days, Max count: {screenshot_max_count}")
+    
+    return {
+        "screenshot_dir": screenshot_dir,
+        "screenshot_max_age": screenshot_max_age,
+        "screenshot_max_count": screenshot_max_count,
+        "screenshot_ring_running": screenshot_ring_running,
+        "history_file": history_file,
+        "gpu_available": gpu_available,
+        "gpu_name": gpu_name,
+        "vnc_status": vnc_status
+    }
+
+def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
+    """
+    Run the Flask server for voice command processing.
+    
+    Args:
+        host: Host to bind to
+        port: Port to bind to
+        debug: Enable debug mode
+        ssl_context: SSL context for HTTPS
+    """
+    status = initialize_server(debug)
+    screenshot_dir = status["screenshot_dir"]
+    screenshot_max_age = status["screenshot_max_age"]
+    screenshot_max_count = status["screenshot_max_count"]
+    history_file = status["history_file"]
+    gpu_available = status["gpu_available"]
+    gpu_name = status["gpu_name"]
+    screenshot_ring_running = status["screenshot_ring_running"]
+    vnc_status = status["vnc_status"]
+    
     print(f"\n{'=' * 40}")
     print(f"🎤 Voice Control Server v1.0 starting...")
     print(f"🌐 Listening on: http{'s' if ssl_context else ''}://{host}:{port}")
@@ -1817,6 +2315,7 @@ def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
     print(f"📸 Screenshot directory: {screenshot_dir}")
     print(f"📸 Screenshot max age (days): {screenshot_max_age}")
     print(f"📸 Screenshot max count: {screenshot_max_count}")
+    print(f"📸 Screenshot ring buffer: {os.environ.get('SCREENSHOT_RING_FPS') + ' fps' if screenshot_ring_running else 'OFF'}")
     print(f"🖥️ VNC enabled: {'YES' if vnc_status['enabled'] else 'NO'}")
     print(f"🖥️ VNC running: {'YES' if vnc_status['running'] else 'NO'}")
     if vnc_status["enabled"]:
@@ -1828,10 +2327,8 @@ def run_server(host='0.0.0.0', port=5000, debug=False, ssl_context=None):
     print(f"🎮 GPU: {'Available - ' + gpu_name if gpu_available else 'Not available'}")
     print(f"{'=' * 40}\n")
     
-    logger.info(f"Screenshot settings - Directory: {screenshot_dir}, Max age: {screenshot_max_age} days, Max count: {screenshot_max_count}")
-    
     try:
-        app.run(host=host, port=port, debug=debug, ssl_context=ssl_context)
+        app.run(host=host, port=port, debug=debug, ssl_context=ssl_context, threaded=True)
     except Exception as e:
         logger.error(f"Server error: {str(e)}")
         print(f"❌ Server error: {str(e)}")
@@ -1857,7 +2354,7 @@ if __name__ == '__main__':
     parser.add_argument('--ssl-key', type=str,
                         help='Path to SSL private key file')
     parser.add_argument('--whisper-model', type=str, default=get_whisper_model_size(),
-                        choices=['tiny', 'base', 'small', 'medium', 'large'],
+                        choices=['tiny', 'base', 'small', 'medium', 'large', 'turbo', 'distil-large-v2', 'distil-large-v3'],
                         help=f'Whisper model size (default: {get_whisper_model_size()})')
     parser.add_argument('--ollama-model', type=str, default=get_ollama_model(),
                         help=f'Ollama model to use (default: {get_ollama_model()})')
@@ -7,19 +7,56 @@ This module contains helper functions used across the voice control server.
 import os
 import time
 import logging
+import traceback
+import io
 import json
+import re
+import heapq
 import sys
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, Tuple
-from functools import wraps
+from functools import wraps, lru_cache, partial
 import tempfile
 from datetime import datetime
 
 # Configure basic logging
 logger = logging.getLogger("voice-control-utils")
 
+# Flask is only needed by the request helpers below; import it once here rather
+# than on every request so the rest of this module works without it
+try:
+    from flask import Response, request
+except ImportError:
+    Response = request = None
+
 # Set up debug mode based on environment variable
 DEBUG = os.environ.get("DEBUG", "").lower() in ("true", "1", "yes")
 
+# Filename prefixes and image extensions of files managed in the screenshot directory
+SCREENSHOT_PREFIXES = ("screenshot_", "temp_", "before_", "after_")
+SCREENSHOT_EXTENSIONS = (".png", ".jpg", ".webp")
+# Screenshot retention limits, parsed once at import (after .env is loaded by the server)
+SCREENSHOT_MAX_AGE_DAYS = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
+SCREENSHOT_MAX_COUNT = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
+# Command history retention limits, parsed once at import like the screenshot limits
+HISTORY_MAX_AGE_DAYS = int(os.environ.get("HISTORY_MAX_AGE_DAYS", "30"))
+HISTORY_MAX_COUNT = int(os.environ.get("HISTORY_MAX_COUNT", "1000"))
+
+def is_screenshot_file(filename):
+    """
+    Check whether a file in the screenshot directory is a managed screenshot.
+    
+    Args:
+        filename: Base name of the file
+        
+    Returns:
+        bool: True if the name matches a screenshot prefix and image extension
+    """
+    # The extension check rejects most unrelated files, so it goes first
+    return filename.endswith(SCREENSHOT_EXTENSIONS) and filename.startswith(SCREENSHOT_PREFIXES)
+
 def is_debug_mode():
     """
     Check if debug mode is enabled.
@@ -59,16 +96,23 @@ def configure_logging(debug_mode=None):
         
     logger.debug("Logging configured successfully")
 
-# Call configure_logging to set up logging as soon as this module is imported
-configure_logging()
+# Set up logging as soon as this module is imported, unless the importing
+# application has already configured the root logger (then leave its level and
+# handlers alone; the server still calls configure_logging() at startup)
+if not logging.getLogger().handlers:
+    configure_logging()
 
 def get_screenshot_dir():
     """Get the directory for storing screenshots."""
+    # Only the environment lookup runs per call; resolving and creating the
+    # directory is cached per SCREENSHOT_DIR value
+    return _resolve_screenshot_dir(os.environ.get("SCREENSHOT_DIR"))
+
+@lru_cache(maxsize=8)
+def _resolve_screenshot_dir(screenshot_dir):
+    """Resolve a SCREENSHOT_DIR value to an absolute directory and make sure it exists."""
     from llm_control import is_packaged
     
-    # Use environment variable or default to a directory in the user's temp directory
-    screenshot_dir = os.environ.get("SCREENSHOT_DIR")
-    
     if not screenshot_dir:
         # Use a subdirectory in the system's temp directory
         temp_dir = os.path.join(tempfile.gettempdir(), "llm_control_screenshots")
@@ -91,34 +135,50 @@ def get_screenshot_dir():
     
     return screenshot_dir
 
+# Error bodies always have the same shape; only the message is serialized per call
+_ERROR_RESPONSE_TEMPLATE = b'{"error":%s,"status":"error"}\n'
+
 def error_response(message, status_code=400):
     """Helper function to create error responses"""
-    from flask import jsonify
-    
-    return jsonify({
-        "error": message,
-        "status": "error"
-    }), status_code
-
-def cors_preflight(f):
-    """Decorator to handle CORS preflight requests"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        from flask import request, make_response
-        
-        if request.method == 'OPTIONS':
-            response = make_response()
-            response.headers.add('Access-Control-Allow-Origin', '*')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
-            return response
-        return f(*args, **kwargs)
-    return decorated_function
-
-def add_cors_headers(response):
-    """Add CORS headers to all responses"""
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    return response
+    body = _ERROR_RESPONSE_TEMPLATE % json.dumps(str(message), ensure_ascii=False).encode("utf-8")
+    return Response(body, status=status_code, mimetype="application/json")
+
+def limit_content_length(max_length):
+    """
+    Decorator that rejects requests whose body is larger than max_length bytes.
+    
+    The check uses the Content-Length header, so oversized uploads are refused
+    before Flask buffers them; the app-wide MAX_CONTENT_LENGTH still applies to
+    chunked requests without a length.
+    
+    Args:
+        max_length: Maximum request body size in bytes
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            content_length = request.content_length
+            if content_length is not None and content_length > max_length:
+                logger.warning(f"Rejected {request.path}: body of {content_length} bytes exceeds {max_length} bytes")
+                return error_response(f"Request body too large (limit is {max_length} bytes)", 413)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# Boilerplate an LLM puts before a translation, and the markers that start an
+# explanatory note after it (matched case-insensitively in one pass each)
+_LLM_PREFIX_RE = re.compile(
+    r"^(?:here is the translation|the translation is|translation:|translated text:"
+    r"|here's the translation|translated version:)\s*[:.]?\s*",
+    re.IGNORECASE
+)
+_LLM_NOTE_MARKER_RE = re.compile(
+    r"\n\n(?:note:|please note|i have|observe|as requested|the original)",
+    re.IGNORECASE
+)
+# Verbs that make a first paragraph look like a complete command; anchored at the start
+# of a word so inflections ("clicking", "typed") match but "remove" or "prototype" don't
+_LLM_COMMAND_VERB_RE = re.compile(r"\b(?:click|type|press|move|open)", re.IGNORECASE)
 
 def clean_llm_response(response):
     """
@@ -133,91 +193,151 @@ def clean_llm_response(response):
     if not response:
         return ""
     
-    # Remove common prefixes
-    prefixes = [
-        "Here is the translation",
-        "The translation is",
-        "Translation:",
-        "Translated text:",
-        "Here's the translation",
-        "Translated version:"
-    ]
-    
-    cleaned = response
-    
-    for prefix in prefixes:
-        if cleaned.lower().startswith(prefix.lower()):
-            cleaned = cleaned[len(prefix):].strip()
-            # Remove any punctuation after the prefix
-            if cleaned and cleaned[0] in ':.':
-                cleaned = cleaned[1:].strip()
-    
-    # Remove explanatory notes
-    explanatory_markers = [
-        "\n\nNote:",
-        "\n\nPlease note",
-        "\n\nI have",
-        "\n\nObserve",
-        "\n\nAs requested",
-        "\n\nThe original"
-    ]
-    
-    for marker in explanatory_markers:
-        if marker.lower() in cleaned.lower():
-            cleaned = cleaned.split(marker.lower(), 1)[0].strip()
+    # Remove common prefixes (and punctuation after the prefix)
+    cleaned = _LLM_PREFIX_RE.sub('', response, count=1)
+    
+    # Remove explanatory notes: cut at the first marker
+    marker = _LLM_NOTE_MARKER_RE.search(cleaned)
+    if marker:
+        cleaned = cleaned[:marker.start()].strip()
     
     # If multiple paragraphs, take the first one if it looks like a complete command
     paragraphs = [p for p in cleaned.split('\n\n') if p.strip()]
     if len(paragraphs) > 1:
         # Check if first paragraph contains common verbs
-        first_para = paragraphs[0].lower()
-        if any(verb in first_para for verb in ['click', 'type', 'press', 'move', 'open']):
+        if _LLM_COMMAND_VERB_RE.search(paragraphs[0]):
             cleaned = paragraphs[0]
     
-    # Remove markdown code blocks
-    cleaned = cleaned.replace('```', '').strip()
+    # Remove markdown code blocks and trailing punctuation
+    return cleaned.replace('```', '').strip().rstrip('.,:;').rstrip()
+
+def configure_cuda_allocator(torch):
+    """
+    Tune the CUDA caching allocator for a long-running server.
+    
+    Enables expandable segments (in case PYTORCH_CUDA_ALLOC_CONF was overridden before
+    torch was imported) and caps the share of VRAM this process may reserve, leaving
+    headroom for Ollama when both run on the same GPU.
     
-    # Remove trailing punctuation
-    cleaned = cleaned.rstrip('.,:;')
+    Args:
+        torch: The imported torch module
+    """
+    try:
+        torch.cuda.memory._set_allocator_settings("expandable_segments:True")
+        logger.info("CUDA allocator: expandable segments enabled")
+    except Exception as e:
+        logger.warning(f"Could not enable expandable segments: {str(e)}")
     
-    return cleaned.strip()
+    try:
+        fraction = float(os.environ.get("CUDA_MEMORY_FRACTION", "0.9"))
+        if 0 < fraction <= 1:
+            torch.cuda.set_per_process_memory_fraction(fraction)
+            logger.info(f"CUDA allocator: per-process memory fraction set to {fraction}")
+    except Exception as e:
+        logger.warning(f"Could not set CUDA memory fraction: {str(e)}")
+
+@lru_cache(maxsize=1)
+def detect_nvidia_gpu():
+    """
+    Check for an NVIDIA GPU without importing PyTorch.
+    
+    The result is cached for the life of the process, like test_cuda_availability.
+    
+    Returns:
+        Tuple of (gpu_available, gpu_name); the name is "None" when no GPU is found
+    """
+    nvidia_smi = shutil.which("nvidia-smi")
+    if not (os.path.exists("/proc/driver/nvidia/version") or nvidia_smi):
+        return False, "None"
+    
+    if nvidia_smi:
+        try:
+            output = subprocess.run(
+                [nvidia_smi, "--query-gpu=name", "--format=csv,noheader"],
+                capture_output=True, text=True, timeout=5, check=True
+            ).stdout
+            names = [line.strip() for line in output.splitlines() if line.strip()]
+            if names:
+                return True, names[0]
+        except (subprocess.SubprocessError, OSError) as e:
+            logger.warning(f"Could not query nvidia-smi: {str(e)}")
+    
+    return True, "NVIDIA GPU"
 
+@lru_cache(maxsize=1)
+def _load_libcuda():
+    """dlopen the CUDA driver library once; returns the handle or None."""
+    import ctypes
+    # The driver library is nvcuda.dll on Windows; macOS has no CUDA driver
+    if sys.platform.startswith("win"):
+        names = ("nvcuda.dll",)
+    elif sys.platform.startswith("linux"):
+        names = ("libcuda.so.1", "libcuda.so")
+    else:
+        return None
+    for name in names:
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            continue
+    return None
+
+@lru_cache(maxsize=1)
 def test_cuda_availability():
-    """Test CUDA availability and print diagnostic information"""
+    """
+    Test CUDA availability and print diagnostic information.
+    
+    Device topology doesn't change while the process runs, so the checks (and the
+    allocator setup) run and log once; later calls return the cached result.
+    
+    Returns:
+        Dictionary with torch_version, cuda_available, cuda_version and devices
+    """
     logger.info("Testing CUDA availability...")
+    info = {"torch_version": None, "cuda_available": False, "cuda_version": None, "devices": []}
     try:
         import torch
+        info["torch_version"] = torch.__version__
         logger.info(f"PyTorch version: {torch.__version__}")
         
         if hasattr(torch, 'cuda'):
             is_available = torch.cuda.is_available()
+            info["cuda_available"] = is_available
             logger.info(f"CUDA available: {is_available}")
             
             if is_available:
+                info["cuda_version"] = torch.version.cuda
                 logger.info(f"CUDA version: {torch.version.cuda}")
                 logger.info(f"CUDA device count: {torch.cuda.device_count()}")
                 logger.info(f"Current CUDA device: {torch.cuda.current_device()}")
                 logger.info(f"CUDA device properties:")
                 for i in range(torch.cuda.device_count()):
-                    logger.info(f"  Device {i}: {torch.cuda.get_device_properties(i)}")
+                    properties = torch.cuda.get_device_properties(i)
+                    info["devices"].append(str(properties))
+                    logger.info(f"  Device {i}: {properties}")
+                configure_cuda_allocator(torch)
             else:
                 logger.warning("CUDA is not available. Using CPU only.")
-                # Check if CUDA initialization failed
-                try:
-                    import ctypes
-                    cuda = ctypes.CDLL("libcuda.so")
-                    result = cuda.cuInit(0)
-                    logger.info(f"CUDA driver initialization result: {result}")
-                except Exception as e:
-                    logger.warning(f"Failed to check CUDA driver: {str(e)}")
+                if torch.version.cuda is None:
+                    # CPU-only build: probing the driver would not explain anything
+                    logger.warning("PyTorch was not built with CUDA support")
+                    return info
+                # Check if CUDA initialization failed (the driver handle is opened once)
+                cuda = _load_libcuda()
+                if cuda is not None:
+                    logger.info(f"CUDA driver initialization result: {cuda.cuInit(0)}")
+                else:
+                    logger.warning("Failed to check CUDA driver: libcuda not found")
         else:
             logger.warning("PyTorch was not built with CUDA support")
     except ImportError as e:
         logger.warning(f"Could not import PyTorch: {str(e)}")
     except Exception as e:
-        logger.warning(f"Error testing CUDA: {str(e)}")
-        import traceback
-        logger.warning(traceback.format_exc())
+        logger.warning(f"Error testing CUDA: {str(e)}", exc_info=True)
+    return info
+
+# Modification times of the screenshots kept by the last cleanup, per directory
+_kept_screenshot_mtimes = {}
 
 def cleanup_old_screenshots(max_age_days=None, max_count=None):
     """
@@ -232,87 +352,70 @@ def cleanup_old_screenshots(max_age_days=None, max_count=None):
     """
     # Get values from environment variables if not explicitly provided
     if max_age_days is None:
-        max_age_days = int(os.environ.get("SCREENSHOT_MAX_AGE_DAYS", "1"))
+        max_age_days = SCREENSHOT_MAX_AGE_DAYS
     if max_count is None:
-        max_count = int(os.environ.get("SCREENSHOT_MAX_COUNT", "10"))
+        max_count = SCREENSHOT_MAX_COUNT
         
     logger.info(f"Cleaning up old screenshots (max_age_days={max_age_days}, max_count={max_count})")
     
     try:
         # Get the screenshot directory
         screenshot_dir = get_screenshot_dir()
-        logger.debug(f"Using screenshot directory: {screenshot_dir}")
+        logger.debug("Using screenshot directory: %s", screenshot_dir)
         
-        # List all screenshot files with their timestamps
-        screenshots = []
+        # Calculate the cutoff time
+        now = time.time()
+        age_cutoff = now - (max_age_days * 24 * 60 * 60)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Age cutoff: %s (older files will be deleted)", time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(age_cutoff)))
+        
+        # Partition screenshot files while scanning (scandir returns the stat data
+        # with the directory entries): files older than max_age_days are expired, and
+        # of the rest only the newest max_count are held in a min-heap, so the oldest
+        # beyond the limit fall out as excess without keeping every file in memory
+        expired = []
+        excess = []
+        kept = []
+        found = 0
+        known_mtimes = _kept_screenshot_mtimes.get(screenshot_dir, {})
         try:
-            for filename in os.listdir(screenshot_dir):
-                # Include all relevant screenshot patterns
-                if (filename.startswith("screenshot_") or 
-                    filename.startswith("temp_") or 
-                    filename.startswith("before_") or 
-                    filename.startswith("after_")) and filename.endswith(".png"):
-                    full_path = os.path.join(screenshot_dir, filename)
-                    mtime = os.path.getmtime(full_path)
-                    mtime_str = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-                    screenshots.append((full_path, mtime, filename, mtime_str))
-            logger.debug(f"Found {len(screenshots)} screenshots in {screenshot_dir}")
+            with os.scandir(screenshot_dir) as it:
+                for entry in it:
+                    # Include all relevant screenshot patterns
+                    if not is_screenshot_file(entry.name):
+                        continue
+                    # Screenshot names are timestamped and written once, so a file kept
+                    # by the previous run doesn't need to be stat'ed again
+                    mtime = known_mtimes.get(entry.name)
+                    if mtime is None:
+                        try:
+                            mtime = entry.stat(follow_symlinks=False).st_mtime
+                        except OSError:
+                            continue
+                    found += 1
+                    if mtime < age_cutoff:
+                        expired.append(entry.name)
+                    elif max_count <= 0:
+                        excess.append(entry.name)
+                    elif len(kept) < max_count:
+                        heapq.heappush(kept, (mtime, entry.name))
+                    else:
+                        excess.append(heapq.heappushpop(kept, (mtime, entry.name))[1])
         except FileNotFoundError:
             logger.error(f"Screenshot directory not found: {screenshot_dir}")
             return 0, f"Screenshot directory not found: {screenshot_dir}"
+        logger.debug("Found %d screenshots in %s", found, screenshot_dir)
+        # Remember what is kept for the next run (at most max_count entries)
+        _kept_screenshot_mtimes[screenshot_dir] = {name: mtime for mtime, name in kept}
         
         # If no screenshots to clean, return early
-        if not screenshots:
-            logger.info(f"No screenshots found to clean up")
+        if not expired and not excess:
+            logger.info(f"No screenshots to clean up")
             return 0, None
         
-        # Calculate the cutoff time
-        now = time.time()
-        age_cutoff = now - (max_age_days * 24 * 60 * 60)
-        cutoff_str = datetime.fromtimestamp(age_cutoff).strftime('%Y-%m-%d %H:%M:%S')
-        logger.debug(f"Age cutoff: {cutoff_str} (older files will be deleted)")
-        
-        # Sort by modification time (oldest first)
-        screenshots.sort(key=lambda x: x[1])
-        
-        # Log the oldest and newest files for debugging
-        if screenshots:
-            oldest_file = screenshots[0]
-            newest_file = screenshots[-1]
-            logger.debug(f"Oldest file: {oldest_file[2]} ({oldest_file[3]})")
-            logger.debug(f"Newest file: {newest_file[2]} ({newest_file[3]})")
-        
-        # Delete files older than max_age_days
-        deleted_count = 0
-        age_deleted = 0
-        for full_path, mtime, filename, mtime_str in screenshots:
-            if mtime < age_cutoff:
-                try:
-                    os.remove(full_path)
-                    deleted_count += 1
-                    age_deleted += 1
-                    logger.info(f"Deleted old screenshot ({mtime_str}): {filename}")
-                except OSError as e:
-                    logger.warning(f"Failed to delete {full_path}: {str(e)}")
-        
-        logger.debug(f"Deleted {age_deleted} screenshots older than {max_age_days} days")
-        
-        # If we still have more than max_count, delete the oldest ones
-        remaining = [s for s in screenshots if s[1] >= age_cutoff]
-        count_to_delete = len(remaining) - max_count
-        
-        if count_to_delete > 0:
-            logger.debug(f"Still have {len(remaining)} screenshots, need to delete {count_to_delete} to reach max_count={max_count}")
-            # We've already sorted by time, so just delete the oldest ones
-            for full_path, _, filename, mtime_str in remaining[:count_to_delete]:
-                try:
-                    os.remove(full_path)
-                    deleted_count += 1
-                    logger.info(f"Deleted excess screenshot ({mtime_str}): {filename}")
-                except OSError as e:
-                    logger.warning(f"Failed to delete {full_path}: {str(e)}")
-        else:
-            logger.info(f"No need to delete files by count: {len(remaining)} screenshots <= max_count={max_count}")
+        # Delete everything in one pass
+        deleted_count = _unlink_batch(screenshot_dir, expired + excess)
+        logger.debug("Selected %d screenshots older than %s days and %d beyond max_count=%s", len(expired), max_age_days, len(excess), max_count)
         
         logger.info(f"Cleanup complete. Deleted {deleted_count} screenshots total")
         return deleted_count, None
@@ -320,10 +423,67 @@ def cleanup_old_screenshots(max_age_days=None, max_count=None):
     except Exception as e:
         error_msg = f"Error cleaning up screenshots: {str(e)}"
         logger.error(error_msg)
-        import traceback
         logger.error(traceback.format_exc())
         return 0, error_msg
 
+# Above this many files, deletions are spread over a few threads; unlink releases
+# the GIL, so the syscalls overlap (mostly useful on network or slow filesystems)
+UNLINK_PARALLEL_THRESHOLD = 16
+UNLINK_MAX_WORKERS = 8
+
+def _unlink_batch(directory, filenames):
+    """
+    Delete files from one directory.
+    
+    Names are resolved relative to a single open directory descriptor where the
+    platform supports it, instead of walking the full path for every file. Large
+    batches are deleted from a small thread pool.
+    
+    Args:
+        directory: Directory containing the files
+        filenames: Base names of the files to delete
+        
+    Returns:
+        Number of files deleted
+    """
+    if not filenames:
+        return 0
+    
+    dir_fd = None
+    if os.unlink in os.supports_dir_fd:
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            dir_fd = None
+    # Pick the unlink call once instead of branching per file
+    if dir_fd is not None:
+        unlink = partial(os.unlink, dir_fd=dir_fd)
+    else:
+        unlink = lambda filename: os.unlink(os.path.join(directory, filename))
+    
+    def delete(filename):
+        try:
+            unlink(filename)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Failed to delete {os.path.join(directory, filename)}: {str(e)}")
+            return False
+    
+    try:
+        if len(filenames) > UNLINK_PARALLEL_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=UNLINK_MAX_WORKERS, thread_name_prefix="unlink") as executor:
+                deleted = sum(executor.map(delete, filenames))
+        else:
+            deleted = sum(map(delete, filenames))
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Deleted %d of %d screenshots: %s", deleted, len(filenames), ', '.join(filenames))
+    return deleted
+
 def get_command_history_file():
     """
     Get the path to the command history CSV file.
@@ -331,11 +491,14 @@ def get_command_history_file():
     Returns:
         str: Path to the command history CSV file
     """
+    # Resolving and creating the directory is cached per HISTORY_DIR value
+    return _resolve_command_history_file(os.environ.get("HISTORY_DIR"))
+
+@lru_cache(maxsize=8)
+def _resolve_command_history_file(history_dir):
+    """Resolve a HISTORY_DIR value to the history CSV path, creating the directory."""
     from llm_control import is_packaged
     
-    # Create a directory for storing history data
-    history_dir = os.environ.get("HISTORY_DIR")
-    
     if not history_dir:
         # Use a persistent directory instead of system temp directory
         history_dir = "history"
@@ -358,6 +521,9 @@ def get_command_history_file():
     # Return the path to the history CSV file
     return os.path.join(history_dir, "command_history.csv")
 
+# History files whose header is known to have the current columns
+_history_header_checked = set()
+
 def add_to_command_history(command_data):
     """
     Add a command execution to the history CSV file.
@@ -398,7 +564,8 @@ def add_to_command_history(command_data):
 
         fieldnames = ['timestamp', 'command', 'steps', 'code', 'success', 'screen_summary']
 
-        if file_exists:
+        # The header only needs checking once per file; cleanup rewrites drop the mark
+        if file_exists and history_file not in _history_header_checked:
             try:
                 with open(history_file, 'r', newline='', encoding='utf-8') as csvfile:
                     reader = csv.reader(csvfile)
@@ -416,6 +583,7 @@ def add_to_command_history(command_data):
                             row.pop(None, None)
                             row.setdefault('screen_summary', '')
                             writer.writerow(row)
+                _history_header_checked.add(history_file)
             except Exception as exc:
                 logger.warning(f"Failed to migrate command history header: {exc}")
 
@@ -440,14 +608,48 @@ def add_to_command_history(command_data):
             
             # Write the row
             writer.writerow(row)
+        if not file_exists:
+            _history_header_checked.add(history_file)
         
-        logger.debug(f"Added command to history: {command_data.get('command', '')}")
+        logger.debug("Added command to history: %s", command_data.get('command', ''))
         return True
         
     except Exception as e:
         logger.error(f"Error adding command to history: {str(e)}")
         return False
 
+def _merge_history_row_overflow(row):
+    """
+    Fold unquoted commas in a history row back into its screen_summary.
+    
+    Summaries written before the column was quoted can spill into extra fields,
+    which csv.DictReader collects under the None key.
+    """
+    extra_values = row.pop(None, None)
+    if extra_values:
+        screen_summary = row.get('screen_summary') or ''
+        extra_text = ",".join(str(value) for value in extra_values if value is not None)
+        if screen_summary and extra_text:
+            screen_summary = f"{screen_summary},{extra_text}"
+        elif extra_text:
+            screen_summary = extra_text
+        row['screen_summary'] = screen_summary
+
+    if row.get('screen_summary') is None:
+        row['screen_summary'] = ''
+    return row
+
+def _convert_history_row(row):
+    """Convert the string fields of a history row back to Python values."""
+    # Convert success string to boolean
+    if 'success' in row:
+        row['success'] = row['success'].lower() == 'true'
+    
+    # Convert steps string back to list
+    if 'steps' in row and row['steps']:
+        row['steps'] = [step.strip() for step in row['steps'].split(';')]
+    return row
+
 def get_command_history(limit=None, date_filter='today'):
     """
     Get the command execution history.
@@ -489,18 +691,7 @@ def get_command_history(limit=None, date_filter='today'):
             reader = csv.DictReader(csvfile)
             
             for row in reader:
-                extra_values = row.pop(None, None)
-                if extra_values:
-                    screen_summary = row.get('screen_summary') or ''
-                    extra_text = ",".join(str(value) for value in extra_values if value is not None)
-                    if screen_summary and extra_text:
-                        screen_summary = f"{screen_summary},{extra_text}"
-                    elif extra_text:
-                        screen_summary = extra_text
-                    row['screen_summary'] = screen_summary
-
-                if row.get('screen_summary') is None:
-                    row['screen_summary'] = ''
+                _merge_history_row_overflow(row)
                 # Apply date filter if specified
                 if filter_date:
                     try:
@@ -516,15 +707,7 @@ def get_command_history(limit=None, date_filter='today'):
                         logger.warning(f"Invalid timestamp in history entry, skipping: {row.get('timestamp', 'N/A')}")
                         continue
                 
-                # Convert success string to boolean
-                if 'success' in row:
-                    row['success'] = row['success'].lower() == 'true'
-                
-                # Convert steps string back to list
-                if 'steps' in row and row['steps']:
-                    row['steps'] = [step.strip() for step in row['steps'].split(';')]
-                
-                history.append(row)
+                history.append(_convert_history_row(row))
         
         # Apply limit if specified
         if limit is not None and limit > 0:
@@ -536,6 +719,70 @@ def get_command_history(limit=None, date_filter='today'):
         logger.error(f"Error getting command history: {str(e)}")
         return []
 
+# Latest command history row and where it was read up to:
+# (path, inode, header line, size, last bytes before size, row)
+_latest_history_cache = None
+_HISTORY_TAIL_CHECK_BYTES = 64
+
+def _read_latest_history_row(history_file):
+    """
+    Read the last entry of the command history CSV.
+    
+    The result is cached by file size. When the file has only been appended to
+    since the last call, just the new bytes are parsed: the previous end of file
+    is a known record boundary, whereas scanning backwards for one is unreliable
+    because the code column holds quoted newlines. The bytes before the previous
+    end are compared first, so a file rewritten by cleanup is read in full.
+    
+    Args:
+        history_file: Path to the history CSV
+        
+    Returns:
+        Dictionary with the converted row, or None if there are no entries
+    """
+    import csv
+    global _latest_history_cache
+    
+    if not os.path.exists(history_file):
+        return None
+    
+    with open(history_file, 'rb') as f:
+        st = os.fstat(f.fileno())
+        header = f.readline()
+        start = f.tell()
+        preceding = header
+        latest = None
+        
+        cached = _latest_history_cache
+        if cached is not None and cached[:3] == (history_file, st.st_ino, header):
+            _, _, _, cached_size, cached_tail, cached_row = cached
+            if cached_size == st.st_size:
+                return dict(cached_row) if cached_row else None
+            if cached_size < st.st_size:
+                f.seek(cached_size - len(cached_tail))
+                if f.read(len(cached_tail)) == cached_tail:
+                    # Only appended to: parse the new rows
+                    start = cached_size
+                    preceding = cached_tail
+                    latest = cached_row
+        
+        f.seek(start)
+        data = f.read(st.st_size - start)
+    
+    fieldnames = next(csv.reader([header.decode('utf-8')]), [])
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=fieldnames)
+    new_row = None
+    for new_row in reader:
+        pass
+    if new_row is not None:
+        latest = _convert_history_row(_merge_history_row_overflow(new_row))
+    
+    # Only remember complete data (a writer may be in the middle of a row)
+    if not data or data.endswith(b'\n'):
+        tail = (preceding + data)[-_HISTORY_TAIL_CHECK_BYTES:]
+        _latest_history_cache = (history_file, st.st_ino, header, st.st_size, tail, latest)
+    return dict(latest) if latest else None
+
 def get_latest_command_summary():
     """
     Get the latest command summary entry for TTS output.
@@ -543,11 +790,14 @@ def get_latest_command_summary():
     Returns:
         Dictionary with summary data or None if no history exists.
     """
-    history = get_command_history(limit=1, date_filter='all')
-    if not history:
+    try:
+        latest = _read_latest_history_row(get_command_history_file())
+    except Exception as e:
+        logger.error(f"Error getting latest command summary: {str(e)}")
+        return None
+    if not latest:
         return None
 
-    latest = history[-1]
     return {
         "timestamp": latest.get("timestamp", ""),
         "command": latest.get("command", ""),
@@ -571,10 +821,10 @@ def cleanup_old_command_history(max_age_days=None, max_count=None):
     
     # Get configuration from environment variables if not provided
     if max_age_days is None:
-        max_age_days = int(os.environ.get("HISTORY_MAX_AGE_DAYS", "30"))
+        max_age_days = HISTORY_MAX_AGE_DAYS
     
     if max_count is None:
-        max_count = int(os.environ.get("HISTORY_MAX_COUNT", "1000"))
+        max_count = HISTORY_MAX_COUNT
     
     # If max_age_days is 0, don't delete by age
     # If max_count is 0, don't limit by count
@@ -597,7 +847,7 @@ def cleanup_old_command_history(max_age_days=None, max_count=None):
                 history_entries.append(row)
         
         original_count = len(history_entries)
-        logger.debug(f"Found {original_count} history entries")
+        logger.debug("Found %d history entries", original_count)
         
         if original_count == 0:
             return 0, None
@@ -635,7 +885,7 @@ def cleanup_old_command_history(max_age_days=None, max_count=None):
                     filtered_entries.append(entry)
             
             age_deleted = before_age_filter - len(filtered_entries)
-            logger.debug(f"Deleted {age_deleted} history entries older than {max_age_days} days")
+            logger.debug("Deleted %d history entries older than %s days", age_deleted, max_age_days)
         
         # Filter by count if max_count > 0
         count_deleted = 0
@@ -644,7 +894,7 @@ def cleanup_old_command_history(max_age_days=None, max_count=None):
             before_count_filter = len(filtered_entries)
             filtered_entries = filtered_entries[-max_count:]
             count_deleted = before_count_filter - len(filtered_entries)
-            logger.debug(f"Deleted {count_deleted} history entries to maintain max count of {max_count}")
+            logger.debug("Deleted %d history entries to maintain max count of %s", count_deleted, max_count)
         
         total_deleted = age_deleted + count_deleted
         
@@ -663,6 +913,8 @@ def cleanup_old_command_history(max_age_days=None, max_count=None):
                     writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                     writer.writeheader()
             
+            # The rewritten header may come from older rows; check it on the next append
+            _history_header_checked.discard(history_file)
             logger.info(f"Command history cleanup completed: {total_deleted} entries deleted, {len(filtered_entries)} remaining")
         else:
             logger.debug("No command history entries needed cleanup")
@@ -714,7 +966,6 @@ def manual_cleanup_command_history(max_age_days=None, max_count=None):
         
     except Exception as e:
         logger.error(f"Error in manual command history cleanup: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return {
             "success": False,
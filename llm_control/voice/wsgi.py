@@ -0,0 +1,22 @@
+"""
+WSGI entrypoint for running the voice control server under a production server.
+
+Example (Gunicorn):
+
+    gunicorn -k gthread -w 1 --threads 8 --timeout 120 llm_control.voice.wsgi:app
+
+Use a single worker process: it owns the Whisper model, the CUDA context and the
+desktop being controlled, so extra processes would only load duplicate models and
+race on the mouse/keyboard. Concurrency comes from the worker threads, which is
+what lets the batched transcriber collect concurrent /transcribe and
+/voice-command requests. Do not use --preload, so models are loaded in the
+worker rather than in the forking master.
+"""
+
+import os
+
+from llm_control.voice.server import app, initialize_server
+
+initialize_server(debug=os.environ.get("DEBUG", "").lower() in ("true", "1", "yes"))
+
+__all__ = ["app"]
@@ -13,6 +13,7 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/pnmartinez/llm-pc-control",
     packages=find_packages(),
+    package_data={"llm_control.voice": ["static/*.css"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1 @@
+# Tests for llm/simple_executor module
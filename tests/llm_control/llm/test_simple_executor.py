@@ -0,0 +1,56 @@
+"""Tests for LLM code generation in the simple executor against an OpenAI-compatible server."""
+
+import unittest
+import sys
+import os
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from llm_control.llm import simple_executor
+
+
+def _response(status_code, data):
+    response = mock.Mock(status_code=status_code, text="")
+    response.json.return_value = data
+    return response
+
+
+class TestGeneratePyautoguiCodeOpenAI(unittest.TestCase):
+    """Test generate_pyautogui_code with a vLLM-style host ending in /v1."""
+
+    HOST = "http://localhost:8000/v1"
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"LLM_API_FORMAT": ""})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("llm_control.utils.ollama._session")
+        self.session = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_generates_code(self):
+        self.session.get.return_value = _response(200, {"data": [{"id": "qwen"}]})
+        self.session.post.return_value = _response(200, {
+            "choices": [{"message": {"content": "import pyautogui\npyautogui.press('enter')"}}]
+        })
+
+        result = simple_executor.generate_pyautogui_code("press enter", model="qwen", ollama_host=self.HOST)
+
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertIn("pyautogui.press('enter')", result["code"])
+        self.assertEqual(self.session.get.call_args[0][0], f"{self.HOST}/models")
+        self.assertEqual(self.session.post.call_args[0][0], f"{self.HOST}/chat/completions")
+
+    def test_missing_model(self):
+        self.session.get.return_value = _response(200, {"data": [{"id": "other"}]})
+
+        result = simple_executor.generate_pyautogui_code("press enter", model="qwen", ollama_host=self.HOST)
+
+        self.assertFalse(result["success"])
+        self.assertIn("qwen", result["error"])
+        self.session.post.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
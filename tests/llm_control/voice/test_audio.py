@@ -0,0 +1,69 @@
+"""Tests for streaming transcription sessions in voice audio (no Whisper model needed)."""
+
+import unittest
+import sys
+import os
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from llm_control.voice import audio
+
+
+class _FakeModel:
+    device = SimpleNamespace(type="cpu")
+
+    def transcribe(self, samples, **kwargs):
+        return {"language": "es", "segments": [{"text": "hola", "start": 0.0}]}
+
+
+def _decode_container(audio_data, raw_pcm=False):
+    # Pretend each encoded byte decodes to 10 samples
+    return np.zeros(len(audio_data) * 10, dtype=np.float32)
+
+
+class TestStreamEncodedBuffer(unittest.TestCase):
+    """Test that webm/ogg streaming sessions keep their encoded bytes bounded."""
+
+    def setUp(self):
+        env = {k: v for k, v in os.environ.items() if k not in ("WHISPER_BACKEND", "WHISPER_WORKER_ADDRESS")}
+        for patcher in (
+            mock.patch.dict(os.environ, env, clear=True),
+            mock.patch.object(audio, "STREAM_MAX_ENCODED_BYTES", 1000),
+            mock.patch.object(audio, "_decode_audio_chunk", side_effect=_decode_container),
+            mock.patch.object(audio, "_get_whisper_model", return_value=_FakeModel()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(audio._stream_sessions.pop, "test", None)
+
+    def test_container_chunks_stay_bounded(self):
+        chunk = b"\x1aE\xdf\xa3" + b"\x00" * 296
+        results = [audio.transcribe_stream_chunk("test", chunk, language="es") for _ in range(5)]
+
+        self.assertFalse(any(r.get("error") for r in results[:3]))
+        for result in results[3:]:
+            self.assertTrue(result.get("buffer_full"))
+        session = audio._stream_sessions["test"]
+        self.assertLessEqual(len(session["encoded"]), 1000)
+        self.assertEqual(session["decoded"], 900 * 10)
+
+        # The session survives so the client can still finish the dictation
+        final = audio.transcribe_stream_chunk("test", b"", language="es", final=True)
+        self.assertNotIn("error", final)
+        self.assertEqual(final["text"], "hola")
+        self.assertNotIn("test", audio._stream_sessions)
+
+    def test_pcm_chunks_are_not_accumulated(self):
+        chunk = np.zeros(800, dtype=np.int16).tobytes()
+        for _ in range(3):
+            result = audio.transcribe_stream_chunk("test", chunk, language="es", raw_pcm=True)
+            self.assertNotIn("error", result)
+        self.assertEqual(audio._stream_sessions["test"]["encoded"], b"")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests for the process-wide screenshot suspension in screenshots (captures and the ring buffer)."""
+
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from llm_control.voice import screenshots
+
+
+class TestSuspendScreenshots(unittest.TestCase):
+    """Captures from any thread are skipped while screenshots are suspended."""
+
+    def setUp(self):
+        screenshots.suspend_screenshots()
+        self.addCleanup(screenshots.resume_screenshots)
+
+    def test_capture_functions_skip_while_suspended(self):
+        with mock.patch.object(screenshots, "grab_screen") as grab_screen:
+            self.assertEqual(screenshots.capture_screenshot(), (None, None, False))
+            self.assertIsNone(screenshots.capture_screenshot_with_name("before_1.png"))
+            self.assertEqual(screenshots.capture_with_highlight(10, 10), (None, None, False))
+            grab_screen.assert_not_called()
+
+    def test_suspension_applies_to_other_threads(self):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(screenshots.screenshots_suspended()))
+        thread.start()
+        thread.join()
+        self.assertEqual(results, [True])
+
+    def test_nested_suspensions(self):
+        screenshots.suspend_screenshots()
+        screenshots.resume_screenshots()
+        self.assertTrue(screenshots.screenshots_suspended())
+        screenshots.resume_screenshots()
+        self.assertFalse(screenshots.screenshots_suspended())
+        screenshots.suspend_screenshots()
+
+
+class _StopRing(Exception):
+    pass
+
+
+class TestRingBufferSuspension(unittest.TestCase):
+    """The screenshot ring buffer neither grabs nor keeps frames across a suspension."""
+
+    def setUp(self):
+        self.addCleanup(screenshots._ring.__setitem__, slice(None), [None] * screenshots._ring_size)
+
+    def test_ring_loop_skips_grab_while_suspended(self):
+        sct = mock.MagicMock(monitors=[{}])
+        fake_mss = mock.MagicMock()
+        fake_mss.mss.return_value.__enter__.return_value = sct
+        screenshots.suspend_screenshots()
+        self.addCleanup(screenshots.resume_screenshots)
+        with mock.patch.object(screenshots, "mss", fake_mss), \
+                mock.patch.object(screenshots.time, "sleep", side_effect=_StopRing):
+            with self.assertRaises(_StopRing):
+                screenshots._ring_loop(10)
+        sct.grab.assert_not_called()
+        self.assertIsNone(screenshots._latest_ring_frame())
+
+    def test_resume_clears_ring(self):
+        screenshots.suspend_screenshots()
+        screenshots._ring[0] = (time.time(), object())
+        screenshots.resume_screenshots()
+        self.assertEqual(screenshots._ring, [None] * screenshots._ring_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+"""Tests for formatting the executed pipeline code in server responses."""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from llm_control.voice.server import _extract_executed_code
+
+
+class TestExtractExecutedCode(unittest.TestCase):
+    """Test _extract_executed_code for the shapes the command pipeline returns."""
+
+    def test_missing_code(self):
+        self.assertEqual(_extract_executed_code(None), "")
+        self.assertEqual(_extract_executed_code({}), "")
+
+    def test_string_code(self):
+        self.assertEqual(_extract_executed_code("pyautogui.press('enter')"), "pyautogui.press('enter')")
+
+    def test_imports_and_raw(self):
+        code = {
+            "imports": "import pyautogui\nimport time",
+            "raw": "pyautogui.press('enter')",
+            "steps": [{"original": "press enter", "code": "ignored"}]
+        }
+        self.assertEqual(
+            _extract_executed_code(code),
+            "import pyautogui\nimport time\n\npyautogui.press('enter')"
+        )
+
+    def test_raw_only(self):
+        self.assertEqual(_extract_executed_code({"raw": "pyautogui.click()"}), "pyautogui.click()")
+
+    def test_imports_without_raw_skip_steps(self):
+        code = {"imports": "import pyautogui", "steps": [{"original": "click", "code": "pyautogui.click()"}]}
+        self.assertEqual(_extract_executed_code(code), "import pyautogui")
+
+    def test_steps_only(self):
+        code = {"steps": [
+            {"original": "click ok", "code": "pyautogui.click(10, 20)"},
+            {"code": "pyautogui.press('enter')"}
+        ]}
+        self.assertEqual(
+            _extract_executed_code(code),
+            "# click ok\n\npyautogui.click(10, 20)\n\npyautogui.press('enter')"
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
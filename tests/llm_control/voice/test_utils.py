@@ -0,0 +1,96 @@
+"""Tests for helpers in llm_control.voice.utils."""
+
+import unittest
+import sys
+import os
+import tempfile
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../')))
+
+from llm_control.voice.utils import (
+    clean_llm_response,
+    add_to_command_history,
+    cleanup_old_command_history,
+    get_latest_command_summary,
+)
+
+
+class TestCleanLlmResponse(unittest.TestCase):
+    """Test clean_llm_response on typical translation outputs."""
+
+    def test_empty(self):
+        self.assertEqual(clean_llm_response(""), "")
+        self.assertEqual(clean_llm_response(None), "")
+
+    def test_plain_command_unchanged(self):
+        self.assertEqual(clean_llm_response("click the Save button"), "click the Save button")
+
+    def test_prefix_removed_case_insensitive(self):
+        self.assertEqual(clean_llm_response("Here is the translation: open Firefox"), "open Firefox")
+        self.assertEqual(clean_llm_response("TRANSLATION: type hello"), "type hello")
+        self.assertEqual(clean_llm_response("The translation is. press enter"), "press enter")
+
+    def test_note_removed(self):
+        response = "click the File menu\n\nNote: I translated 'archivo' as 'File'."
+        self.assertEqual(clean_llm_response(response), "click the File menu")
+
+    def test_earliest_note_marker_wins(self):
+        response = "open the terminal\n\nAs requested, here it is\n\nNote: done"
+        self.assertEqual(clean_llm_response(response), "open the terminal")
+
+    def test_first_command_paragraph_kept(self):
+        response = "Click the OK button\n\nThis closes the dialog."
+        self.assertEqual(clean_llm_response(response), "Click the OK button")
+
+    def test_verb_inside_other_word_is_not_a_command(self):
+        response = "Remove the prototype\n\nThis explains the change"
+        self.assertEqual(clean_llm_response(response), response)
+
+    def test_code_fences_and_trailing_punctuation(self):
+        self.assertEqual(clean_llm_response("```type hello world.```"), "type hello world")
+
+
+
+class TestLatestCommandSummary(unittest.TestCase):
+    """Test get_latest_command_summary as the history file is appended to and rewritten."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"HISTORY_DIR": self.tmpdir.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def add(self, command, summary=""):
+        # Generated code spans several lines, so rows contain quoted newlines
+        add_to_command_history({
+            "command": command,
+            "code": "import pyautogui\npyautogui.click(10, 20)\n",
+            "success": True,
+            "screen_summary": summary,
+        })
+
+    def test_no_history(self):
+        self.assertIsNone(get_latest_command_summary())
+
+    def test_follows_appends(self):
+        self.add("open firefox", "Firefox is open")
+        self.assertEqual(get_latest_command_summary()["command"], "open firefox")
+        self.add("click save", "File saved, closing dialog")
+        latest = get_latest_command_summary()
+        self.assertEqual(latest["command"], "click save")
+        self.assertEqual(latest["screen_summary"], "File saved, closing dialog")
+        self.assertIs(latest["success"], True)
+
+    def test_rewritten_file(self):
+        for i in range(5):
+            self.add(f"command {i}")
+        self.assertEqual(get_latest_command_summary()["command"], "command 4")
+        cleanup_old_command_history(max_age_days=0, max_count=1)
+        self.add("after cleanup")
+        self.assertEqual(get_latest_command_summary()["command"], "after cleanup")
+
+
+if __name__ == '__main__':
+    unittest.main()